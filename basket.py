@@ -31,9 +31,29 @@ import threading
 from collections import deque
 from datetime import datetime
 
+import numpy as np
+
+from basket_engine import BasketEngine
+from market_feed import MarketFeed
+from shadow_fleet import ShadowFleet
+from redis_bus import REDIS_URL, RedisBus
+from state_channel import STATE_SHM, StateChannel
+from state_publisher import StatePublisher
+from tick_recorder import TICK_RECORD_DIR, TICK_RECORD_LEVELS, TickRecorder
 from strategy_core import (
-    find_active_market,
-    get_order_book_metrics,
+    METRICS_FULL,
+    METRICS_TOP,
+    SLOT_STEP,
+    close_http_session,
+    fetch_slot_market_async,
+    find_active_market_async,
+    get_current_slot_ts,
+    get_latency_stats,
+    get_order_books_metrics_async,
+    latency_stats,
+    market_slot_ts,
+    now_ts,
+    real_secs,
     seconds_remaining,
 )
 
@@ -46,11 +66,19 @@ log = logging.getLogger("basket")
 
 logging.getLogger("urllib3").setLevel(logging.WARNING)
 logging.getLogger("httpx").setLevel(logging.WARNING)
+logging.getLogger("websockets").setLevel(logging.WARNING)
 
 # ═══════════════════════════════════════════════════════
 #  PARÁMETROS
 # ═══════════════════════════════════════════════════════
-POLL_INTERVAL        = 0.5
+POLL_INTERVAL        = 0.5     # ACTIVO fuera de la ventana de entrada
+ENTRY_POLL_INTERVAL  = 0.25    # dentro de la ventana de entrada sin posición
+WATCH_POLL_INTERVAL  = 1.0     # solo vigilando stop loss / resolución
+REQUEST_BUDGET_RPS   = float(os.environ.get("REQUEST_BUDGET_RPS", 6))   # requests/s al CLOB
+REQUEST_BUDGET_BURST = 20      # requests ahorrados en fases lentas, gastables en la ventana
+FEED_MODE            = os.environ.get("FEED_MODE", "poll").lower()   # poll | ws
+TICK_DEADLINE        = float(os.environ.get("TICK_DEADLINE", 1.5))   # s máx. esperando books por tick
+PREFETCH_INTERVAL    = 15    # segundos entre intentos de resolver el slot siguiente
 DIVERGENCE_THRESHOLD = 0.05
 DIVERGENCE_MAX       = 0.14
 WAKE_UP_SECS         = 90
@@ -79,53 +107,115 @@ LOG_FILE   = os.environ.get("LOG_FILE",   "/data/basket_log.json")
 CSV_FILE   = os.environ.get("CSV_FILE",   "/data/basket_trades.csv")
 STATE_FILE = os.environ.get("STATE_FILE", "/data/state.json")
 
+# Flota sombra: grilla JSON de variantes de parámetros simuladas sobre el mismo feed
+SHADOW_GRID        = os.environ.get("SHADOW_GRID")
+SHADOW_FILE        = os.environ.get("SHADOW_FILE",        "/data/shadow_summary.json")
+SHADOW_TRADES_FILE = os.environ.get("SHADOW_TRADES_FILE", "/data/shadow_trades.csv")
+SHADOW_WRITE_SECS  = 10    # segundos mínimos entre escrituras del resumen sin cierres
+
 # ═══════════════════════════════════════════════════════
-#  ESTADO DE LOS 3 MERCADOS
+#  ESTADO DE LOS MERCADOS DEL BASKET
 # ═══════════════════════════════════════════════════════
-SYMBOLS = ["ETH", "SOL", "BTC"]
+# Cualquier activo con mercado "<sym>-updown-5m" (p.ej. BASKET_SYMBOLS=ETH,SOL,BTC,XRP,DOGE)
+SYMBOLS = [s.strip().upper() for s in os.environ.get("BASKET_SYMBOLS", "ETH,SOL,BTC").split(",") if s.strip()]
 
-markets = {
-    s: {
-        "info":      None,
-        "up_bid":    0.0, "up_ask": 0.0, "up_mid": 0.0,
-        "dn_bid":    0.0, "dn_ask": 0.0, "dn_mid": 0.0,
-        "time_left": "N/A",
-        "error":     None,
-    }
-    for s in SYMBOLS
-}
+class MarketLeg:
+    """Estado por símbolo: market info + top of book UP/DOWN del último tick."""
+
+    __slots__ = (
+        "info",
+        "up_bid", "up_ask", "up_mid",
+        "dn_bid", "dn_ask", "dn_mid",
+        "time_left", "error", "stale",
+    )
+
+    def __init__(self):
+        self.info      = None
+        self.up_bid    = 0.0
+        self.up_ask    = 0.0
+        self.up_mid    = 0.0
+        self.dn_bid    = 0.0
+        self.dn_ask    = 0.0
+        self.dn_mid    = 0.0
+        self.time_left = "N/A"
+        self.error     = None
+        self.stale     = False   # quotes del último book conocido (tick vencido)
+
+    def set_quotes(self, up_bid: float, up_ask: float, dn_bid: float, dn_ask: float):
+        """Actualiza el top of book. True si cambió algún mid."""
+        up_mid  = calc_mid(up_bid, up_ask)
+        dn_mid  = calc_mid(dn_bid, dn_ask)
+        changed = up_mid != self.up_mid or dn_mid != self.dn_mid
+        self.up_bid = up_bid
+        self.up_ask = up_ask
+        self.dn_bid = dn_bid
+        self.dn_ask = dn_ask
+        self.up_mid = up_mid
+        self.dn_mid = dn_mid
+        return changed
+
+    def to_dict(self) -> dict:
+        return {
+            "up_mid":    round(self.up_mid, 4),
+            "dn_mid":    round(self.dn_mid, 4),
+            "up_ask":    round(self.up_ask, 4),
+            "dn_ask":    round(self.dn_ask, 4),
+            "time_left": self.time_left,
+            "error":     self.error,
+            "stale":     self.stale,
+        }
+
+
+class BacktestState:
+    """Estado de la simulación. Se serializa solo en write_state."""
+
+    __slots__ = (
+        "harm_up", "harm_dn",
+        "signal_asset", "signal_side", "signal_div",
+        "entry_window", "position", "pending_resolution", "traded_this_cycle",
+        "capital", "total_pnl", "peak_capital", "max_drawdown",
+        "wins", "losses", "consensus", "skipped", "trades",
+        "cycle", "phase", "next_wake",
+    )
+
+    def __init__(self):
+        self.harm_up            = 0.0
+        self.harm_dn            = 0.0
+        self.signal_asset       = None
+        self.signal_side        = None
+        self.signal_div         = 0.0
+        self.entry_window       = False
+        self.position           = None
+        self.pending_resolution = None   # mantenido por compatibilidad, nunca se usa
+        self.traded_this_cycle  = False
+        self.capital            = CAPITAL_TOTAL
+        self.total_pnl          = 0.0
+        self.peak_capital       = CAPITAL_TOTAL
+        self.max_drawdown       = 0.0
+        self.wins               = 0
+        self.losses             = 0
+        self.consensus          = "NONE"
+        self.skipped            = 0
+        self.trades             = []
+        self.cycle              = 0
+        self.phase              = "DURMIENDO"
+        self.next_wake          = "N/A"
+
+
+markets: dict[str, MarketLeg] = {s: MarketLeg() for s in SYMBOLS}
 
 # Historial de up_mid por símbolo — usado para resolución fallback
 mid_history: dict[str, deque] = {
     s: deque(maxlen=MID_HISTORY_SIZE) for s in SYMBOLS
 }
 
-bt = {
-    "harm_up":      0.0,
-    "harm_dn":      0.0,
-    "signal_asset": None,
-    "signal_side":  None,
-    "signal_div":   0.0,
-    "entry_window": False,
-    "position":     None,
-    "pending_resolution": None,   # mantenido por compatibilidad, nunca se usa
-    "traded_this_cycle": False,
-    "capital":      CAPITAL_TOTAL,
-    "total_pnl":    0.0,
-    "peak_capital": CAPITAL_TOTAL,
-    "max_drawdown": 0.0,
-    "wins":         0,
-    "losses":       0,
-    "consensus":    "NONE",
-    "skipped":      0,
-    "trades":       [],
-    "cycle":        0,
-    "phase":        "DURMIENDO",
-    "next_wake":    "N/A",
-}
+bt = BacktestState()
 
 recent_events = deque(maxlen=50)
 
+# Eventos, trades y estado también por Redis (REDIS_URL)
+bus = RedisBus(REDIS_URL) if REDIS_URL else None
+
 CSV_COLUMNS = [
     "trade_id", "entry_ts", "exit_ts", "duration_s",
     "asset", "side", "consensus",
@@ -143,34 +233,24 @@ CSV_COLUMNS = [
 #  UTILIDADES
 # ═══════════════════════════════════════════════════════
 
+def now_dt() -> datetime:
+    """Hora local según el reloj de strategy_core (virtual durante un replay)."""
+    return datetime.fromtimestamp(now_ts())
+
+
 def log_event(msg: str):
-    ts = datetime.now().strftime("%H:%M:%S")
+    ts = now_dt().strftime("%H:%M:%S")
     entry = f"[{ts}] {msg}"
     recent_events.append(entry)
     log.info(msg)
-
-
-def harmonic_mean(values: list) -> float:
-    if not values or any(v <= 0 for v in values):
-        return 0.0
-    return len(values) / sum(1.0 / v for v in values)
-
-
-def find_cheapest(mids: dict, h_avg: float):
-    if h_avg == 0:
-        return None, 0.0
-    cheapest_name, cheapest_diff = None, 0.0
-    for name, mid in mids.items():
-        diff = mid - h_avg
-        if diff < cheapest_diff:
-            cheapest_diff, cheapest_name = diff, name
-    return cheapest_name, cheapest_diff
+    if bus:
+        bus.event(entry)
 
 
 def min_secs_remaining() -> float | None:
     result = None
     for sym in SYMBOLS:
-        info = markets[sym]["info"]
+        info = markets[sym].info
         if info:
             secs = seconds_remaining(info)
             if secs is not None:
@@ -179,12 +259,12 @@ def min_secs_remaining() -> float | None:
 
 
 def update_drawdown():
-    cap = bt["capital"]
-    if cap > bt["peak_capital"]:
-        bt["peak_capital"] = cap
-    dd = bt["peak_capital"] - cap
-    if dd > bt["max_drawdown"]:
-        bt["max_drawdown"] = dd
+    cap = bt.capital
+    if cap > bt.peak_capital:
+        bt.peak_capital = cap
+    dd = bt.peak_capital - cap
+    if dd > bt.max_drawdown:
+        bt.max_drawdown = dd
 
 
 # ═══════════════════════════════════════════════════════
@@ -225,53 +305,53 @@ def resolve_from_clob_history(sym: str) -> str:
 #  ESCRITURA DE ESTADO PARA DASHBOARD
 # ═══════════════════════════════════════════════════════
 
-def write_state():
-    total_trades = bt["wins"] + bt["losses"]
-    win_rate = (bt["wins"] / total_trades * 100) if total_trades > 0 else 0.0
-    roi = (bt["capital"] - CAPITAL_TOTAL) / CAPITAL_TOTAL * 100
+channel   = StateChannel(STATE_SHM) if STATE_SHM else None
+sinks     = [s for s in (channel, bus) if s]
+publisher = StatePublisher(STATE_FILE, sinks) if STATE_FILE or sinks else None
 
-    state = {
-        "ts": datetime.now().isoformat(),
-        "phase": bt["phase"],
-        "cycle": bt["cycle"],
-        "capital": round(bt["capital"], 4),
-        "total_pnl": round(bt["total_pnl"], 4),
+
+def write_state(flush: bool = False):
+    """Publica el estado; flush=True (entradas/salidas) no espera el límite de tasa."""
+    if publisher:
+        publisher.publish(build_state(), flush)
+
+
+def build_state() -> dict:
+    total_trades = bt.wins + bt.losses
+    win_rate = (bt.wins / total_trades * 100) if total_trades > 0 else 0.0
+    roi = (bt.capital - CAPITAL_TOTAL) / CAPITAL_TOTAL * 100
+
+    return {
+        "ts": now_dt().isoformat(),
+        "phase": bt.phase,
+        "cycle": bt.cycle,
+        "capital": round(bt.capital, 4),
+        "total_pnl": round(bt.total_pnl, 4),
         "roi": round(roi, 2),
-        "peak_capital": round(bt["peak_capital"], 4),
-        "max_drawdown": round(bt["max_drawdown"], 4),
-        "wins": bt["wins"],
-        "losses": bt["losses"],
+        "peak_capital": round(bt.peak_capital, 4),
+        "max_drawdown": round(bt.max_drawdown, 4),
+        "wins": bt.wins,
+        "losses": bt.losses,
         "win_rate": round(win_rate, 1),
-        "skipped": bt["skipped"],
-        "consensus": bt["consensus"],
-        "entry_window": bt["entry_window"],
-        "next_wake": bt["next_wake"],
-        "harm_up": round(bt["harm_up"], 4),
-        "harm_dn": round(bt["harm_dn"], 4),
-        "signal_asset": bt["signal_asset"],
-        "signal_side": bt["signal_side"],
-        "signal_div": round(bt["signal_div"], 4),
-        "position": bt["position"],
+        "skipped": bt.skipped,
+        "consensus": bt.consensus,
+        "entry_window": bt.entry_window,
+        "next_wake": bt.next_wake,
+        "harm_up": round(bt.harm_up, 4),
+        "harm_dn": round(bt.harm_dn, 4),
+        "signal_asset": bt.signal_asset,
+        "signal_side": bt.signal_side,
+        "signal_div": round(bt.signal_div, 4),
+        "position": bt.position,
         "pending_resolution": None,   # siempre None en v5
-        "markets": {
-            sym: {
-                "up_mid": round(markets[sym]["up_mid"], 4),
-                "dn_mid": round(markets[sym]["dn_mid"], 4),
-                "up_ask": round(markets[sym]["up_ask"], 4),
-                "dn_ask": round(markets[sym]["dn_ask"], 4),
-                "time_left": markets[sym]["time_left"],
-                "error": markets[sym]["error"],
-            }
-            for sym in SYMBOLS
-        },
+        "markets": {sym: markets[sym].to_dict() for sym in SYMBOLS},
+        "latency": {ep: st.summary() for ep, st in latency_stats.items()},
+        "tick_interval": scheduler.interval,
+        "late_ticks": scheduler.late,
+        "recorder": recorder.stats() if recorder else None,
         "events": list(recent_events)[-30:],
-        "recent_trades": bt["trades"][-10:],
+        "recent_trades": bt.trades[-10:],
     }
-    try:
-        with open(STATE_FILE, "w") as f:
-            json.dump(state, f)
-    except Exception as e:
-        log.warning(f"write_state error: {e}")
 
 
 # ═══════════════════════════════════════════════════════
@@ -288,23 +368,23 @@ def restore_state_from_csv():
         if not rows:
             return
         last = rows[-1]
-        bt["capital"]      = float(last["capital_after"])
-        bt["total_pnl"]    = float(last["cumulative_pnl"])
-        bt["wins"]         = sum(1 for r in rows if r["outcome"] == "WIN")
-        bt["losses"]       = sum(1 for r in rows if r["outcome"] == "LOSS")
-        bt["trades"]       = [dict(r) for r in rows]
+        bt.capital      = float(last["capital_after"])
+        bt.total_pnl    = float(last["cumulative_pnl"])
+        bt.wins         = sum(1 for r in rows if r["outcome"] == "WIN")
+        bt.losses       = sum(1 for r in rows if r["outcome"] == "LOSS")
+        bt.trades       = [dict(r) for r in rows]
         peak = CAPITAL_TOTAL
         for r in rows:
             cap = float(r["capital_after"])
             if cap > peak:
                 peak = cap
             dd = peak - cap
-            if dd > bt["max_drawdown"]:
-                bt["max_drawdown"] = dd
-        bt["peak_capital"] = peak
-        total = bt["wins"] + bt["losses"]
-        log.info(f"Estado restaurado — {total} trades | Capital: ${bt['capital']:.4f} | "
-                 f"PnL: ${bt['total_pnl']:+.4f} | W:{bt['wins']} L:{bt['losses']}")
+            if dd > bt.max_drawdown:
+                bt.max_drawdown = dd
+        bt.peak_capital = peak
+        total = bt.wins + bt.losses
+        log.info(f"Estado restaurado — {total} trades | Capital: ${bt.capital:.4f} | "
+                 f"PnL: ${bt.total_pnl:+.4f} | W:{bt.wins} L:{bt.losses}")
     except Exception as e:
         log.warning(f"No se pudo restaurar estado desde CSV: {e}")
 
@@ -313,157 +393,313 @@ def restore_state_from_csv():
 #  DISCOVERY Y FETCH
 # ═══════════════════════════════════════════════════════
 
+async def discover_one(sym: str):
+    try:
+        info = await find_active_market_async(sym)
+        if info:
+            markets[sym].info  = info
+            markets[sym].error = None
+            # Limpiar historial al descubrir ciclo nuevo
+            mid_history[sym].clear()
+            log_event(f"{sym}: mercado encontrado — {info.get('question','')[:50]}")
+        else:
+            markets[sym].info  = None
+            markets[sym].error = "sin mercado activo"
+            log_event(f"{sym}: no se encontró mercado activo")
+    except Exception as e:
+        markets[sym].info  = None
+        markets[sym].error = str(e)
+        log_event(f"{sym}: error en discovery — {e}")
+
+
+def start_cycle():
+    """Habilita una entrada nueva (bot principal y flota sombra)."""
+    bt.traded_this_cycle = False
+    if shadow:
+        shadow.new_cycle()
+
+
 async def discover_all():
-    loop = asyncio.get_event_loop()
+    # Rollover sin red si el prefetcher ya resolvió el slot que está corriendo
+    slot_ts = get_current_slot_ts()
+    ready   = prefetched.get(slot_ts, {})
+    pending = []
     for sym in SYMBOLS:
-        try:
-            info = await loop.run_in_executor(None, find_active_market, sym)
+        info = ready.get(sym)
+        if info:
+            markets[sym].info  = info
+            markets[sym].error = None
+            mid_history[sym].clear()
+            log_event(f"{sym}: mercado listo (prefetch) — {info.get('question','')[:50]}")
+        else:
+            pending.append(sym)
+
+    # Los símbolos se descubren en paralelo: el discovery ocurre ~90s antes
+    # del cierre y no debe comerse la ventana de entrada.
+    await asyncio.gather(*[discover_one(sym) for sym in pending])
+    start_cycle()
+    if feed:
+        await subscribe_feed()
+    write_state()
+
+
+# ═══════════════════════════════════════════════════════
+#  PREFETCH DEL SLOT SIGUIENTE
+# ═══════════════════════════════════════════════════════
+
+# slot_ts -> {símbolo: market info}
+prefetched: dict[int, dict[str, dict]] = {}
+
+
+async def prefetch_next_slot():
+    """Resuelve metadata y token ids del slot siguiente mientras corre el actual."""
+    current = get_current_slot_ts()
+    slot_ts = current + SLOT_STEP
+    ready   = prefetched.setdefault(slot_ts, {})
+    missing = [s for s in SYMBOLS if s not in ready]
+    if missing:
+        results = await asyncio.gather(*[fetch_slot_market_async(s, slot_ts) for s in missing])
+        for sym, info in zip(missing, results):
             if info:
-                markets[sym]["info"]  = info
-                markets[sym]["error"] = None
-                # Limpiar historial al descubrir ciclo nuevo
-                mid_history[sym].clear()
-                log_event(f"{sym}: mercado encontrado — {info.get('question','')[:50]}")
-            else:
-                markets[sym]["info"]  = None
-                markets[sym]["error"] = "sin mercado activo"
-                log_event(f"{sym}: no se encontró mercado activo")
+                ready[sym] = info
+    for ts in [ts for ts in prefetched if ts < current]:
+        del prefetched[ts]
+
+
+async def prefetch_loop():
+    while True:
+        try:
+            await prefetch_next_slot()
         except Exception as e:
-            markets[sym]["info"]  = None
-            markets[sym]["error"] = str(e)
-            log_event(f"{sym}: error en discovery — {e}")
-    bt["traded_this_cycle"] = False
-    write_state()
+            log.warning(f"prefetch error: {e}")
+        await asyncio.sleep(real_secs(PREFETCH_INTERVAL))
+
+
+def calc_mid(bid: float, ask: float) -> float:
+    if bid > 0 and ask > 0:
+        return round((bid + ask) / 2, 4)
+    elif bid > 0:
+        return round(bid, 4)
+    elif ask > 0:
+        return round(ask, 4)
+    return 0.0
+
+
+def apply_quotes(sym: str, up_bid: float, up_ask: float, dn_bid: float, dn_ask: float):
+    leg = markets[sym]
+    if leg.set_quotes(up_bid, up_ask, dn_bid, dn_ask):
+        signals.set(sym, leg.up_mid, leg.dn_mid)
+
+
+def sample_market(sym: str, stale: bool = False):
+    """Cierre de tick por símbolo: historial de up_mid, tiempo restante y expiración."""
+    info   = markets[sym].info
+    up_mid = markets[sym].up_mid
+
+    # ── Acumular historial de up_mid para resolución fallback ──
+    # (un quote stale ya está en el historial: no se repite)
+    if up_mid > 0 and not stale:
+        mid_history[sym].append(up_mid)
+    if recorder and info:
+        record_tick(sym, stale)
+
+    secs = seconds_remaining(info)
+    if secs is not None:
+        markets[sym].time_left = f"{int(secs)}s"
+        if secs <= 0:
+            markets[sym].info = None
+    else:
+        markets[sym].time_left = "N/A"
+    markets[sym].error = None
+    markets[sym].stale = stale
 
 
-async def fetch_one(sym: str):
-    info = markets[sym]["info"]
-    if not info:
+# Request batch que superó el deadline de un tick: se reaprovecha en el
+# siguiente en vez de apilar requests nuevos sobre un CLOB lento.
+# (token_ids, task, [requests hechos por el task])
+_inflight_books: tuple[list[str], asyncio.Task, list[int]] | None = None
+
+
+def _charge_requests(sent: list[int]):
+    """tick_cost() ya cobró el batch: el resto (fallback por token, duplicados) va aparte."""
+    scheduler.charge(max(0, sent[0] - 1))
+
+
+async def fetch_all():
+    """Un solo round trip por tick: todos los books del basket en un batch."""
+    polled = []
+    for sym in SYMBOLS:
+        info = markets[sym].info
+        if not info:
+            continue
+        if feed and feed.has_book(info["up_token_id"]) and feed.has_book(info["down_token_id"]):
+            # Modo WS: los quotes ya llegaron por on_book_update, solo cerrar el tick
+            sample_market(sym)
+        else:
+            polled.append(sym)
+    if not polled:
         return
-    loop = asyncio.get_event_loop()
+
+    token_ids = []
+    for sym in polled:
+        info = markets[sym].info
+        token_ids += [info["up_token_id"], info["down_token_id"]]
+    global _inflight_books
+    if _inflight_books and _inflight_books[0] == token_ids:
+        _, task, sent = _inflight_books
+    else:
+        if _inflight_books:
+            _inflight_books[1].cancel()
+            _charge_requests(_inflight_books[2])
+        # Con el recorder activo hacen falta los niveles, no solo el top of book
+        # (METRICS_FULL trae 8 por lado: es la profundidad máxima grabada en poll)
+        fields = METRICS_FULL if recorder else METRICS_TOP
+        sent   = [0]
+        task   = asyncio.create_task(get_order_books_metrics_async(token_ids, fields=fields, sent=sent))
+    _inflight_books = None
+
+    done, _ = await asyncio.wait({task}, timeout=TICK_DEADLINE)
+    if not done:
+        # Deadline vencido: el tick sigue con el último book conocido
+        _inflight_books = (token_ids, task, sent)
+        for sym in polled:
+            sample_market(sym, stale=True)
+        return
+    _charge_requests(sent)
     try:
-        up_metrics, err_up = await loop.run_in_executor(
-            None, get_order_book_metrics, info["up_token_id"]
-        )
-        dn_metrics, err_dn = await loop.run_in_executor(
-            None, get_order_book_metrics, info["down_token_id"]
-        )
+        books = task.result()
+    except Exception as e:
+        for sym in polled:
+            markets[sym].error = str(e)
+        return
 
+    for sym in polled:
+        info = markets[sym].info
+        up_metrics, err_up = books.get(info["up_token_id"], (None, None))
+        dn_metrics, err_dn = books.get(info["down_token_id"], (None, None))
         if up_metrics and dn_metrics:
-            markets[sym]["up_bid"] = up_metrics["best_bid"]
-            markets[sym]["up_ask"] = up_metrics["best_ask"]
-            markets[sym]["dn_bid"] = dn_metrics["best_bid"]
-            markets[sym]["dn_ask"] = dn_metrics["best_ask"]
-
-            def calc_mid(bid, ask):
-                if bid > 0 and ask > 0:
-                    return round((bid + ask) / 2, 4)
-                elif bid > 0:
-                    return round(bid, 4)
-                elif ask > 0:
-                    return round(ask, 4)
-                return 0.0
-
-            up_mid = calc_mid(up_metrics["best_bid"], up_metrics["best_ask"])
-            markets[sym]["up_mid"] = up_mid
-            markets[sym]["dn_mid"] = calc_mid(dn_metrics["best_bid"], dn_metrics["best_ask"])
-
-            # ── Acumular historial de up_mid para resolución fallback ──
-            if up_mid > 0:
-                mid_history[sym].append(up_mid)
-
-            secs = seconds_remaining(info)
-            if secs is not None:
-                markets[sym]["time_left"] = f"{int(secs)}s"
-                if secs <= 0:
-                    markets[sym]["info"] = None
-            else:
-                markets[sym]["time_left"] = "N/A"
-            markets[sym]["error"] = None
+            if recorder:
+                leg_levels[sym] = (up_metrics.top_bids, up_metrics.top_asks,
+                                   dn_metrics.top_bids, dn_metrics.top_asks)
+            apply_quotes(
+                sym,
+                up_metrics.best_bid, up_metrics.best_ask,
+                dn_metrics.best_bid, dn_metrics.best_ask,
+            )
+            sample_market(sym)
         else:
-            markets[sym]["error"] = err_up or err_dn or "error ob"
-    except Exception as e:
-        markets[sym]["error"] = str(e)
+            markets[sym].error = err_up or err_dn or "error ob"
 
 
-async def fetch_all():
-    await asyncio.gather(*[fetch_one(sym) for sym in SYMBOLS])
+# ═══════════════════════════════════════════════════════
+#  GRABACIÓN DE TICKS (TICK_RECORD_DIR)
+# ═══════════════════════════════════════════════════════
+
+recorder = TickRecorder(TICK_RECORD_DIR) if TICK_RECORD_DIR else None
+
+# símbolo -> (up_bids, up_asks, dn_bids, dn_asks) del último batch REST
+leg_levels: dict[str, tuple] = {}
+
+
+def record_tick(sym: str, stale: bool = False):
+    """Encola el tick de ambas patas del símbolo (no bloquea el loop)."""
+    leg  = markets[sym]
+    info = leg.info
+    if feed and feed.has_book(info["up_token_id"]) and feed.has_book(info["down_token_id"]):
+        up, dn = feed.books[info["up_token_id"]], feed.books[info["down_token_id"]]
+        levels = (up.top_bids(TICK_RECORD_LEVELS), up.top_asks(TICK_RECORD_LEVELS),
+                  dn.top_bids(TICK_RECORD_LEVELS), dn.top_asks(TICK_RECORD_LEVELS))
+    else:
+        levels = leg_levels.get(sym, ((), (), (), ()))
+    recorder.record(now_ts(), market_slot_ts(info) or 0, sym, stale,
+                    leg.up_mid, levels[0], levels[1], leg.dn_mid, levels[2], levels[3])
+
+
+# ═══════════════════════════════════════════════════════
+#  FEED WEBSOCKET (FEED_MODE=ws)
+# ═══════════════════════════════════════════════════════
+
+# token_id -> (símbolo, "UP" | "DOWN")
+token_index: dict[str, tuple[str, str]] = {}
+
+
+def on_book_update(token_id: str):
+    """Empuja el top of book de un token a markets[sym] apenas llega del WS."""
+    entry = token_index.get(token_id)
+    if not entry:
+        return
+    sym  = entry[0]
+    info = markets[sym].info
+    if not info:
+        return
+    up = feed.best_bid_ask(info["up_token_id"])
+    dn = feed.best_bid_ask(info["down_token_id"])
+    if up is None or dn is None:
+        return    # falta el snapshot de una pata: no escribir un mid de 0
+    apply_quotes(sym, *up, *dn)
+    if not bt.position:
+        # Con dirty tracking la señal se puede reevaluar en cada update del book
+        compute_signals()
+
+
+async def subscribe_feed():
+    token_index.clear()
+    for sym in SYMBOLS:
+        info = markets[sym].info
+        if info:
+            token_index[info["up_token_id"]]   = (sym, "UP")
+            token_index[info["down_token_id"]] = (sym, "DOWN")
+    await feed.set_assets(list(token_index))
+
+
+feed = MarketFeed(on_update=on_book_update) if FEED_MODE == "ws" else None
 
 
 # ═══════════════════════════════════════════════════════
 #  SEÑALES Y LÓGICA DE TRADING
 # ═══════════════════════════════════════════════════════
 
-def compute_signals():
-    def normalized_up(s):
-        mid = markets[s]["up_mid"]
-        if mid >= RESOLVED_UP_THRESH:
-            return 1.0
-        if mid <= RESOLVED_DN_THRESH:
-            return 0.0
-        return mid
+signals = BasketEngine(
+    SYMBOLS,
+    resolved_up=RESOLVED_UP_THRESH,
+    resolved_dn=RESOLVED_DN_THRESH,
+    consensus_full=CONSENSUS_FULL,
+    consensus_soft=CONSENSUS_SOFT,
+)
 
-    def normalized_dn(s):
-        mid = markets[s]["dn_mid"]
-        if mid >= RESOLVED_UP_THRESH:
-            return 1.0
-        if mid <= RESOLVED_DN_THRESH:
-            return 0.0
-        return mid
 
-    up_mids = {s: normalized_up(s) for s in SYMBOLS if markets[s]["up_mid"] > 0}
-    dn_mids = {s: normalized_dn(s) for s in SYMBOLS if markets[s]["dn_mid"] > 0}
+def compute_signals():
+    sig = signals.evaluate()
+    if sig is None:
+        return   # ningún mid cambió: la señal vigente sigue siendo válida
 
-    if len(up_mids) < 2:
-        bt["signal_asset"] = None
+    if not sig.ready:
+        bt.signal_asset = None
         return
 
-    harm_up = harmonic_mean(list(up_mids.values()))
-    harm_dn = harmonic_mean(list(dn_mids.values()))
-    bt["harm_up"] = harm_up
-    bt["harm_dn"] = harm_dn
-
-    cheapest_up, div_up = find_cheapest(up_mids, harm_up)
-    cheapest_dn, div_dn = find_cheapest(dn_mids, harm_dn)
-
-    if abs(div_up) >= abs(div_dn) and cheapest_up:
-        bt["signal_asset"] = cheapest_up
-        bt["signal_side"]  = "UP"
-        bt["signal_div"]   = div_up
-    elif cheapest_dn:
-        bt["signal_asset"] = cheapest_dn
-        bt["signal_side"]  = "DOWN"
-        bt["signal_div"]   = div_dn
+    bt.harm_up = sig.harm_up
+    bt.harm_dn = sig.harm_dn
+    if sig.asset:
+        bt.signal_asset = sig.asset
+        bt.signal_side  = sig.side
+        bt.signal_div   = sig.div
+        bt.consensus    = sig.consensus
     else:
-        bt["signal_asset"] = None
-
-    if bt["signal_asset"] and bt["signal_side"]:
-        peers = [s for s in SYMBOLS if s != bt["signal_asset"]]
-        if bt["signal_side"] == "UP":
-            peer_vals = [markets[p]["up_mid"] for p in peers if markets[p]["up_mid"] > 0]
-        else:
-            peer_vals = [markets[p]["dn_mid"] for p in peers if markets[p]["dn_mid"] > 0]
-
-        if len(peer_vals) == 2 and all(v > CONSENSUS_FULL for v in peer_vals):
-            bt["consensus"] = "FULL"
-        elif len(peer_vals) >= 1 and sum(1 for v in peer_vals if v > CONSENSUS_SOFT) >= 1:
-            bt["consensus"] = "SOFT"
-        else:
-            bt["consensus"] = "NONE"
+        bt.signal_asset = None
 
 
 def check_entry():
-    if bt["traded_this_cycle"]:
+    if bt.traded_this_cycle:
         return
-    if not bt["entry_window"]:
+    if not bt.entry_window:
         return
-    if bt["consensus"] != "FULL":
-        bt["skipped"] += 1
+    if bt.consensus != "FULL":
+        bt.skipped += 1
         return
-    if not bt["signal_asset"]:
+    if not bt.signal_asset:
         return
 
-    div_abs = abs(bt["signal_div"])
+    div_abs = abs(bt.signal_div)
     if div_abs < DIVERGENCE_THRESHOLD:
         return
     if div_abs > DIVERGENCE_MAX:
@@ -471,52 +707,55 @@ def check_entry():
             f"SKIP — gap={div_abs*100:.1f}pts excede máximo {DIVERGENCE_MAX*100:.0f}pts "
             f"(divergencia anómala, posible mercado roto)"
         )
-        bt["skipped"] += 1
+        bt.skipped += 1
         return
 
-    sym  = bt["signal_asset"]
-    side = bt["signal_side"]
+    sym  = bt.signal_asset
+    side = bt.signal_side
+
+    if markets[sym].stale:
+        return
 
     if side == "UP":
-        entry_ask = markets[sym]["up_ask"]
-        entry_bid = markets[sym]["up_bid"]
-        entry_mid = markets[sym]["up_mid"]
+        entry_ask = markets[sym].up_ask
+        entry_bid = markets[sym].up_bid
+        entry_mid = markets[sym].up_mid
     else:
-        entry_ask = markets[sym]["dn_ask"]
-        entry_bid = markets[sym]["dn_bid"]
-        entry_mid = markets[sym]["dn_mid"]
+        entry_ask = markets[sym].dn_ask
+        entry_bid = markets[sym].dn_bid
+        entry_mid = markets[sym].dn_mid
 
     if entry_ask <= 0 or entry_ask >= 1:
         return
 
-    up_mid = markets[sym]["up_mid"]
-    dn_mid = markets[sym]["dn_mid"]
+    up_mid = markets[sym].up_mid
+    dn_mid = markets[sym].dn_mid
     if up_mid >= RESOLVED_UP_THRESH or up_mid <= RESOLVED_DN_THRESH or \
        dn_mid >= RESOLVED_UP_THRESH or dn_mid <= RESOLVED_DN_THRESH:
         log_event(f"SKIP {side} {sym} — activo ya resuelto (up={up_mid:.4f} dn={dn_mid:.4f})")
-        bt["skipped"] += 1
+        bt.skipped += 1
         return
 
     if entry_ask < ENTRY_MIN_PRICE:
         log_event(
             f"SKIP {side} {sym} — ask={entry_ask:.4f} bajo mínimo {ENTRY_MIN_PRICE}"
         )
-        bt["skipped"] += 1
+        bt.skipped += 1
         return
 
     shares = round(ENTRY_USD / entry_ask, 6)
     secs   = min_secs_remaining() or 0
 
     peers        = [s for s in SYMBOLS if s != sym]
-    peer_snaps   = {p: {"up_mid": markets[p]["up_mid"], "dn_mid": markets[p]["dn_mid"]} for p in peers}
-    harm_entry   = bt["harm_up"] if side == "UP" else bt["harm_dn"]
-    gap_entry    = bt["signal_div"]
-    capital_before = bt["capital"]
+    peer_snaps   = {p: {"up_mid": markets[p].up_mid, "dn_mid": markets[p].dn_mid} for p in peers}
+    harm_entry   = bt.harm_up if side == "UP" else bt.harm_dn
+    gap_entry    = bt.signal_div
+    capital_before = bt.capital
 
-    bt["capital"] -= ENTRY_USD
-    bt["traded_this_cycle"] = True
+    bt.capital -= ENTRY_USD
+    bt.traded_this_cycle = True
 
-    bt["position"] = {
+    bt.position = {
         "asset":         sym,
         "side":          side,
         "entry_price":   entry_ask,
@@ -527,40 +766,40 @@ def check_entry():
         "secs_left_entry": secs,
         "harm_entry":    harm_entry,
         "gap_entry":     gap_entry,
-        "entry_ts":      datetime.now().isoformat(),
-        "consensus_entry": bt["consensus"],
+        "entry_ts":      now_dt().isoformat(),
+        "consensus_entry": bt.consensus,
         "peer_snaps":    peer_snaps,
         "capital_before": capital_before,
         "market_info_snapshot": {
-            "condition_id": markets[sym]["info"].get("condition_id") if markets[sym]["info"] else None,
+            "condition_id": markets[sym].info.get("condition_id") if markets[sym].info else None,
         },
     }
 
     log_event(
         f"ENTRADA {side} {sym} @ ask={entry_ask:.4f} | "
         f"div={gap_entry*100:+.1f}pts | arm={harm_entry:.4f} | "
-        f"shares={shares:.4f} | capital=${bt['capital']:.2f}"
+        f"shares={shares:.4f} | capital=${bt.capital:.2f}"
     )
-    write_state()
+    write_state(flush=True)
 
 
 def check_stop_loss():
-    pos  = bt["position"]
+    pos  = bt.position
     if not pos:
         return
     sym  = pos["asset"]
     side = pos["side"]
-    current_bid = markets[sym]["up_bid"] if side == "UP" else markets[sym]["dn_bid"]
+    current_bid = markets[sym].up_bid if side == "UP" else markets[sym].dn_bid
     if current_bid <= STOP_LOSS_PRICE and current_bid > 0:
         pnl = round(pos["shares"] * current_bid - ENTRY_USD, 6)
-        bt["capital"]   += ENTRY_USD + pnl
-        bt["total_pnl"] += pnl
-        bt["losses"]    += 1
+        bt.capital   += ENTRY_USD + pnl
+        bt.total_pnl += pnl
+        bt.losses    += 1
         update_drawdown()
         log_event(f"STOP LOSS {side} {sym} @ bid={current_bid:.4f} | PnL=${pnl:+.4f}")
         _record_trade_sl(pos, current_bid, pnl)
-        bt["position"] = None
-        write_state()
+        bt.position = None
+        write_state(flush=True)
 
 
 def _apply_resolution(pos, resolved):
@@ -569,20 +808,20 @@ def _apply_resolution(pos, resolved):
     if resolved == side:
         pnl     = round((pos["shares"] - 1) * ENTRY_USD, 6)
         outcome = "WIN"
-        bt["wins"] += 1
+        bt.wins += 1
     else:
         pnl     = -ENTRY_USD
         outcome = "LOSS"
-        bt["losses"] += 1
-    bt["capital"]   += ENTRY_USD + pnl
-    bt["total_pnl"] += pnl
+        bt.losses += 1
+    bt.capital   += ENTRY_USD + pnl
+    bt.total_pnl += pnl
     update_drawdown()
     log_event(
         f"RESOLUCIÓN {outcome} {side} {sym} → {resolved} | "
-        f"PnL=${pnl:+.4f} | Capital=${bt['capital']:.4f}"
+        f"PnL=${pnl:+.4f} | Capital=${bt.capital:.4f}"
     )
     _record_trade(pos, resolved, outcome, pnl)
-    write_state()
+    write_state(flush=True)
 
 
 def check_resolution():
@@ -594,12 +833,12 @@ def check_resolution():
          fallback: promedio de las últimas MID_HISTORY_SIZE muestras de up_mid.
       3. Si el historial está vacío → LOSS conservador + log de advertencia.
     """
-    pos = bt["position"]
+    pos = bt.position
     if not pos:
         return
 
     sym    = pos["asset"]
-    up_mid = markets[sym]["up_mid"]
+    up_mid = markets[sym].up_mid
 
     # 1. Precio concluyente en CLOB
     resolved = None
@@ -610,27 +849,27 @@ def check_resolution():
 
     if resolved:
         _apply_resolution(pos, resolved)
-        bt["position"] = None
+        bt.position = None
         return
 
     # 2. Mercado expirado sin precio concluyente → fallback CLOB
-    if markets[sym]["info"] is None:
+    if markets[sym].info is None:
         resolved = resolve_from_clob_history(sym)
 
         if resolved == "_UNKNOWN":
             # Sin historial ni precio — LOSS conservador
             log_event(f"FALLBACK {sym}: resolución imposible — LOSS conservador")
             pnl = -ENTRY_USD
-            bt["capital"]   += ENTRY_USD + pnl
-            bt["total_pnl"] += pnl
-            bt["losses"]    += 1
+            bt.capital   += ENTRY_USD + pnl
+            bt.total_pnl += pnl
+            bt.losses    += 1
             update_drawdown()
             _record_trade(pos, "UNKNOWN", "LOSS", pnl)
         else:
             _apply_resolution(pos, resolved)
 
-        bt["position"] = None
-        write_state()
+        bt.position = None
+        write_state(flush=True)
 
 
 # ═══════════════════════════════════════════════════════
@@ -638,9 +877,9 @@ def check_resolution():
 # ═══════════════════════════════════════════════════════
 
 def _build_trade_record(pos, exit_type, exit_price, resolved, outcome, pnl):
-    exit_ts    = datetime.now().isoformat()
+    exit_ts    = now_dt().isoformat()
     duration_s = round((datetime.fromisoformat(exit_ts) - datetime.fromisoformat(pos["entry_ts"])).total_seconds(), 1)
-    trade_number = bt["wins"] + bt["losses"]
+    trade_number = bt.wins + bt.losses
 
     peers      = [s for s in SYMBOLS if s != pos["asset"]]
     peer_snaps = pos.get("peer_snaps", {})
@@ -684,6 +923,11 @@ def _build_trade_record(pos, exit_type, exit_price, resolved, outcome, pnl):
         "peer2_sym":        peers[1] if len(peers) > 1 else "",
         "peer2_side_mid":   round(p2_side_mid, 6),
         "peer2_opp_mid":    round(p2_opp_mid, 6),
+        # Todos los pares (el CSV solo tiene columnas para los dos primeros)
+        "peers":            [
+            {"sym": p, "side_mid": round(peer_mids(p)[0], 6), "opp_mid": round(peer_mids(p)[1], 6)}
+            for p in peers
+        ],
         "sl_price":         sl_price,
         "exit_type":        exit_type,
         "exit_price":       round(exit_price, 6),
@@ -694,16 +938,18 @@ def _build_trade_record(pos, exit_type, exit_price, resolved, outcome, pnl):
         "max_possible_win": max_win,
         "outcome":          outcome,
         "capital_before":   round(pos["capital_before"], 4),
-        "capital_after":    round(bt["capital"], 4),
-        "cumulative_pnl":   round(bt["total_pnl"], 6),
+        "capital_after":    round(bt.capital, 4),
+        "cumulative_pnl":   round(bt.total_pnl, 6),
         "trade_number":     trade_number,
     }
 
 
 def _save_csv(record: dict):
+    if not CSV_FILE:
+        return
     file_exists = os.path.isfile(CSV_FILE)
     with open(CSV_FILE, "a", newline="", encoding="utf-8") as f:
-        writer = csv.DictWriter(f, fieldnames=CSV_COLUMNS)
+        writer = csv.DictWriter(f, fieldnames=CSV_COLUMNS, extrasaction="ignore")
         if not file_exists:
             writer.writeheader()
         writer.writerow(record)
@@ -712,42 +958,242 @@ def _save_csv(record: dict):
 def _record_trade(pos, resolved, outcome, pnl):
     exit_price = 1.0 if resolved == pos["side"] else 0.0
     record = _build_trade_record(pos, "RESOLUTION", exit_price, resolved, outcome, pnl)
-    bt["trades"].append(record)
+    bt.trades.append(record)
+    if bus:
+        bus.trade(record)
     _save_csv(record)
     _save_log()
 
 
 def _record_trade_sl(pos, exit_bid, pnl):
     record = _build_trade_record(pos, "STOP_LOSS", exit_bid, None, "LOSS", pnl)
-    bt["trades"].append(record)
+    bt.trades.append(record)
+    if bus:
+        bus.trade(record)
     _save_csv(record)
     _save_log()
 
 
 def _save_log():
-    total = bt["wins"] + bt["losses"]
+    if not LOG_FILE:
+        return
+    total = bt.wins + bt.losses
     with open(LOG_FILE, "w") as f:
         json.dump({
             "summary": {
                 "capital_inicial": CAPITAL_TOTAL,
-                "capital_actual":  round(bt["capital"], 4),
-                "total_pnl_usd":   round(bt["total_pnl"], 4),
-                "roi_pct":         round((bt["capital"] - CAPITAL_TOTAL) / CAPITAL_TOTAL * 100, 2),
-                "max_drawdown":    round(bt["max_drawdown"], 4),
-                "wins":            bt["wins"],
-                "losses":          bt["losses"],
-                "win_rate":        round(bt["wins"] / total * 100, 1) if total else 0,
-                "skipped":         bt["skipped"],
+                "capital_actual":  round(bt.capital, 4),
+                "total_pnl_usd":   round(bt.total_pnl, 4),
+                "roi_pct":         round((bt.capital - CAPITAL_TOTAL) / CAPITAL_TOTAL * 100, 2),
+                "max_drawdown":    round(bt.max_drawdown, 4),
+                "wins":            bt.wins,
+                "losses":          bt.losses,
+                "win_rate":        round(bt.wins / total * 100, 1) if total else 0,
+                "skipped":         bt.skipped,
                 "entry_usd":       ENTRY_USD,
             },
-            "trades": bt["trades"],
+            "trades": bt.trades,
         }, f, indent=2)
 
 
+# ═══════════════════════════════════════════════════════
+#  FLOTA SOMBRA (SHADOW_GRID)
+# ═══════════════════════════════════════════════════════
+
+def _load_shadow() -> ShadowFleet | None:
+    if not SHADOW_GRID:
+        return None
+    defaults = {
+        "DIVERGENCE_THRESHOLD": DIVERGENCE_THRESHOLD,
+        "DIVERGENCE_MAX":       DIVERGENCE_MAX,
+        "ENTRY_OPEN_SECS":      ENTRY_OPEN_SECS,
+        "ENTRY_WINDOW_SECS":    ENTRY_WINDOW_SECS,
+        "ENTRY_MIN_PRICE":      ENTRY_MIN_PRICE,
+        "STOP_LOSS_PRICE":      STOP_LOSS_PRICE,
+    }
+    try:
+        fleet = ShadowFleet.from_grid(
+            SHADOW_GRID, defaults,
+            symbols=SYMBOLS,
+            entry_usd=ENTRY_USD,
+            capital=CAPITAL_TOTAL,
+            entry_close_secs=ENTRY_CLOSE_SECS,
+            resolved_up=RESOLVED_UP_THRESH,
+            resolved_dn=RESOLVED_DN_THRESH,
+            trades_file=SHADOW_TRADES_FILE,
+        )
+    except Exception as e:
+        log.warning(f"SHADOW_GRID inválido ({SHADOW_GRID}): {e}")
+        return None
+    log.info(f"Flota sombra: {len(fleet)} variantes")
+    return fleet
+
+
+shadow = _load_shadow()
+_shadow_written = 0.0
+
+
+def _history_vote(sym: str) -> int:
+    """Misma regla que resolve_from_clob_history, sin logs: +1 UP, -1 DOWN, 0 sin resolución."""
+    history = mid_history[sym]
+    if not history:
+        return 0
+    avg = sum(history) / len(history)
+    return 1 if avg > 0.5 else -1 if avg < 0.5 else 0
+
+
+def step_shadow(secs: float | None):
+    """Avanza todas las variantes sombra con los quotes y la señal de este tick."""
+    global _shadow_written
+    if not shadow:
+        return
+    # Con el bot principal sin posición run_tick calcula la señal igual; con
+    # posición solo hace falta si alguna variante sombra puede entrar.
+    if not bt.position or shadow.wants_signal(secs):
+        compute_signals()
+
+    legs = [markets[s] for s in SYMBOLS]
+    signal_leg = markets.get(bt.signal_asset) if bt.signal_asset else None
+    closed = shadow.step(
+        now_dt().isoformat(), secs,
+        np.array([l.up_bid for l in legs]), np.array([l.up_ask for l in legs]), np.array([l.up_mid for l in legs]),
+        np.array([l.dn_bid for l in legs]), np.array([l.dn_ask for l in legs]), np.array([l.dn_mid for l in legs]),
+        np.array([l.info is None for l in legs]),
+        np.array([_history_vote(s) for s in SYMBOLS]),
+        bt.signal_asset, bt.signal_side, bt.signal_div, bt.consensus,
+        stale=bool(signal_leg and signal_leg.stale),
+    )
+
+    now = now_ts()
+    if closed or now - _shadow_written >= SHADOW_WRITE_SECS:
+        _shadow_written = now
+        shadow.publish_summary(SHADOW_FILE, flush=bool(closed))   # escribe el hilo del publisher
+
+
+# ═══════════════════════════════════════════════════════
+#  SCHEDULER DE TICKS
+# ═══════════════════════════════════════════════════════
+
+class TickScheduler:
+    """
+    Ticks a tasa fija (el período no incluye el tiempo de trabajo del tick) con
+    compensación de drift, y un token bucket de requests: las fases lentas
+    acumulan presupuesto que la ventana de entrada puede gastar en ráfaga.
+    """
+
+    def __init__(self, budget_rps: float = REQUEST_BUDGET_RPS, burst: float = REQUEST_BUDGET_BURST):
+        self.rate      = budget_rps
+        self.burst     = burst
+        self.tokens    = burst
+        self.last      = time.monotonic()
+        self.next_tick = None
+        self.interval  = POLL_INTERVAL
+        self.late      = 0      # ticks que arrancaron tarde (trabajo > período)
+
+    def reset(self):
+        self.next_tick = None
+
+    def charge(self, cost: float):
+        """Descuenta requests ya hechos fuera de tick_cost(); el próximo wait() los paga."""
+        self.tokens -= cost
+
+    def _refill(self, now: float):
+        self.tokens = min(self.burst, self.tokens + (now - self.last) * self.rate)
+        self.last   = now
+
+    async def wait(self, interval: float, cost: float = 1.0):
+        self.interval = interval
+        now = time.monotonic()
+        if self.next_tick is None:
+            self.next_tick = now
+        self.next_tick += real_secs(interval)
+        delay = self.next_tick - now
+        if delay < 0:
+            # Atrasado: no recuperar los ticks perdidos en ráfaga
+            self.late     += 1
+            self.next_tick = now
+            delay          = 0.0
+
+        self._refill(now)
+        if cost > 0 and self.tokens < cost:
+            delay = max(delay, (cost - self.tokens) / self.rate)
+            self.next_tick = now + delay
+
+        if delay > 0:
+            await asyncio.sleep(delay)
+        self._refill(time.monotonic())
+        self.tokens -= cost
+
+
+scheduler = TickScheduler()
+
+# Tick-to-decision: desde el pedido de books hasta la decisión de run_tick
+tick_latency = get_latency_stats("tick")
+
+
+def poll_interval(secs: float | None) -> float:
+    if bt.entry_window and not bt.position and not bt.traded_this_cycle:
+        return ENTRY_POLL_INTERVAL
+    if bt.position or bt.traded_this_cycle or (secs is not None and secs < ENTRY_OPEN_SECS):
+        return WATCH_POLL_INTERVAL
+    return POLL_INTERVAL
+
+
+def tick_cost() -> float:
+    """
+    Requests al CLOB que consume un tick: 1 batch, 0 si el feed WS cubre todo.
+    Si el batch falla y fetch_all cae a /book por token, esos requests (y los
+    duplicados de _hedged) se cobran aparte con scheduler.charge().
+    """
+    for sym in SYMBOLS:
+        info = markets[sym].info
+        if info and not (feed and feed.has_book(info["up_token_id"]) and feed.has_book(info["down_token_id"])):
+            return 1.0
+    return 0.0
+
+
 # ═══════════════════════════════════════════════════════
 #  LOOP PRINCIPAL
 # ═══════════════════════════════════════════════════════
 
+def run_tick() -> bool:
+    """
+    Lógica de trading de un tick sobre los quotes ya cargados en markets
+    (fetch_all en vivo, replay.py al reproducir). True si el ciclo expiró
+    sin posición y hay que descubrir el siguiente.
+    """
+    secs = min_secs_remaining()
+    bt.entry_window = (
+        secs is not None and
+        secs <= ENTRY_WINDOW_SECS and
+        secs >= ENTRY_OPEN_SECS
+        and secs > ENTRY_CLOSE_SECS
+    )
+
+    if bt.position:
+        check_stop_loss()
+    if bt.position:
+        check_resolution()
+
+    step_shadow(secs)
+
+    if all(markets[s].info is None for s in SYMBOLS):
+        if bt.position:
+            log_event("Mercado expirado con posicion abierta — resolviendo con historial CLOB...")
+            check_resolution()
+        if not bt.position:
+            log_event("Ciclo expirado — buscando nuevo ciclo...")
+            return True
+        return False
+
+    if not bt.position:
+        compute_signals()
+        check_entry()
+
+    write_state()
+    return False
+
+
 async def main_loop():
     log_event("basket.py iniciado — SIMULACION BINARIA v5 (sin Gamma)")
     log_event(f"Capital: ${CAPITAL_TOTAL:.0f} | Entrada: ${ENTRY_USD:.2f} ({ENTRY_PCT*100:.0f}%)")
@@ -755,7 +1201,17 @@ async def main_loop():
 
     restore_state_from_csv()
 
-    bt["phase"] = "ACTIVO"
+    if feed:
+        asyncio.create_task(feed.run())
+        log_event(f"Feed WS activo — {feed.url}")
+    if recorder:
+        recorder.start()
+        log_event(f"Grabando ticks en {recorder.directory} (L={recorder.levels})")
+        if not feed and recorder.levels > 8:
+            log_event(f"TICK_RECORD_LEVELS={recorder.levels}: en modo poll solo se graban 8 niveles por lado")
+    asyncio.create_task(prefetch_loop())
+
+    bt.phase = "ACTIVO"
     write_state()
     await discover_all()
 
@@ -763,63 +1219,54 @@ async def main_loop():
         try:
             secs = min_secs_remaining()
 
-            if secs is not None and secs > WAKE_UP_SECS and not bt["position"]:
+            if secs is not None and secs > WAKE_UP_SECS and not bt.position:
                 sleep_duration = secs - WAKE_UP_SECS
-                wake_at = datetime.fromtimestamp(time.time() + sleep_duration).strftime("%H:%M:%S")
-                bt["phase"]        = "DURMIENDO"
-                bt["entry_window"] = False
+                wake_at = datetime.fromtimestamp(now_ts() + sleep_duration).strftime("%H:%M:%S")
+                bt.phase        = "DURMIENDO"
+                bt.entry_window = False
 
                 slept = 0
                 while slept < sleep_duration:
                     chunk = min(5.0, sleep_duration - slept)
-                    await asyncio.sleep(chunk)
+                    await asyncio.sleep(real_secs(chunk))
                     slept += chunk
-                    bt["next_wake"] = f"{wake_at} (en {int(max(0, sleep_duration - slept))}s)"
+                    bt.next_wake = f"{wake_at} (en {int(max(0, sleep_duration - slept))}s)"
                     write_state()
 
-                bt["phase"] = "ACTIVO"
+                bt.phase = "ACTIVO"
                 log_event(f"Despertando — faltan ~{WAKE_UP_SECS}s")
                 await discover_all()
+                scheduler.reset()
                 continue
 
-            bt["phase"] = "ACTIVO"
-            bt["cycle"] += 1
+            bt.phase = "ACTIVO"
+            bt.cycle += 1
 
+            started = time.perf_counter()
             await fetch_all()
-
-            secs = min_secs_remaining()
-            bt["entry_window"] = (
-                secs is not None and
-                secs <= ENTRY_WINDOW_SECS and
-                secs >= ENTRY_OPEN_SECS
-                and secs > ENTRY_CLOSE_SECS
-            )
-
-            if bt["position"]:
-                check_stop_loss()
-            if bt["position"]:
-                check_resolution()
-
-            if all(markets[s]["info"] is None for s in SYMBOLS):
-                if bt["position"]:
-                    log_event("Mercado expirado con posicion abierta — resolviendo con historial CLOB...")
-                    check_resolution()
-                if not bt["position"]:
-                    log_event("Ciclo expirado — buscando nuevo ciclo...")
-                    await discover_all()
-                continue
-
-            if not bt["position"]:
-                compute_signals()
-                check_entry()
-
-            write_state()
+            expired = run_tick()
+            tick_latency.record(time.perf_counter() - started)
+            if expired:
+                await discover_all()
 
         except Exception as e:
             log_event(f"Error en loop: {e}")
             write_state()
 
-        await asyncio.sleep(POLL_INTERVAL)
+        await scheduler.wait(poll_interval(min_secs_remaining()), tick_cost())
+
+
+async def run():
+    try:
+        await main_loop()
+    finally:
+        await close_http_session()
+        if recorder:
+            recorder.close()
+        if shadow:
+            shadow.close()
+        if publisher:
+            publisher.close()
 
 
 # ═══════════════════════════════════════════════════════
@@ -847,17 +1294,18 @@ if __name__ == "__main__":
     log.info(f"  Gap: {DIVERGENCE_THRESHOLD*100:.0f}pts — {DIVERGENCE_MAX*100:.0f}pts  |  Ventana: {ENTRY_OPEN_SECS}s — {ENTRY_WINDOW_SECS}s")
     log.info("  SIMULACION — SIN DINERO REAL")
     log.info("=" * 54)
-    log.info(f"State -> {STATE_FILE} | Log -> {LOG_FILE}")
+    log.info(f"State -> {STATE_FILE}{f' + {STATE_SHM}' if STATE_SHM else ''}"
+             f"{' + redis' if REDIS_URL else ''} | Log -> {LOG_FILE}")
 
     t = threading.Thread(target=run_dashboard, daemon=True)
     t.start()
 
     try:
-        asyncio.run(main_loop())
+        asyncio.run(run())
     except KeyboardInterrupt:
         log.info("Basket detenido.")
-        total = bt["wins"] + bt["losses"]
-        roi   = (bt["capital"] - CAPITAL_TOTAL) / CAPITAL_TOTAL * 100
-        log.info(f"Capital final: ${bt['capital']:.4f}  (ROI: {roi:+.2f}%)")
-        log.info(f"P&L total: ${bt['total_pnl']:+.4f}")
-        log.info(f"Trades: {total}  (WIN: {bt['wins']}  LOSS: {bt['losses']})")
+        total = bt.wins + bt.losses
+        roi   = (bt.capital - CAPITAL_TOTAL) / CAPITAL_TOTAL * 100
+        log.info(f"Capital final: ${bt.capital:.4f}  (ROI: {roi:+.2f}%)")
+        log.info(f"P&L total: ${bt.total_pnl:+.4f}")
+        log.info(f"Trades: {total}  (WIN: {bt.wins}  LOSS: {bt.losses})")
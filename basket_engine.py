@@ -0,0 +1,130 @@
+"""
+basket_engine.py — Motor de Divergencia Armónica para N activos UP/DOWN.
+
+Generaliza compute_signals de basket.py a cualquier número de mercados 5m
+(ETH, SOL, BTC, XRP, DOGE, ...). Los mids viven en arrays NumPy indexados por
+símbolo; medias armónicas, divergencias y consenso se calculan con operaciones
+sobre todo el basket.
+
+  - set() es O(1): actualiza la pata y su recíproco.
+  - evaluate() solo trabaja si alguna pata cambió desde la última evaluación.
+    La suma de recíprocos se hace entera en cada evaluación (N ≤ 10 patas),
+    en el orden de los símbolos y con sum() secuencial como harmonic_mean de
+    la versión original con dicts: la señal sale bit a bit igual, sin deriva
+    de redondeo acumulada entre ticks.
+"""
+
+import numpy as np
+
+
+def normalized_mid(mid: float, resolved_up: float = 0.98, resolved_dn: float = 0.02) -> float:
+    if mid >= resolved_up:
+        return 1.0
+    if mid <= resolved_dn:
+        return 0.0
+    return mid
+
+
+class BasketSignal:
+    """Resultado de una evaluación. ready=False si hay menos de 2 mids UP."""
+
+    __slots__ = ("ready", "harm_up", "harm_dn", "asset", "side", "div", "consensus")
+
+    def __init__(self, ready=False, harm_up=0.0, harm_dn=0.0, asset=None, side=None,
+                 div=0.0, consensus="NONE"):
+        self.ready     = ready
+        self.harm_up   = harm_up
+        self.harm_dn   = harm_dn
+        self.asset     = asset
+        self.side      = side
+        self.div       = div
+        self.consensus = consensus
+
+
+class _Side:
+    """Mids de un lado (UP o DOWN) del basket y sus recíprocos."""
+
+    __slots__ = ("raw", "norm", "recip")
+
+    def __init__(self, n: int):
+        self.raw   = np.zeros(n)   # mid crudo (0 = sin dato)
+        self.norm  = np.zeros(n)   # mid normalizado (1.0 / 0.0 si ya resolvió)
+        self.recip = np.zeros(n)   # 1/norm de las patas con norm > 0
+
+    def set(self, i: int, raw: float, norm: float):
+        self.raw[i]   = raw
+        self.norm[i]  = norm
+        self.recip[i] = 1.0 / norm if raw > 0 and norm > 0 else 0.0
+
+    def harmonic(self) -> tuple[np.ndarray, int, float]:
+        """(máscara de patas con dato, cantidad, media armónica)."""
+        mask = self.raw > 0
+        n    = int(np.count_nonzero(mask))
+        if n == 0 or bool(np.any(self.norm[mask] <= 0)):
+            return mask, n, 0.0
+        return mask, n, n / sum(self.recip[mask].tolist())
+
+    def cheapest(self, mask: np.ndarray, h_avg: float) -> tuple[int | None, float]:
+        """Índice de la pata más por debajo de h_avg (primera en caso de empate)."""
+        if h_avg == 0:
+            return None, 0.0
+        diffs = np.where(mask, self.norm - h_avg, np.inf)
+        i     = int(np.argmin(diffs))
+        diff  = float(diffs[i])
+        return (i, diff) if diff < 0 else (None, 0.0)
+
+
+class BasketEngine:
+    def __init__(self, symbols: list[str], resolved_up: float = 0.98, resolved_dn: float = 0.02,
+                 consensus_full: float = 0.80, consensus_soft: float = 0.80):
+        self.symbols        = list(symbols)
+        self.index          = {s: i for i, s in enumerate(self.symbols)}
+        self.resolved_up    = resolved_up
+        self.resolved_dn    = resolved_dn
+        self.consensus_full = consensus_full
+        self.consensus_soft = consensus_soft
+        self.up             = _Side(len(self.symbols))
+        self.dn             = _Side(len(self.symbols))
+        self.dirty          = True
+
+    def set(self, sym: str, up_mid: float, dn_mid: float):
+        i = self.index[sym]
+        self.up.set(i, up_mid, normalized_mid(up_mid, self.resolved_up, self.resolved_dn))
+        self.dn.set(i, dn_mid, normalized_mid(dn_mid, self.resolved_up, self.resolved_dn))
+        self.dirty = True
+
+    def evaluate(self, force: bool = False) -> BasketSignal | None:
+        """Señal del basket, o None si nada cambió desde la última evaluación."""
+        if not (self.dirty or force):
+            return None
+        self.dirty = False
+
+        up_mask, n_up, harm_up = self.up.harmonic()
+        if n_up < 2:
+            return BasketSignal(ready=False)
+        dn_mask, _, harm_dn = self.dn.harmonic()
+
+        i_up, div_up = self.up.cheapest(up_mask, harm_up)
+        i_dn, div_dn = self.dn.cheapest(dn_mask, harm_dn)
+
+        sig = BasketSignal(ready=True, harm_up=harm_up, harm_dn=harm_dn)
+        if abs(div_up) >= abs(div_dn) and i_up is not None:
+            i, sig.side, sig.div, side = i_up, "UP", div_up, self.up
+        elif i_dn is not None:
+            i, sig.side, sig.div, side = i_dn, "DOWN", div_dn, self.dn
+        else:
+            return sig
+        sig.asset     = self.symbols[i]
+        sig.consensus = self._consensus(side.raw, i)
+        return sig
+
+    def _consensus(self, raw: np.ndarray, i: int) -> str:
+        """FULL: todos los pares con dato y > consensus_full. SOFT: al menos uno > consensus_soft."""
+        peers = np.ones(len(raw), dtype=bool)
+        peers[i] = False
+        vals = raw[peers & (raw > 0)]
+        if len(vals) == len(raw) - 1 and bool(np.all(vals > self.consensus_full)):
+            return "FULL"
+        if len(vals) >= 1 and int(np.count_nonzero(vals > self.consensus_soft)) >= 1:
+            return "SOFT"
+        return "NONE"
@@ -0,0 +1,457 @@
+"""
+bench.py — Benchmarks de los caminos calientes del bot, sin red.
+
+Mide por llamada la latencia (perf_counter: media, p50, p99) y la memoria
+(tracemalloc, en una pasada aparte: pico transitorio y bytes retenidos) de:
+
+  - get_order_book_metrics / _raw_book_metrics  books chicos y profundos
+  - compute_signals     evaluación del basket tras el update de una pata
+  - check_entry         camino de skip y camino de entrada (incluye write_state)
+  - write_state         con bt.trades creciendo (armado del estado + escritura del publicador)
+  - _save_log / restore_state_from_csv   con 10k..1M trades
+  - /api/state          handler del dashboard (Flask test client), desde STATE_FILE y desde STATE_SHM
+
+Los fixtures son sintéticos y deterministas (--seed), o salen de una grabación
+de tick_recorder (--ticks DIR): books con los niveles grabados y la secuencia
+real de quotes del basket.
+
+Baselines: --save guarda los resultados en JSON y --compare los compara contra
+uno guardado; los casos cuya media o pico de memoria empeoran más que
+--tolerance se marcan REGRESION y el exit code es 1.
+
+Uso:
+  python bench.py [--only compute_signals,check_entry] [--rows 10000,100000,1000000]
+                  [--ticks DIR] [--save baseline.json] [--compare baseline.json]
+"""
+
+import argparse
+import csv
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+from py_clob_client.clob_types import OrderBookSummary, OrderSummary
+
+import replay
+import strategy_core
+from state_channel import StateChannel, StateReader
+from strategy_core import METRICS_FULL, METRICS_TOP
+from tick_recorder import list_tick_files, read_ticks
+
+ROWS          = [10_000, 100_000]   # trades de _save_log / restore (1M con --rows)
+TRADES        = [10, 10_000, 100_000]   # largo de bt.trades en write_state
+SHALLOW_LEVELS = 8
+DEEP_LEVELS   = 200
+QUOTES        = 5000     # quotes sintéticos para compute_signals
+CALLS         = 5000     # llamadas máximas por caso
+MEM_CALLS     = 200      # llamadas medidas con tracemalloc
+TIME_BUDGET   = 2.0      # segundos máximos midiendo un caso
+TOLERANCE     = 0.20     # empeoramiento relativo que cuenta como regresión
+MIN_DELTA     = {"mean_us": 0.5, "peak_kb": 1.0}   # diferencias absolutas menores son ruido
+
+
+# ═══════════════════════════════════════════════════════
+#  MEDICIÓN
+# ═══════════════════════════════════════════════════════
+
+def measure(fn, setup=None, calls: int = CALLS, budget: float = TIME_BUDGET) -> dict:
+    """
+    Latencia por llamada de fn() y memoria por llamada. setup() corre antes de
+    cada llamada fuera de la medición. Una llamada de warmup no se cuenta.
+    """
+    if setup:
+        setup()
+    fn()
+
+    times    = []
+    deadline = time.perf_counter() + budget
+    for _ in range(calls):
+        if setup:
+            setup()
+        t0 = time.perf_counter()
+        fn()
+        t1 = time.perf_counter()
+        times.append(t1 - t0)
+        if t1 > deadline:
+            break
+
+    # tracemalloc distorsiona los tiempos: pasada aparte con menos llamadas
+    n_mem = min(len(times), MEM_CALLS)
+    peak = retained = 0
+    tracemalloc.start()
+    try:
+        for _ in range(n_mem):
+            if setup:
+                setup()
+            before = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+            fn()
+            current, top = tracemalloc.get_traced_memory()
+            peak      = max(peak, top - before)
+            retained += current - before
+    finally:
+        tracemalloc.stop()
+
+    times.sort()
+    n = len(times)
+    return {
+        "calls":      n,
+        "mean_us":    round(sum(times) / n * 1e6, 2),
+        "p50_us":     round(times[n // 2] * 1e6, 2),
+        "p99_us":     round(times[min(n - 1, int(n * 0.99))] * 1e6, 2),
+        "peak_kb":    round(peak / 1024, 1),
+        "retained_b": retained // n_mem,
+    }
+
+
+# ═══════════════════════════════════════════════════════
+#  FIXTURES
+# ═══════════════════════════════════════════════════════
+
+class Fixtures:
+    """Books, secuencia de quotes y símbolos para los benchmarks."""
+
+    def __init__(self, source: str, symbols: list[str], quotes: list[tuple], shallow: tuple, deep: tuple):
+        self.source  = source     # se guarda en el baseline: solo se comparan corridas del mismo origen
+        self.symbols = symbols
+        self.quotes  = quotes     # (sym, up_bid, up_ask, dn_bid, dn_ask)
+        self.shallow = shallow    # (bids, asks) como listas (price, size)
+        self.deep    = deep
+
+    @classmethod
+    def synthetic(cls, seed: int = 1, symbols: list[str] | None = None) -> "Fixtures":
+        rnd     = random.Random(seed)
+        symbols = symbols or ["ETH", "SOL", "BTC"]
+        mids    = {s: 0.5 for s in symbols}
+        quotes  = []
+        for i in range(QUOTES):
+            sym = symbols[i % len(symbols)]
+            mids[sym] = min(0.97, max(0.03, mids[sym] + rnd.gauss(0, 0.02)))
+            up  = round(mids[sym], 2)
+            quotes.append((sym, up - 0.01, up + 0.01, round(1 - up - 0.01, 2), round(1 - up + 0.01, 2)))
+        return cls(f"synthetic:{seed}", symbols, quotes, _book(rnd, SHALLOW_LEVELS), _book(rnd, DEEP_LEVELS))
+
+    @classmethod
+    def recorded(cls, directory: str, seed: int = 1) -> "Fixtures":
+        files = list_tick_files(directory)
+        if not files:
+            raise ValueError(f"sin archivos de ticks en {directory}")
+        symbols = replay.recorded_symbols(files)
+        quotes, shallow, deepest = [], None, None
+        for _, path in files:
+            rec = read_ticks(path)
+            for legs in replay.iter_ticks(rec, symbols):
+                quotes += [(sym, ub, ua, db, da) for _, sym, stale, ub, ua, db, da in legs if not stale]
+            for r in rec[rec["bid_px"][:, 0] > 0][:1000]:
+                book = ([(float(p), float(s)) for p, s in zip(r["bid_px"], r["bid_sz"]) if p > 0],
+                        [(float(p), float(s)) for p, s in zip(r["ask_px"], r["ask_sz"]) if p > 0])
+                shallow = shallow or book
+                if deepest is None or len(book[0]) + len(book[1]) > len(deepest[0]) + len(deepest[1]):
+                    deepest = book
+            if len(quotes) >= QUOTES * 10:
+                break
+        if not quotes or shallow is None:
+            raise ValueError(f"grabación sin quotes utilizables en {directory}")
+        # La grabación guarda TICK_RECORD_LEVELS niveles: el book profundo sigue siendo sintético
+        return cls(f"ticks:{os.path.abspath(directory)}", symbols, quotes, shallow,
+                   _book(random.Random(seed), DEEP_LEVELS))
+
+
+def _book(rnd: random.Random, levels: int) -> tuple[list, list]:
+    bids = [(round(0.49 - i * 0.001, 3), round(rnd.uniform(5, 500), 2)) for i in range(levels)]
+    asks = [(round(0.51 + i * 0.001, 3), round(rnd.uniform(5, 500), 2)) for i in range(levels)]
+    rnd.shuffle(bids)   # la API no garantiza orden
+    rnd.shuffle(asks)
+    return bids, asks
+
+
+def _raw_book(book: tuple) -> dict:
+    """Book en el formato JSON de GET /book (precios y tamaños como string)."""
+    bids, asks = book
+    return {"bids": [{"price": str(p), "size": str(s)} for p, s in bids],
+            "asks": [{"price": str(p), "size": str(s)} for p, s in asks]}
+
+
+class _FixtureClobClient:
+    """ClobClient que devuelve siempre el mismo book, sin red."""
+
+    def __init__(self, book: tuple):
+        bids, asks = book
+        self.summary = OrderBookSummary(
+            bids=[OrderSummary(price=str(p), size=str(s)) for p, s in bids],
+            asks=[OrderSummary(price=str(p), size=str(s)) for p, s in asks],
+        )
+
+    def get_order_book(self, token_id: str) -> OrderBookSummary:
+        return self.summary
+
+
+def _trade_rows(template: dict, n: int):
+    """n trades con id, outcome y capital variables (el resto igual al template)."""
+    capital = pnl = 0.0
+    for i in range(n):
+        win  = i % 7 < 4
+        gain = 0.42 if win else -1.0
+        pnl += gain
+        capital = 100.0 + pnl
+        yield {**template, "trade_id": f"T{i:04d}", "outcome": "WIN" if win else "LOSS",
+               "pnl_usd": gain, "capital_after": round(capital, 4), "cumulative_pnl": round(pnl, 6),
+               "trade_number": i}
+
+
+# ═══════════════════════════════════════════════════════
+#  CASOS
+# ═══════════════════════════════════════════════════════
+
+def bench_books(fx: Fixtures) -> dict:
+    out = {}
+    for depth, book in (("shallow", fx.shallow), ("deep", fx.deep)):
+        strategy_core._clob_client = _FixtureClobClient(book)
+        out[f"get_order_book_metrics[{depth}]"] = measure(lambda: strategy_core.get_order_book_metrics("bench"))
+        raw = _raw_book(book)
+        for fields in (METRICS_TOP, METRICS_FULL):
+            out[f"_raw_book_metrics[{depth},{fields}]"] = measure(
+                lambda: strategy_core._raw_book_metrics(raw, fields=fields))
+    strategy_core._clob_client = None
+    return out
+
+
+def bench_signals(fx: Fixtures, basket) -> dict:
+    replay.reset_basket(basket)
+    quotes = iter(())
+
+    def next_quote():
+        nonlocal quotes
+        q = next(quotes, None)
+        if q is None:
+            quotes = iter(fx.quotes)
+            q = next(quotes)
+        basket.apply_quotes(*q)
+
+    return {"compute_signals": measure(basket.compute_signals, setup=next_quote)}
+
+
+def _prepare_entry(basket):
+    """Estado justo antes de una entrada válida en el primer símbolo."""
+    bt, sym = basket.bt, basket.SYMBOLS[0]
+    bt.position          = None
+    bt.traded_this_cycle = False
+    bt.entry_window      = True
+    bt.consensus         = "FULL"
+    bt.signal_asset      = sym
+    bt.signal_side       = "UP"
+    bt.signal_div        = -(basket.DIVERGENCE_THRESHOLD + basket.DIVERGENCE_MAX) / 2
+    bt.capital           = basket.CAPITAL_TOTAL
+    for i, s in enumerate(basket.SYMBOLS):
+        basket.markets[s].info = replay.market_info(s, 0, basket.SLOT_STEP)
+        if i == 0:
+            basket.markets[s].set_quotes(0.70, 0.72, 0.28, 0.30)
+        else:
+            basket.markets[s].set_quotes(0.84, 0.86, 0.14, 0.16)
+
+
+def bench_entry(fx: Fixtures, basket) -> dict:
+    replay.reset_basket(basket)
+    _prepare_entry(basket)
+    basket.bt.consensus = "SOFT"
+    out = {"check_entry[skip]": measure(basket.check_entry)}
+    out["check_entry[entry]"] = measure(basket.check_entry, setup=lambda: _prepare_entry(basket))
+    return out
+
+
+def _template_trade(basket) -> dict:
+    replay.reset_basket(basket)
+    _prepare_entry(basket)
+    basket.check_entry()
+    return basket._build_trade_record(basket.bt.position, "RESOLUTION", 1.0, "UP", "WIN", 0.38)
+
+
+def bench_state(fx: Fixtures, basket) -> dict:
+    import dashboard
+
+    template = _template_trade(basket)
+    out = {}
+    for n in TRADES:
+        basket.bt.trades = [template] * n
+        # write_state() solo arma el dict y lo entrega al hilo publicador;
+        # publisher.write() es lo que ese hilo paga al cambiar el estado
+        out[f"write_state[trades={n}]"] = measure(basket.write_state)
+        basket.publisher.flush()
+
+        def publish():
+            basket.bt.cycle += 1
+            basket.publisher.write(basket.build_state())
+
+        out[f"publisher.write[trades={n}]"] = measure(publish)
+    basket.bt.trades = []
+
+    dashboard.STATE_FILE = basket.STATE_FILE
+    client = dashboard.app.test_client()
+    out["/api/state"] = measure(lambda: client.get("/api/state").data)
+
+    # Mismo estado servido desde el segmento de memoria compartida
+    path = f"{basket.STATE_FILE}.shm"
+    shm  = StateChannel(path)
+    shm.write(basket.build_state())
+    dashboard.channel = StateReader(path)
+    out["/api/state[shm]"] = measure(lambda: client.get("/api/state").data)
+    dashboard.channel = None
+    shm.close()
+    return out
+
+
+def bench_persistence(fx: Fixtures, basket, rows: list[int]) -> dict:
+    template = _template_trade(basket)
+    out = {}
+    for n in rows:
+        calls = max(1, 100_000 // n)
+        basket.bt.trades = [template] * n   # json.dump serializa cada fila igual: no hace falta copiarlas
+        out[f"_save_log[rows={n}]"] = measure(basket._save_log, calls=calls)
+        basket.bt.trades = []
+
+        with open(basket.CSV_FILE, "w", newline="", encoding="utf-8") as f:
+            writer = csv.DictWriter(f, fieldnames=basket.CSV_COLUMNS, extrasaction="ignore")
+            writer.writeheader()
+            writer.writerows(_trade_rows(template, n))
+
+        def restore():
+            basket.bt = basket.BacktestState()
+            basket.restore_state_from_csv()
+
+        out[f"restore_state_from_csv[rows={n}]"] = measure(restore, calls=calls)
+        basket.bt = basket.BacktestState()
+    return out
+
+
+CASES = ["books", "compute_signals", "check_entry", "state", "persistence"]
+
+
+def run(fx: Fixtures, only: list[str] | None = None, rows: list[int] | None = None) -> dict:
+    os.environ.pop("SHADOW_GRID", None)
+    with tempfile.TemporaryDirectory(prefix="bench-") as workdir:
+        basket = replay.load_basket(fx.symbols)
+        basket.STATE_FILE = os.path.join(workdir, "state.json")
+        basket.publisher  = basket.StatePublisher(basket.STATE_FILE)
+        basket.LOG_FILE   = os.path.join(workdir, "basket_log.json")
+        basket.CSV_FILE   = os.path.join(workdir, "basket_trades.csv")
+
+        selected = only or CASES
+        results  = {}
+        if "books" in selected:
+            results.update(bench_books(fx))
+        if "compute_signals" in selected:
+            results.update(bench_signals(fx, basket))
+        if "check_entry" in selected:
+            results.update(bench_entry(fx, basket))
+        if "state" in selected:
+            results.update(bench_state(fx, basket))
+        if "persistence" in selected:
+            results.update(bench_persistence(fx, basket, rows or ROWS))
+        basket.publisher.close()
+        basket.publisher = None
+        replay.reset_basket(basket)
+    return results
+
+
+# ═══════════════════════════════════════════════════════
+#  BASELINES Y SALIDA
+# ═══════════════════════════════════════════════════════
+
+def save_baseline(path: str, results: dict, fixtures: str):
+    data = {
+        "meta": {
+            "ts":       datetime.now().isoformat(),
+            "fixtures": fixtures,
+            "python":   platform.python_version(),
+            "platform": platform.platform(),
+        },
+        "results": results,
+    }
+    with open(path, "w") as f:
+        json.dump(data, f, indent=2)
+
+
+def compare(results: dict, baseline: dict, tolerance: float = TOLERANCE) -> list[str]:
+    """Casos cuya media o pico de memoria empeoró más que tolerance."""
+    regressions = []
+    for name, cur in results.items():
+        old = baseline.get(name)
+        if not old:
+            continue
+        for key in ("mean_us", "peak_kb"):
+            if old[key] > 0 and cur[key] > old[key] * (1 + tolerance) and cur[key] - old[key] >= MIN_DELTA[key]:
+                regressions.append(f"{name} {key}: {old[key]} -> {cur[key]} (+{(cur[key] / old[key] - 1) * 100:.0f}%)")
+    return regressions
+
+
+def format_results(results: dict, baseline: dict | None = None) -> str:
+    header = ["caso", "calls", "mean_us", "p50_us", "p99_us", "peak_kb", "retained_b"]
+    if baseline:
+        header += ["Δmean", "Δpeak"]
+    lines = []
+    for name, r in results.items():
+        line = [name] + [str(r[k]) for k in header[1:7]]
+        if baseline:
+            old = baseline.get(name)
+            line += [_delta(r["mean_us"], old["mean_us"]) if old else "-",
+                     _delta(r["peak_kb"], old["peak_kb"]) if old else "-"]
+        lines.append(line)
+    widths = [max(len(h), *(len(l[j]) for l in lines)) if lines else len(h) for j, h in enumerate(header)]
+    out = ["  ".join(h.ljust(w) if j == 0 else h.rjust(w) for j, (h, w) in enumerate(zip(header, widths)))]
+    out += ["  ".join(c.ljust(w) if j == 0 else c.rjust(w) for j, (c, w) in enumerate(zip(line, widths)))
+            for line in lines]
+    return "\n".join(out)
+
+
+def _delta(cur: float, old: float) -> str:
+    if old <= 0:
+        return "-"
+    return f"{(cur / old - 1) * 100:+.0f}%"
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Benchmarks de los caminos calientes del bot")
+    ap.add_argument("--only", help=f"casos separados por coma: {','.join(CASES)}")
+    ap.add_argument("--rows", help="trades para _save_log / restore (default: 10000,100000)")
+    ap.add_argument("--ticks", help="directorio de TICK_RECORD_DIR para los fixtures")
+    ap.add_argument("--seed", type=int, default=1)
+    ap.add_argument("--save", metavar="JSON", help="guardar resultados como baseline")
+    ap.add_argument("--compare", metavar="JSON", help="comparar contra un baseline guardado")
+    ap.add_argument("--tolerance", type=float, default=TOLERANCE)
+    args = ap.parse_args(argv)
+
+    only = [c.strip() for c in args.only.split(",")] if args.only else None
+    unknown = set(only or []) - set(CASES)
+    if unknown:
+        sys.exit(f"casos desconocidos: {sorted(unknown)}")
+    rows = [int(r) for r in args.rows.split(",")] if args.rows else None
+
+    fx = Fixtures.recorded(args.ticks, args.seed) if args.ticks else Fixtures.synthetic(args.seed)
+    results = run(fx, only, rows)
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            data = json.load(f)
+        baseline = data["results"]
+        if data["meta"].get("fixtures") != fx.source:
+            print(f"aviso: baseline con fixtures {data['meta'].get('fixtures')}, corrida con {fx.source}")
+    print(format_results(results, baseline))
+    if args.save:
+        save_baseline(args.save, results, fx.source)
+    if baseline:
+        regressions = compare(results, baseline, args.tolerance)
+        for r in regressions:
+            print(f"REGRESION {r}")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
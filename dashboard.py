@@ -2,21 +2,38 @@
 dashboard.py — Flask server para Polymarket Basket Bot.
 Rutas:
   GET /          → Dashboard HTML en vivo
-  GET /api/state → JSON con estado actual
+  GET /api/state → JSON con estado actual (Redis o segmento STATE_SHM si están configurados, si no STATE_FILE)
   GET /download/csv → Descarga CSV de trades
 """
 
 import json, os
-from flask import Flask, jsonify, render_template_string, send_file, abort
+from flask import Flask, Response, jsonify, render_template_string, send_file, abort
 from flask_cors import CORS
 
+from redis_bus import REDIS_URL, StateSubscriber
+from state_channel import STATE_SHM, StateReader
+
 app = Flask(__name__)
 CORS(app)
 
 STATE_FILE = os.environ.get("STATE_FILE", "/data/state.json")
 CSV_FILE   = os.environ.get("CSV_FILE",   "/data/basket_trades.csv")
 
+# Con REDIS_URL el estado llega por pub/sub (bot en otro nodo); con STATE_SHM
+# (bot en el mismo host) se lee del segmento compartido. Mientras el canal no
+# tenga estado se vuelve a STATE_FILE.
+if REDIS_URL:
+    channel = StateSubscriber(REDIS_URL)
+elif STATE_SHM:
+    channel = StateReader(STATE_SHM)
+else:
+    channel = None
+
 def read_state() -> dict:
+    if channel:
+        state = channel.state()
+        if state is not None:
+            return state
     try:
         with open(STATE_FILE) as f:
             return json.load(f)
@@ -27,6 +44,9 @@ def read_state() -> dict:
 
 @app.route("/api/state")
 def api_state():
+    body = channel.json_body() if channel else None
+    if body is not None:
+        return Response(body, mimetype="application/json")
     return jsonify(read_state())
 
 @app.route("/download/csv")
@@ -0,0 +1,166 @@
+"""
+market_feed.py — Feed WebSocket del canal "market" del CLOB de Polymarket.
+
+Reemplaza el polling REST de order books: se suscribe a los token ids UP/DOWN
+de todos los mercados activos, mantiene cada book en memoria a partir de los
+mensajes snapshot ("book") y delta ("price_change") y avisa por callback cada
+vez que un book cambia.
+
+Cada (re)conexión arranca sin books: los de antes del corte pueden haberse
+perdido deltas. `connected` recién vale True cuando llegó el snapshot de todos
+los tokens suscritos; hasta entonces has_book() es False y el bot usa REST.
+
+Configurable via env vars:
+  CLOB_WS_URL = url del canal market (default: endpoint publico de Polymarket)
+"""
+
+import asyncio
+import json
+import logging
+import os
+
+import websockets
+
+from strategy_core import OrderBook
+
+WS_URL          = os.environ.get("CLOB_WS_URL", "wss://ws-subscriptions-clob.polymarket.com/ws/market")
+PING_INTERVAL   = 10     # el servidor corta conexiones sin PING de aplicacion
+RECONNECT_DELAY = 2.0
+
+log = logging.getLogger("market_feed")
+
+
+class MarketFeed:
+    """
+    Cliente del canal market. `on_update(token_id)` se llama (en el event loop)
+    despues de aplicar cada snapshot o delta sobre el book de ese token.
+    """
+
+    def __init__(self, on_update=None, url: str = WS_URL):
+        self.url        = url
+        self.on_update  = on_update
+        self.books: dict[str, OrderBook] = {}
+        self.connected  = False   # socket abierto y snapshot de todos los tokens
+        self._asset_ids: list[str] = []
+        self._open      = False
+        self._ws        = None
+        self._stopped   = False
+
+    # ── Suscripcion ───────────────────────────────────────────────────────────
+
+    async def set_assets(self, asset_ids: list[str]):
+        """Cambia el set de tokens suscritos. Reconecta si el set cambio."""
+        asset_ids = [a for a in asset_ids if a]
+        if sorted(asset_ids) == sorted(self._asset_ids):
+            return
+        self._asset_ids = asset_ids
+        self.books = {a: b for a, b in self.books.items() if a in asset_ids}
+        self.connected = False
+        if self._ws is not None:
+            # run() vuelve a conectar con la nueva lista de tokens
+            await self._ws.close()
+
+    def has_book(self, token_id: str) -> bool:
+        return self.connected and token_id in self.books
+
+    def best_bid_ask(self, token_id: str) -> tuple[float, float] | None:
+        """None si todavía no hay snapshot del token."""
+        book = self.books.get(token_id)
+        if book is None:
+            return None
+        return book.best_bid, book.best_ask
+
+    # ── Conexion ──────────────────────────────────────────────────────────────
+
+    async def run(self):
+        while not self._stopped:
+            if not self._asset_ids:
+                await asyncio.sleep(0.5)
+                continue
+            try:
+                async with websockets.connect(self.url, ping_interval=None) as ws:
+                    self._ws = ws
+                    self.books = {}
+                    self._open = True
+                    await ws.send(json.dumps({"assets_ids": self._asset_ids, "type": "market"}))
+                    pinger = asyncio.create_task(self._ping(ws))
+                    try:
+                        async for raw in ws:
+                            self.handle_message(raw)
+                    finally:
+                        pinger.cancel()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                log.warning(f"market feed desconectado: {e}")
+            finally:
+                self.connected = False
+                self._open = False
+                self._ws = None
+            if not self._stopped:
+                await asyncio.sleep(RECONNECT_DELAY)
+
+    async def stop(self):
+        self._stopped = True
+        if self._ws is not None:
+            await self._ws.close()
+
+    async def _ping(self, ws):
+        while True:
+            await asyncio.sleep(PING_INTERVAL)
+            await ws.send("PING")
+
+    # ── Mensajes ──────────────────────────────────────────────────────────────
+
+    def handle_message(self, raw: str | bytes):
+        if raw in ("PONG", b"PONG"):
+            return
+        try:
+            payload = json.loads(raw)
+        except ValueError:
+            return
+        for msg in payload if isinstance(payload, list) else [payload]:
+            event = msg.get("event_type")
+            if event == "book":
+                self._apply_snapshot(msg)
+            elif event == "price_change":
+                self._apply_changes(msg)
+
+    def _apply_snapshot(self, msg: dict):
+        token_id = msg.get("asset_id")
+        if token_id not in self._asset_ids:
+            return
+        bids = msg.get("bids", msg.get("buys")) or []
+        asks = msg.get("asks", msg.get("sells")) or []
+        self.books[token_id] = OrderBook.from_levels(
+            [(float(l["price"]), float(l["size"])) for l in bids],
+            [(float(l["price"]), float(l["size"])) for l in asks],
+        )
+        if not self.connected and self._open and all(a in self.books for a in self._asset_ids):
+            self.connected = True
+        self._notify(token_id)
+
+    def _apply_changes(self, msg: dict):
+        # Formato actual: price_changes=[{asset_id, price, size, side}, ...]
+        # Formato previo: asset_id + changes=[{price, size, side}, ...]
+        changes = msg.get("price_changes")
+        if changes is None:
+            changes = [dict(c, asset_id=msg.get("asset_id")) for c in msg.get("changes") or []]
+        touched = []
+        for ch in changes:
+            token_id = ch.get("asset_id")
+            book = self.books.get(token_id)
+            if book is None:
+                continue    # sin snapshot todavia — el delta no se puede aplicar
+            book.set_level(ch.get("side") or "SELL", float(ch["price"]), float(ch["size"]))
+            if token_id not in touched:
+                touched.append(token_id)
+        for token_id in touched:
+            self._notify(token_id)
+
+    def _notify(self, token_id: str):
+        if self.on_update is not None:
+            try:
+                self.on_update(token_id)
+            except Exception as e:
+                log.warning(f"market feed callback error: {e}")
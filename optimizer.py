@@ -0,0 +1,174 @@
+"""
+optimizer.py — Búsqueda de parámetros (grilla o aleatoria) sobre ticks grabados.
+
+Cada combinación de parámetros se evalúa con el replay determinista de
+replay.py en un pool de procesos. Los ticks no se copian a los workers: cada
+proceso abre los mismos archivos de tick_recorder con np.memmap, así que los
+datos viven una sola vez en el page cache del sistema y lo único que viaja
+por el pool es el dict de parámetros y el resumen de vuelta.
+
+La grilla es un JSON con parámetros de replay.PARAMS:
+  {"DIVERGENCE_THRESHOLD": [0.04, 0.05, 0.06], "STOP_LOSS_PRICE": [0.25, 0.33]}
+  - modo grilla   : producto cartesiano de las listas
+  - modo --random : cada lista es una elección al azar entre sus valores, y
+                    {"range": [lo, hi]} es un rango (randint si lo y hi son
+                    enteros, uniforme si no). Los rangos solo valen con --random.
+
+Uso:
+  python optimizer.py <dir_ticks> --grid grid.json [--random N --seed S]
+                      [--workers N] [--top 20] [--sort total_pnl] [--out ranking.csv]
+"""
+
+import argparse
+import csv
+import itertools
+import json
+import os
+import random
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+import replay
+
+SORT_KEYS = ["total_pnl", "win_rate", "profit_factor", "max_drawdown", "roi_pct"]
+
+COLUMNS = ["trades", "wins", "losses", "win_rate", "profit_factor",
+           "max_drawdown", "total_pnl", "roi_pct", "skipped"]
+
+
+def _is_range(values) -> bool:
+    return isinstance(values, dict)
+
+
+def load_spec(path: str) -> dict:
+    with open(path) as f:
+        spec = json.load(f)
+    unknown = set(spec) - set(replay.PARAMS)
+    if unknown:
+        raise ValueError(f"Parámetros desconocidos en {path}: {sorted(unknown)}")
+    for name, values in spec.items():
+        if _is_range(values):
+            bounds = values.get("range")
+            if set(values) != {"range"} or not isinstance(bounds, list) or len(bounds) != 2 \
+                    or bounds[0] > bounds[1]:
+                raise ValueError(f"{name} en {path}: un rango es {{\"range\": [lo, hi]}} con lo <= hi")
+        elif not isinstance(values, list) or not values:
+            raise ValueError(f"{name} en {path}: se espera una lista de valores o {{\"range\": [lo, hi]}}")
+    return spec
+
+
+def grid_configs(spec: dict) -> list[dict]:
+    ranges = [k for k in spec if _is_range(spec[k])]
+    if ranges:
+        raise ValueError(f"los rangos solo se pueden muestrear con --random: {ranges}")
+    keys = list(spec)
+    return [dict(zip(keys, values)) for values in itertools.product(*[spec[k] for k in keys])]
+
+
+def random_configs(spec: dict, n: int, seed: int | None = None) -> list[dict]:
+    rnd = random.Random(seed)
+    configs = []
+    for _ in range(n):
+        config = {}
+        for name, values in spec.items():
+            if not _is_range(values):
+                config[name] = rnd.choice(values)
+                continue
+            lo, hi = values["range"]
+            if isinstance(lo, int) and isinstance(hi, int):
+                config[name] = rnd.randint(lo, hi)
+            else:
+                config[name] = round(rnd.uniform(lo, hi), 4)
+        configs.append(config)
+    return configs
+
+
+# ═══════════════════════════════════════════════════════
+#  WORKERS
+# ═══════════════════════════════════════════════════════
+
+_files: list[tuple[int, str]] = []
+_basket = None
+
+
+def _init_worker(files: list[tuple[int, str]], symbols: list[str]):
+    global _files, _basket
+    os.environ.pop("SHADOW_GRID", None)
+    _files  = files
+    _basket = replay.load_basket(symbols)
+
+
+def _evaluate(params: dict) -> dict:
+    replay.reset_basket(_basket, params)
+    return {**params, **replay.run_replay(_basket, _files)}
+
+
+def optimize(files: list[tuple[int, str]], configs: list[dict], workers: int | None = None,
+             sort: str = "total_pnl") -> list[dict]:
+    """Evalúa todas las configuraciones y devuelve el ranking (mejor primero)."""
+    symbols = replay.recorded_symbols(files)
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(files, symbols)) as pool:
+        results = list(pool.map(_evaluate, configs))
+    reverse = sort != "max_drawdown"
+    missing = float("-inf") if reverse else float("inf")
+    results.sort(key=lambda r: missing if r[sort] is None else r[sort], reverse=reverse)
+    return results
+
+
+# ═══════════════════════════════════════════════════════
+#  SALIDA
+# ═══════════════════════════════════════════════════════
+
+def format_table(rows: list[dict], params: list[str]) -> str:
+    header = ["#"] + params + COLUMNS
+    lines  = [[str(i + 1)] + [_fmt(r[k]) for k in params + COLUMNS] for i, r in enumerate(rows)]
+    widths = [max(len(h), *(len(l[j]) for l in lines)) if lines else len(h) for j, h in enumerate(header)]
+    out = ["  ".join(h.rjust(w) for h, w in zip(header, widths))]
+    out += ["  ".join(c.rjust(w) for c, w in zip(line, widths)) for line in lines]
+    return "\n".join(out)
+
+
+def _fmt(value) -> str:
+    if value is None:
+        return "-"
+    if isinstance(value, float):
+        return f"{value:.4g}"
+    return str(value)
+
+
+def save_csv(path: str, rows: list[dict], params: list[str]):
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=params + COLUMNS, extrasaction="ignore")
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Grid / random search sobre ticks grabados")
+    ap.add_argument("ticks", help="directorio de TICK_RECORD_DIR")
+    ap.add_argument("--grid", required=True, help="JSON con los valores de cada parámetro")
+    ap.add_argument("--random", type=int, metavar="N", help="N configuraciones al azar en vez de la grilla")
+    ap.add_argument("--seed", type=int)
+    ap.add_argument("--workers", type=int, help="procesos (default: CPUs)")
+    ap.add_argument("--from", dest="slot_from", type=int)
+    ap.add_argument("--to", dest="slot_to", type=int)
+    ap.add_argument("--sort", default="total_pnl", choices=SORT_KEYS)
+    ap.add_argument("--top", type=int, default=20)
+    ap.add_argument("--out", help="CSV con el ranking completo")
+    args = ap.parse_args(argv)
+
+    files = replay.tick_files(args.ticks, args.slot_from, args.slot_to)
+    if not files:
+        sys.exit(f"sin archivos de ticks en {args.ticks}")
+    spec    = load_spec(args.grid)
+    configs = random_configs(spec, args.random, args.seed) if args.random else grid_configs(spec)
+
+    ranking = optimize(files, configs, args.workers, args.sort)
+    print(format_table(ranking[:args.top], list(spec)))
+    if args.out:
+        save_csv(args.out, ranking, list(spec))
+
+
+if __name__ == "__main__":
+    main()
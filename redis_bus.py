@@ -0,0 +1,222 @@
+"""
+redis_bus.py — Estado, eventos y trades del bot por Redis pub/sub.
+
+Para correr bot y dashboard en nodos distintos sin volumen compartido, y para
+que varias réplicas del dashboard reciban el estado sin leer un archivo:
+
+  - RedisBus (bot): state(), event() y trade() solo encolan (put_nowait); un
+    hilo publica en pipeline. Si Redis no responde los mensajes se descartan
+    y se cuentan en `dropped`; el bot sigue igual.
+  - StateSubscriber (dashboard): hilo suscrito al canal de estado. Al
+    conectarse lee la última foto de la key para no esperar al próximo cambio.
+
+Canales y keys (<p> = REDIS_PREFIX):
+  <p>:state   canal y key  — estado completo en JSON (el mismo de STATE_FILE)
+  <p>:events  canal        — líneas de log_event ("[HH:MM:SS] mensaje")
+  <p>:trades  canal        — registro JSON de cada trade cerrado
+
+El paquete redis es opcional: sin él (o sin REDIS_URL) nada de esto se usa.
+
+Configurable via env vars:
+  REDIS_URL    = redis://host:6379/0 (sin definir = desactivado)
+  REDIS_PREFIX = prefijo de canales y keys (default basket)
+"""
+
+import json
+import logging
+import os
+import queue
+import threading
+import time
+
+try:
+    import redis
+except ImportError:   # solo hace falta con REDIS_URL
+    redis = None
+
+REDIS_URL    = os.environ.get("REDIS_URL", "")
+REDIS_PREFIX = os.environ.get("REDIS_PREFIX", "basket")
+QUEUE_SIZE   = 10_000
+BATCH        = 256     # mensajes por pipeline
+TIMEOUT_SECS = 2.0
+RETRY_SECS   = 1.0     # espera tras un error de conexión
+
+log = logging.getLogger("redis_bus")
+
+
+def _client(url: str):
+    if redis is None:
+        raise RuntimeError("REDIS_URL definido pero el paquete redis no está instalado")
+    return redis.Redis.from_url(url, socket_timeout=TIMEOUT_SECS, socket_connect_timeout=TIMEOUT_SECS)
+
+
+def _close(*conns):
+    """Cierra pubsub / clientes de un intento fallido sin propagar errores."""
+    for conn in conns:
+        if conn is None:
+            continue
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+
+class RedisBus:
+    """Publicador del bot: cola acotada + hilo con pipeline."""
+
+    def __init__(self, url: str, prefix: str = REDIS_PREFIX, queue_size: int = QUEUE_SIZE):
+        self.url       = url
+        self.key       = f"{prefix}:state"
+        self.channels  = {"state": f"{prefix}:state", "event": f"{prefix}:events", "trade": f"{prefix}:trades"}
+        self.published = 0
+        self.dropped   = 0
+        self._client   = _client(url)
+        self._queue: queue.Queue = queue.Queue(maxsize=queue_size)
+        self._lock     = threading.Lock()
+        self._thread   = None
+        self._down     = False
+
+    def state(self, state: dict):
+        self._put("state", state)
+
+    def event(self, entry: str):
+        self._put("event", entry)
+
+    def trade(self, record: dict):
+        self._put("trade", record)
+
+    # Interfaz de sink de StatePublisher
+    def write(self, state: dict):
+        self.state(state)
+
+    def close(self, timeout: float = 5.0):
+        """Publica lo encolado y detiene el hilo."""
+        if self._thread is None:
+            return
+        self._queue.put(None)
+        self._thread.join(timeout)
+        self._thread = None
+
+    def stats(self) -> dict:
+        return {"published": self.published, "dropped": self.dropped, "queued": self._queue.qsize()}
+
+    def _put(self, kind: str, payload):
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name="redis-bus", daemon=True)
+                    self._thread.start()
+        try:
+            self._queue.put_nowait((kind, payload))
+        except queue.Full:
+            self.dropped += 1
+
+    # ── Hilo publicador ───────────────────────────────────────────────────────
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            batch = [item] if item is not None else []
+            while item is not None and len(batch) < BATCH:
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is not None:
+                    batch.append(item)
+            if batch:
+                self._publish(batch)
+            if item is None:
+                break
+
+    def _publish(self, batch: list):
+        try:
+            pipe = self._client.pipeline(transaction=False)
+            for kind, payload in batch:
+                data = payload if kind == "event" else json.dumps(payload)
+                if kind == "state":
+                    pipe.set(self.key, data)
+                pipe.publish(self.channels[kind], data)
+            pipe.execute()
+            self.published += len(batch)
+            if self._down:
+                self._down = False
+                log.info("redis bus: conexión recuperada")
+        except Exception as e:
+            self.dropped += len(batch)
+            if not self._down:
+                self._down = True
+                log.warning(f"redis bus: error publicando — {e}")
+            time.sleep(RETRY_SECS)
+
+
+class StateSubscriber:
+    """
+    Estado del bot recibido por Redis, con la misma interfaz de lectura que
+    state_channel.StateReader: state() y json_body(), None si aún no hay estado.
+    """
+
+    def __init__(self, url: str, prefix: str = REDIS_PREFIX):
+        self.url      = url
+        self.key      = f"{prefix}:state"
+        self.channel  = f"{prefix}:state"
+        self.received = 0
+        self._cache   = (None, None)   # (JSON, estado parseado); se reemplaza entero
+        self._lock    = threading.Lock()
+        self._thread  = None
+
+    def json_body(self) -> bytes | None:
+        self._start()
+        return self._cache[0]
+
+    def state(self) -> dict | None:
+        self._start()
+        body, state = self._cache
+        if body is None:
+            return None
+        if state is None:
+            state = json.loads(body)
+            # Compare-and-set: si mientras tanto llegó un estado nuevo, no pisarlo con este
+            with self._lock:
+                if self._cache[0] is body:
+                    self._cache = (body, state)
+        return state
+
+    def _start(self):
+        # Hilo creado en el primer request: sobrevive al fork de los workers de gunicorn
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name="redis-state", daemon=True)
+                    self._thread.start()
+
+    def _run(self):
+        down = False
+        while True:
+            client = pubsub = None
+            try:
+                client = _client(self.url)
+                pubsub = client.pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(self.channel)
+                # Después de suscribirse: ningún estado posterior a esta foto se pierde
+                body = client.get(self.key)
+                if body is not None:
+                    with self._lock:
+                        self._cache = (body, None)
+                if down:
+                    down = False
+                    log.info("redis state: conexión recuperada")
+                while True:
+                    msg = pubsub.get_message(timeout=TIMEOUT_SECS)
+                    if msg and msg["type"] == "message":
+                        with self._lock:
+                            self._cache = (msg["data"], None)
+                        self.received += 1
+            except Exception as e:
+                if not down:
+                    down = True
+                    log.warning(f"redis state: {e} — reconectando")
+            finally:
+                # Cada intento arma conexiones nuevas: las del anterior no quedan abiertas
+                _close(pubsub, client)
+            time.sleep(RETRY_SECS)
@@ -0,0 +1,287 @@
+"""
+replay.py — Replay determinista de ticks grabados sobre la lógica de basket.py.
+
+Lee los archivos de tick_recorder (TICK_RECORD_DIR) y los pasa, tick por tick,
+por las mismas funciones que usa main_loop en vivo: apply_quotes, sample_market
+y run_tick (stop loss, resolución, señal y entrada). El reloj de strategy_core
+se reemplaza por uno virtual que avanza con el timestamp de cada tick, así
+seconds_remaining, los timestamps de trades y el CSV salen iguales a los de la
+corrida en vivo. No hay red ni sleeps: corre tan rápido como da la CPU.
+
+Uso:
+  python replay.py <dir_ticks> [--out DIR] [--from SLOT] [--to SLOT]
+                   [--set DIVERGENCE_THRESHOLD=0.04 --set STOP_LOSS_PRICE=0.3 ...]
+
+Los símbolos del basket se toman de la grabación (BASKET_SYMBOLS se ignora).
+Con SHADOW_GRID definido la flota sombra también se reproduce.
+
+Solo se usa el nivel 0 de cada registro (best bid/ask), que es lo que consume
+run_tick. Los niveles más profundos no cambian el replay; en modo poll el bot
+graba como mucho 8 por lado (top_bids/top_asks de METRICS_FULL) y el resto
+queda en 0 aunque TICK_RECORD_LEVELS sea mayor.
+"""
+
+import argparse
+import json
+import logging
+import os
+import sys
+from datetime import datetime, timezone
+
+from tick_recorder import SIDE_UP, list_tick_files, read_ticks
+
+# Parámetros de basket.py que se pueden sobreescribir con --set / params
+PARAMS = [
+    "DIVERGENCE_THRESHOLD",
+    "DIVERGENCE_MAX",
+    "ENTRY_WINDOW_SECS",
+    "ENTRY_OPEN_SECS",
+    "ENTRY_CLOSE_SECS",
+    "ENTRY_MIN_PRICE",
+    "STOP_LOSS_PRICE",
+    "CONSENSUS_FULL",
+    "CONSENSUS_SOFT",
+    "RESOLVED_UP_THRESH",
+    "RESOLVED_DN_THRESH",
+]
+
+
+# ═══════════════════════════════════════════════════════
+#  LECTURA DE TICKS
+# ═══════════════════════════════════════════════════════
+
+def tick_files(directory: str, slot_from: int | None = None, slot_to: int | None = None) -> list[tuple[int, str]]:
+    return [(slot, path) for slot, path in list_tick_files(directory)
+            if (slot_from is None or slot >= slot_from) and (slot_to is None or slot <= slot_to)]
+
+
+def recorded_symbols(files: list[tuple[int, str]]) -> list[str]:
+    """Símbolos en orden de grabación (el orden de SYMBOLS del bot que grabó)."""
+    symbols = []
+    for _, path in files:
+        for sym in dict.fromkeys(read_ticks(path)["sym"].tolist()):
+            sym = sym.decode()
+            if sym not in symbols:
+                symbols.append(sym)
+    return symbols
+
+
+def iter_ticks(records, symbols: list[str]):
+    """
+    Agrupa los registros de un archivo en ticks: listas de (ts, sym, stale,
+    up_bid, up_ask, dn_bid, dn_ask). sample_market recorre SYMBOLS en orden,
+    así que un tick nuevo empieza cuando el índice del símbolo no avanza.
+    """
+    if len(records) == 0:
+        return
+    ts    = records["ts"].tolist()
+    syms  = records["sym"].tolist()
+    sides = records["side"].tolist()
+    stale = records["stale"].tolist()
+    bid   = records["bid_px"][:, 0].tolist()
+    ask   = records["ask_px"][:, 0].tolist()
+    index = {s.encode(): i for i, s in enumerate(symbols)}
+
+    legs, last = [], -1
+    for i in range(0, len(ts) - 1, 2):
+        if sides[i] != SIDE_UP or syms[i + 1] != syms[i]:
+            continue   # par UP/DOWN incompleto
+        pos = index[syms[i]]
+        if legs and pos <= last:
+            yield legs
+            legs = []
+        legs.append((ts[i], syms[i].decode(), bool(stale[i]), bid[i], ask[i], bid[i + 1], ask[i + 1]))
+        last = pos
+    if legs:
+        yield legs
+
+
+def market_info(sym: str, slot: int, step: int) -> dict:
+    end = datetime.fromtimestamp(slot + step, timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+    return {
+        "condition_id":  f"replay-{sym}-{slot}",
+        "question":      f"{sym} Up/Down 5min (replay {slot})",
+        "end_date":      end,
+        "up_token_id":   f"{sym}-{slot}-up",
+        "down_token_id": f"{sym}-{slot}-down",
+    }
+
+
+# ═══════════════════════════════════════════════════════
+#  MOTOR
+# ═══════════════════════════════════════════════════════
+
+# Valores originales de PARAMS en basket.py (se capturan al importarlo)
+_defaults: dict = {}
+
+def load_basket(symbols: list[str], csv_file: str = "", log_file: str = ""):
+    """
+    Importa basket.py configurado para replay: sin feed WS, sin grabación,
+    sin state file. Las salidas vacías ("") se desactivan.
+    """
+    os.environ["BASKET_SYMBOLS"] = ",".join(symbols)
+    os.environ["FEED_MODE"]      = "poll"
+    os.environ["STATE_FILE"]     = ""
+    os.environ["STATE_SHM"]      = ""
+    os.environ["REDIS_URL"]      = ""
+    os.environ["CSV_FILE"]       = csv_file
+    os.environ["LOG_FILE"]       = log_file
+    import basket
+    if list(basket.SYMBOLS) != list(symbols):
+        # BASKET_SYMBOLS solo se lee al importar basket: no se puede cambiar después
+        raise ValueError(f"basket ya importado con BASKET_SYMBOLS={basket.SYMBOLS}, "
+                         f"la grabación tiene {list(symbols)}")
+    basket.recorder = None   # un replay nunca graba ticks, aunque TICK_RECORD_DIR esté definido
+    logging.getLogger("basket").setLevel(logging.WARNING)
+    _defaults.update({name: getattr(basket, name) for name in PARAMS if name not in _defaults})
+    return basket
+
+
+def reset_basket(basket, params: dict | None = None):
+    """
+    Estado limpio para una corrida nueva en el mismo proceso. Los parámetros
+    no indicados vuelven al valor de basket.py.
+    """
+    unknown = set(params or {}) - set(PARAMS)
+    if unknown:
+        raise ValueError(f"parámetros desconocidos: {sorted(unknown)}")
+    for name, value in {**_defaults, **(params or {})}.items():
+        setattr(basket, name, value)
+    basket.bt = basket.BacktestState()
+    for sym in basket.SYMBOLS:
+        basket.markets[sym] = basket.MarketLeg()
+        basket.mid_history[sym].clear()
+    basket.recent_events.clear()
+    basket.signals = basket.BasketEngine(
+        basket.SYMBOLS,
+        resolved_up=basket.RESOLVED_UP_THRESH,
+        resolved_dn=basket.RESOLVED_DN_THRESH,
+        consensus_full=basket.CONSENSUS_FULL,
+        consensus_soft=basket.CONSENSUS_SOFT,
+    )
+    if basket.shadow:
+        basket.shadow.close()
+    basket.shadow = basket._load_shadow()
+
+
+def run_replay(basket, files: list[tuple[int, str]]) -> dict:
+    """Reproduce los archivos en orden de slot. Devuelve el resumen de la corrida."""
+    import strategy_core
+
+    clock = [0.0]
+    strategy_core.set_clock(lambda: clock[0])
+    bt, markets = basket.bt, basket.markets
+    current, ticks = None, 0
+    try:
+        for slot, path in files:
+            records = read_ticks(path)
+            symbols = {s.decode() for s in set(records["sym"].tolist())}
+            for legs in iter_ticks(records, basket.SYMBOLS):
+                clock[0] = legs[0][0]
+                if slot != current:
+                    _start_slot(basket, slot, symbols)
+                    current = slot
+                bt.phase  = "ACTIVO"
+                bt.cycle += 1
+                # Cada pata con su propio timestamp; run_tick con el de la última
+                for ts, sym, stale, up_bid, up_ask, dn_bid, dn_ask in legs:
+                    if markets[sym].info is None:
+                        continue
+                    clock[0] = ts
+                    if not stale:
+                        basket.apply_quotes(sym, up_bid, up_ask, dn_bid, dn_ask)
+                    basket.sample_market(sym, stale=stale)
+                # Si run_tick cerró el slot, los ticks que queden de él no reabren
+                # sus mercados: en vivo discover_all ya pasó al slot siguiente
+                basket.run_tick()
+                ticks += 1
+        _expire(basket)
+    finally:
+        strategy_core.set_clock()
+    return summary(basket, ticks)
+
+
+def _expire(basket):
+    """Cierra el slot en curso si la grabación se cortó antes del vencimiento."""
+    if any(basket.markets[s].info for s in basket.SYMBOLS):
+        for sym in basket.SYMBOLS:
+            basket.markets[sym].info = None
+        if basket.bt.position:
+            basket.check_resolution()
+
+
+def _start_slot(basket, slot: int, symbols: set[str]):
+    # Mismo efecto que discover_all: mercados nuevos, historial limpio, ciclo nuevo
+    _expire(basket)
+    for sym in basket.SYMBOLS:
+        leg = basket.markets[sym]
+        leg.info  = market_info(sym, slot, basket.SLOT_STEP) if sym in symbols else None
+        leg.error = None
+        basket.mid_history[sym].clear()
+    basket.start_cycle()
+
+
+def summary(basket, ticks: int = 0) -> dict:
+    bt     = basket.bt
+    total  = bt.wins + bt.losses
+    gains  = sum(t["pnl_usd"] for t in bt.trades if t["pnl_usd"] > 0)
+    losses = -sum(t["pnl_usd"] for t in bt.trades if t["pnl_usd"] < 0)
+    return {
+        "ticks":         ticks,
+        "trades":        total,
+        "wins":          bt.wins,
+        "losses":        bt.losses,
+        "win_rate":      round(bt.wins / total * 100, 1) if total else 0,
+        "profit_factor": round(gains / losses, 2) if losses > 0 else None,
+        "total_pnl":     round(bt.total_pnl, 4),
+        "roi_pct":       round((bt.capital - basket.CAPITAL_TOTAL) / basket.CAPITAL_TOTAL * 100, 2),
+        "capital":       round(bt.capital, 4),
+        "max_drawdown":  round(bt.max_drawdown, 4),
+        "skipped":       bt.skipped,
+    }
+
+
+# ═══════════════════════════════════════════════════════
+#  CLI
+# ═══════════════════════════════════════════════════════
+
+def _parse_set(items: list[str]) -> dict:
+    params = {}
+    for item in items:
+        name, _, value = item.partition("=")
+        params[name.strip().upper()] = float(value)
+    return params
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Replay determinista de ticks grabados")
+    ap.add_argument("ticks", help="directorio de TICK_RECORD_DIR")
+    ap.add_argument("--out", default=".", help="directorio para replay_trades.csv / replay_log.json")
+    ap.add_argument("--from", dest="slot_from", type=int)
+    ap.add_argument("--to", dest="slot_to", type=int)
+    ap.add_argument("--set", action="append", default=[], metavar="PARAM=VALOR")
+    args = ap.parse_args(argv)
+
+    files = tick_files(args.ticks, args.slot_from, args.slot_to)
+    if not files:
+        sys.exit(f"sin archivos de ticks en {args.ticks}")
+    os.makedirs(args.out, exist_ok=True)
+    csv_file = os.path.join(args.out, "replay_trades.csv")
+    log_file = os.path.join(args.out, "replay_log.json")
+    if os.path.exists(csv_file):
+        os.remove(csv_file)
+
+    basket = load_basket(recorded_symbols(files), csv_file=csv_file)
+    reset_basket(basket, _parse_set(args.set))
+    result = run_replay(basket, files)
+
+    basket.LOG_FILE = log_file   # el log completo se escribe una vez, al final
+    basket._save_log()
+    if basket.shadow:
+        basket.shadow.close()   # trades encolados y resumen pendiente, antes del final
+        basket.shadow.write_summary(basket.SHADOW_FILE)
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,359 @@
+"""
+shadow_fleet.py — Flota de estrategias sombra sobre un único feed.
+
+Cada variante es un juego de parámetros de la estrategia de basket.py
+(DIVERGENCE_THRESHOLD, DIVERGENCE_MAX, ENTRY_OPEN_SECS, ENTRY_WINDOW_SECS,
+ENTRY_MIN_PRICE, STOP_LOSS_PRICE) con su propio estado simulado: capital,
+P&L, posición, trades y drawdown. Todas las variantes consumen los mismos
+quotes y la misma señal del basket en cada tick; los chequeos de stop loss,
+resolución y entrada se evalúan en batch con arrays NumPy (una fila por
+variante). Solo los cierres de posición, que son raros, se contabilizan
+variante por variante.
+
+La grilla se define en un JSON (env SHADOW_GRID):
+  - dict de listas  -> producto cartesiano:  {"DIVERGENCE_THRESHOLD": [0.04, 0.05], ...}
+  - lista de dicts  -> variantes explícitas: [{"STOP_LOSS_PRICE": 0.3}, ...]
+Los parámetros no indicados toman el valor vivo de basket.py.
+
+Nada de esto toca disco en el hilo del llamador: los trades cerrados se
+encolan para un hilo escritor que los agrega al CSV, y publish_summary()
+entrega el resumen a un StatePublisher (hilo propio, escritura atómica).
+close() vacía ambos.
+"""
+
+import csv
+import itertools
+import json
+import logging
+import os
+import queue
+import threading
+
+import numpy as np
+
+from state_publisher import StatePublisher
+
+PARAMS = [
+    "DIVERGENCE_THRESHOLD",
+    "DIVERGENCE_MAX",
+    "ENTRY_OPEN_SECS",
+    "ENTRY_WINDOW_SECS",
+    "ENTRY_MIN_PRICE",
+    "STOP_LOSS_PRICE",
+]
+
+SIDE_UP, SIDE_DN = 0, 1
+SIDE_NAMES = ("UP", "DOWN")
+
+log = logging.getLogger("shadow_fleet")
+
+TRADE_COLUMNS = [
+    "variant", "asset", "side", "entry_ts", "exit_ts", "secs_left_entry", "gap_pts",
+    "entry_ask", "shares", "exit_type", "exit_price", "resolved", "outcome",
+    "pnl_usd", "capital_after",
+]
+
+
+def load_grid(path: str, defaults: dict) -> list[dict]:
+    with open(path) as f:
+        spec = json.load(f)
+    if isinstance(spec, dict):
+        keys   = [k for k in PARAMS if k in spec]
+        combos = [dict(zip(keys, values)) for values in itertools.product(*[spec[k] for k in keys])]
+    else:
+        combos = list(spec)
+    unknown = {k for c in combos for k in c} - set(PARAMS)
+    if unknown:
+        raise ValueError(f"Parámetros desconocidos en {path}: {sorted(unknown)}")
+    return [{**{k: defaults[k] for k in PARAMS}, **c} for c in combos]
+
+
+class ShadowFleet:
+    def __init__(self, variants: list[dict], symbols: list[str], entry_usd: float, capital: float,
+                 entry_close_secs: float, resolved_up: float, resolved_dn: float,
+                 trades_file: str | None = None):
+        self.variants    = variants
+        self.symbols     = list(symbols)
+        self.entry_usd   = entry_usd
+        self.capital0    = capital
+        self.entry_close = entry_close_secs
+        self.resolved_up = resolved_up
+        self.resolved_dn = resolved_dn
+        self.trades_file = trades_file
+
+        n = len(variants)
+        p = {k: np.array([v[k] for v in variants], dtype=float) for k in PARAMS}
+        self.div_min   = p["DIVERGENCE_THRESHOLD"]
+        self.div_max   = p["DIVERGENCE_MAX"]
+        self.win_open  = p["ENTRY_OPEN_SECS"]
+        self.win_start = p["ENTRY_WINDOW_SECS"]
+        self.min_price = p["ENTRY_MIN_PRICE"]
+        self.stop_loss = p["STOP_LOSS_PRICE"]
+
+        self.capital   = np.full(n, capital)
+        self.total_pnl = np.zeros(n)
+        self.peak      = np.full(n, capital)
+        self.max_dd    = np.zeros(n)
+        self.gross_win = np.zeros(n)
+        self.gross_loss = np.zeros(n)
+        self.wins      = np.zeros(n, dtype=np.int64)
+        self.losses    = np.zeros(n, dtype=np.int64)
+        self.skipped   = np.zeros(n, dtype=np.int64)
+        self.traded    = np.zeros(n, dtype=bool)   # traded_this_cycle
+
+        self.pos_open   = np.zeros(n, dtype=bool)
+        self.pos_asset  = np.zeros(n, dtype=np.int64)
+        self.pos_side   = np.zeros(n, dtype=np.int64)
+        self.pos_price  = np.zeros(n)
+        self.pos_shares = np.zeros(n)
+        self.pos_secs   = np.zeros(n)
+        self.pos_div    = np.zeros(n)
+        self.pos_ts: list[str | None] = [None] * n
+
+        self.trades: list[list[dict]] = [[] for _ in range(n)]
+
+        self._trade_queue: queue.Queue = queue.Queue()
+        self._trade_thread = None
+        self._publisher    = None
+
+    @classmethod
+    def from_grid(cls, path: str, defaults: dict, **kwargs) -> "ShadowFleet":
+        return cls(load_grid(path, defaults), **kwargs)
+
+    def __len__(self) -> int:
+        return len(self.variants)
+
+    # ── Ciclo ─────────────────────────────────────────────────────────────────
+
+    def new_cycle(self):
+        self.traded[:] = False
+
+    def step(self, ts: str, secs: float | None,
+             up_bid: np.ndarray, up_ask: np.ndarray, up_mid: np.ndarray,
+             dn_bid: np.ndarray, dn_ask: np.ndarray, dn_mid: np.ndarray,
+             expired: np.ndarray, fallback: np.ndarray,
+             signal_asset: str | None, signal_side: str | None, signal_div: float,
+             consensus: str, stale: bool = False) -> int:
+        """
+        Un tick para todas las variantes, en el mismo orden que main_loop:
+        stop loss -> resolución (CLOB concluyente o fallback si expiró) -> entrada.
+        Arrays por símbolo (orden de self.symbols). fallback: +1 UP, -1 DOWN,
+        0 sin resolución, para los activos expirados. Devuelve los cierres.
+        """
+        closed = self._check_exits(ts, up_bid, dn_bid, up_mid, expired, fallback)
+        if secs is not None:
+            self._check_entry(ts, secs, up_ask, up_mid, dn_ask, dn_mid,
+                              signal_asset, signal_side, signal_div, consensus, stale)
+        return closed
+
+    # ── Salidas ───────────────────────────────────────────────────────────────
+
+    def _check_exits(self, ts, up_bid, dn_bid, up_mid, expired, fallback) -> int:
+        idx = np.flatnonzero(self.pos_open)
+        if not idx.size:
+            return 0
+        asset = self.pos_asset[idx]
+        side  = self.pos_side[idx]
+
+        # 1. Stop loss sobre el bid del lado comprado
+        bid = np.where(side == SIDE_UP, up_bid[asset], dn_bid[asset])
+        sl  = (bid <= self.stop_loss[idx]) & (bid > 0)
+        for v, price in zip(idx[sl], bid[sl]):
+            pnl = round(self.pos_shares[v] * price - self.entry_usd, 6)
+            self._close(v, ts, "STOP_LOSS", price, None, pnl)
+
+        # 2. Precio CLOB concluyente del activo
+        rest  = ~sl
+        um    = up_mid[asset]
+        res   = np.where(um >= self.resolved_up, SIDE_UP, np.where(um <= self.resolved_dn, SIDE_DN, -1))
+        conc  = rest & (res >= 0)
+        # 3. Activo expirado sin precio concluyente -> fallback por historial
+        fb    = rest & (res < 0) & expired[asset]
+        res   = np.where(fb, np.where(fallback[asset] > 0, SIDE_UP,
+                                      np.where(fallback[asset] < 0, SIDE_DN, -1)), res)
+        for v, r, is_fb in zip(idx[conc | fb], res[conc | fb], fb[conc | fb]):
+            if r < 0:
+                self._close(v, ts, "RESOLUTION", 0.0, "UNKNOWN", -self.entry_usd)
+            elif r == self.pos_side[v]:
+                self._close(v, ts, "RESOLUTION", 1.0, SIDE_NAMES[r],
+                            round((self.pos_shares[v] - 1) * self.entry_usd, 6))
+            else:
+                self._close(v, ts, "RESOLUTION", 0.0, SIDE_NAMES[r], -self.entry_usd)
+        return int(sl.sum() + (conc | fb).sum())
+
+    def _close(self, v: int, ts: str, exit_type: str, exit_price: float, resolved: str | None, pnl: float):
+        win = exit_type == "RESOLUTION" and pnl > 0
+        self.capital[v]   += self.entry_usd + pnl
+        self.total_pnl[v] += pnl
+        if win:
+            self.wins[v]      += 1
+            self.gross_win[v] += pnl
+        else:
+            self.losses[v]     += 1
+            self.gross_loss[v] -= pnl
+        if self.capital[v] > self.peak[v]:
+            self.peak[v] = self.capital[v]
+        self.max_dd[v] = max(self.max_dd[v], self.peak[v] - self.capital[v])
+        self.pos_open[v] = False
+
+        record = {
+            "variant":         int(v),
+            "asset":           self.symbols[self.pos_asset[v]],
+            "side":            SIDE_NAMES[self.pos_side[v]],
+            "entry_ts":        self.pos_ts[v],
+            "exit_ts":         ts,
+            "secs_left_entry": round(float(self.pos_secs[v]), 1),
+            "gap_pts":         round(float(self.pos_div[v]) * 100, 2),
+            "entry_ask":       round(float(self.pos_price[v]), 6),
+            "shares":          round(float(self.pos_shares[v]), 6),
+            "exit_type":       exit_type,
+            "exit_price":      round(float(exit_price), 6),
+            "resolved":        resolved or "",
+            "outcome":         "WIN" if win else "LOSS",
+            "pnl_usd":         round(float(pnl), 6),
+            "capital_after":   round(float(self.capital[v]), 4),
+        }
+        self.trades[v].append(record)
+        if self.trades_file:
+            self._append_trade(record)
+
+    def _append_trade(self, record: dict):
+        if self._trade_thread is None:
+            self._trade_thread = threading.Thread(target=self._write_trades, name="shadow-trades", daemon=True)
+            self._trade_thread.start()
+        self._trade_queue.put(record)
+
+    def _write_trades(self):
+        while True:
+            record = self._trade_queue.get()
+            batch  = [record] if record is not None else []
+            while record is not None:
+                try:
+                    record = self._trade_queue.get_nowait()
+                except queue.Empty:
+                    break
+                if record is not None:
+                    batch.append(record)
+            if batch:
+                try:
+                    file_exists = os.path.isfile(self.trades_file)
+                    with open(self.trades_file, "a", newline="", encoding="utf-8") as f:
+                        writer = csv.DictWriter(f, fieldnames=TRADE_COLUMNS)
+                        if not file_exists:
+                            writer.writeheader()
+                        writer.writerows(batch)
+                except Exception as e:
+                    log.warning(f"No se pudieron escribir {len(batch)} trades en {self.trades_file}: {e}")
+            if record is None:
+                break
+
+    # ── Entradas ──────────────────────────────────────────────────────────────
+
+    def _can_enter(self, secs: float) -> np.ndarray:
+        """Variantes sin posición ni trade en el ciclo, dentro de su ventana de entrada."""
+        ok = ~self.traded & ~self.pos_open
+        ok &= (secs <= self.win_start) & (secs >= self.win_open) & (secs > self.entry_close)
+        return ok
+
+    def wants_signal(self, secs: float | None) -> bool:
+        """True si alguna variante puede entrar en este tick (necesita la señal)."""
+        return secs is not None and bool(self._can_enter(secs).any())
+
+    def _check_entry(self, ts, secs, up_ask, up_mid, dn_ask, dn_mid,
+                     signal_asset, signal_side, signal_div, consensus, stale):
+        # Mismo orden de filtros (y de conteo de skipped) que basket.check_entry
+        ok = self._can_enter(secs)
+        if not ok.any():
+            return
+        if consensus != "FULL":
+            self.skipped[ok] += 1
+            return
+        if not signal_asset:
+            return
+
+        div_abs = abs(signal_div)
+        ok &= div_abs >= self.div_min
+        over = ok & (div_abs > self.div_max)
+        self.skipped[over] += 1
+        ok &= ~over
+        if not ok.any() or stale:
+            return
+
+        a    = self.symbols.index(signal_asset)
+        side = SIDE_UP if signal_side == "UP" else SIDE_DN
+        ask  = float(up_ask[a] if side == SIDE_UP else dn_ask[a])
+        if ask <= 0 or ask >= 1:
+            return
+        um, dm = up_mid[a], dn_mid[a]
+        if um >= self.resolved_up or um <= self.resolved_dn or \
+           dm >= self.resolved_up or dm <= self.resolved_dn:
+            self.skipped[ok] += 1
+            return
+
+        low = ok & (ask < self.min_price)
+        self.skipped[low] += 1
+        ok &= ~low
+        if not ok.any():
+            return
+
+        shares = round(self.entry_usd / ask, 6)
+        self.capital[ok]   -= self.entry_usd
+        self.traded[ok]     = True
+        self.pos_open[ok]   = True
+        self.pos_asset[ok]  = a
+        self.pos_side[ok]   = side
+        self.pos_price[ok]  = ask
+        self.pos_shares[ok] = shares
+        self.pos_secs[ok]   = secs
+        self.pos_div[ok]    = signal_div
+        for v in np.flatnonzero(ok):
+            self.pos_ts[v] = ts
+
+    # ── Reporte ───────────────────────────────────────────────────────────────
+
+    def summary(self) -> list[dict]:
+        """Una fila por variante con sus parámetros y métricas, ordenadas por P&L."""
+        rows = []
+        for v, params in enumerate(self.variants):
+            total = int(self.wins[v] + self.losses[v])
+            rows.append({
+                "variant":      v,
+                **params,
+                "trades":       total,
+                "wins":         int(self.wins[v]),
+                "losses":       int(self.losses[v]),
+                "win_rate":     round(self.wins[v] / total * 100, 1) if total else 0,
+                "profit_factor": round(self.gross_win[v] / self.gross_loss[v], 2) if self.gross_loss[v] > 0 else None,
+                "total_pnl":    round(float(self.total_pnl[v]), 4),
+                "capital":      round(float(self.capital[v]), 4),
+                "max_drawdown": round(float(self.max_dd[v]), 4),
+                "skipped":      int(self.skipped[v]),
+                "open":         bool(self.pos_open[v]),
+            })
+        rows.sort(key=lambda r: r["total_pnl"], reverse=True)
+        return rows
+
+    def write_summary(self, path: str):
+        """Escritura atómica inmediata (bloqueante: para el final de un replay)."""
+        tmp = f"{path}.tmp"
+        with open(tmp, "w") as f:
+            json.dump({"variants": len(self), "ranking": self.summary()}, f)
+        os.replace(tmp, path)
+
+    def publish_summary(self, path: str, flush: bool = False):
+        """Entrega el resumen al hilo escritor; no bloquea."""
+        if self._publisher is None or self._publisher.path != path:
+            if self._publisher is not None:
+                self._publisher.close()
+            self._publisher = StatePublisher(path, max_hz=0)   # la cadencia la decide el llamador
+        self._publisher.publish({"variants": len(self), "ranking": self.summary()}, flush=flush)
+
+    def close(self, timeout: float = 5.0):
+        """Escribe los trades encolados y el último resumen, y detiene los hilos."""
+        if self._trade_thread is not None:
+            self._trade_queue.put(None)
+            self._trade_thread.join(timeout)
+            self._trade_thread = None
+        if self._publisher is not None:
+            self._publisher.close(timeout)
+            self._publisher = None
@@ -0,0 +1,436 @@
+"""
+simulator.py — CLOB + Gamma locales para pruebas de carga end-to-end del bot.
+
+Sirve los endpoints que usa strategy_core con mercados UP/DOWN de 5 minutos
+sintéticos para cada símbolo:
+
+  GET  /markets?slug=<sym>-updown-5m-<slot>   Gamma: metadata del slot ([] si no existe)
+  GET  /markets/<condition_id>                CLOB: tokens del mercado (+ campos de resolución de Gamma)
+  GET  /book?token_id=...                     book de un token (ClobClient.get_order_book y cliente async)
+  POST /books                                 batch de books [{"token_id": ...}, ...]
+  GET  /sim/stats                             requests, errores y latencia servidos
+
+Cada slot tiene un random walk por símbolo (con un factor común, los activos
+del basket se mueven correlacionados); la probabilidad de UP es la de que el
+walk termine arriba del precio de apertura, así que los books convergen a 0/1
+al acercarse el cierre. Latencia, errores y profundidad de los books son
+configurables.
+
+El reloj de mercado es el de strategy_core (CLOCK_SPEED / CLOCK_EPOCH /
+CLOCK_ORIGIN): con --speed 10 un ciclo de 5 minutos dura 30s reales. El bot
+tiene que arrancar con las mismas variables y con CLOB_HOST / GAMMA_API
+apuntando acá; el simulador las imprime al arrancar.
+
+Uso:
+  python simulator.py [--port 8099] [--speed 10] [--latency-ms 40 --jitter-ms 20]
+                      [--error-rate 0.01] [--depth 20] [--symbols ETH,SOL,BTC]
+  python simulator.py --speed 10 --bot --cycles 3   # corre basket.py contra el simulador y reporta
+"""
+
+import argparse
+import json
+import logging
+import math
+import os
+import random
+import signal
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+
+from flask import Flask, jsonify, request
+from werkzeug.serving import make_server
+
+import strategy_core
+from strategy_core import SLOT_STEP, get_slug_prefix
+
+SIM_PORT       = int(os.environ.get("SIM_PORT", 8099))
+SIM_LATENCY_MS = float(os.environ.get("SIM_LATENCY_MS", 40))
+SIM_JITTER_MS  = float(os.environ.get("SIM_JITTER_MS", 20))
+SIM_ERROR_RATE = float(os.environ.get("SIM_ERROR_RATE", 0.01))
+SIM_DEPTH      = int(os.environ.get("SIM_DEPTH", 20))
+SIM_SYMBOLS    = [s.strip().upper() for s in os.environ.get("BASKET_SYMBOLS", "ETH,SOL,BTC").split(",") if s.strip()]
+
+VOLATILITY     = 1.0     # desvío del walk por raíz de segundo (escala libre: solo importa vs. el tiempo restante)
+CORRELATION    = 0.8     # peso del factor común entre símbolos
+TICK_SIZE      = 0.01
+SLOTS_AHEAD    = 2       # slots futuros que Gamma ya lista
+SLOTS_BEHIND   = 12      # slots pasados que Gamma sigue listando
+
+
+# ═══════════════════════════════════════════════════════
+#  MERCADOS SINTÉTICOS
+# ═══════════════════════════════════════════════════════
+
+class SlotWalk:
+    """Walks de todos los símbolos en un slot, avanzados juntos a la hora pedida."""
+
+    def __init__(self, symbols: list[str], slot: int, rnd: random.Random):
+        self.symbols = symbols
+        self.slot    = slot
+        self.end     = slot + SLOT_STEP
+        self.x       = [0.0] * len(symbols)
+        self.last    = float(slot)
+        self.rnd     = rnd
+
+    def advance(self, now: float):
+        t  = min(max(now, self.slot), self.end)
+        dt = t - self.last
+        if dt <= 0:
+            return
+        scale  = VOLATILITY * math.sqrt(dt)
+        common = self.rnd.gauss(0, 1)
+        idio   = math.sqrt(1 - CORRELATION ** 2)
+        for i in range(len(self.x)):
+            self.x[i] += scale * (CORRELATION * common + idio * self.rnd.gauss(0, 1))
+        self.last = t
+
+    def prob_up(self, i: int, now: float) -> float:
+        remaining = self.end - min(max(now, self.slot), self.end)
+        if remaining <= 0:
+            return 1.0 if self.x[i] > 0 else 0.0
+        z = self.x[i] / (VOLATILITY * math.sqrt(remaining))
+        return 0.5 * (1 + math.erf(z / math.sqrt(2)))
+
+
+class Simulator:
+    def __init__(self, symbols: list[str], depth: int = SIM_DEPTH, seed: int | None = None):
+        self.symbols = symbols
+        self.index   = {s: i for i, s in enumerate(symbols)}
+        self.depth   = depth
+        self.rnd     = random.Random(seed)
+        self.walks: dict[int, SlotWalk] = {}
+        self.lock    = threading.Lock()
+
+    # ── Identificadores ──
+
+    @staticmethod
+    def condition_id(sym: str, slot: int) -> str:
+        return f"0xsim-{sym.lower()}-{slot}"
+
+    @staticmethod
+    def token_id(sym: str, slot: int, side: str) -> str:
+        return f"sim-{sym.lower()}-{slot}-{side}"
+
+    def parse_condition_id(self, cid: str) -> tuple[str, int] | None:
+        parts = cid.split("-")
+        if len(parts) != 3 or parts[0] != "0xsim" or parts[1].upper() not in self.index:
+            return None
+        return parts[1].upper(), int(parts[2])
+
+    def parse_token_id(self, token_id: str) -> tuple[str, int, str] | None:
+        parts = (token_id or "").split("-")
+        if len(parts) != 4 or parts[0] != "sim" or parts[1].upper() not in self.index or parts[3] not in ("up", "down"):
+            return None
+        return parts[1].upper(), int(parts[2]), parts[3]
+
+    def parse_slug(self, slug: str) -> tuple[str, int] | None:
+        for sym in self.symbols:
+            prefix = get_slug_prefix(sym) + "-"
+            if slug.startswith(prefix) and slug[len(prefix):].isdigit():
+                return sym, int(slug[len(prefix):])
+        return None
+
+    # ── Estado ──
+
+    def listed(self, slot: int, now: float) -> bool:
+        current = int(now) - int(now) % SLOT_STEP
+        return slot % SLOT_STEP == 0 and \
+            current - SLOTS_BEHIND * SLOT_STEP <= slot <= current + SLOTS_AHEAD * SLOT_STEP
+
+    def prob_up(self, sym: str, slot: int, now: float) -> float:
+        with self.lock:
+            walk = self.walks.get(slot)
+            if walk is None:
+                walk = self.walks[slot] = SlotWalk(self.symbols, slot, self.rnd)
+                for old in [s for s in self.walks if s < slot - SLOTS_BEHIND * SLOT_STEP]:
+                    del self.walks[old]
+            walk.advance(now)
+            return walk.prob_up(self.index[sym], now)
+
+    # ── Respuestas ──
+
+    def gamma_market(self, sym: str, slot: int, now: float) -> dict:
+        return {
+            "conditionId": self.condition_id(sym, slot),
+            "slug":        f"{get_slug_prefix(sym)}-{slot}",
+            "question":    f"{sym} Up or Down - 5 min (sim {slot})",
+            "endDate":     time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(slot + SLOT_STEP)),
+            "closed":      now >= slot + SLOT_STEP,
+        }
+
+    def clob_market(self, sym: str, slot: int, now: float) -> dict:
+        p      = self.prob_up(sym, slot, now)
+        closed = now >= slot + SLOT_STEP
+        market = {
+            "condition_id":     self.condition_id(sym, slot),
+            "question":         f"{sym} Up or Down - 5 min (sim {slot})",
+            "market_slug":      f"{get_slug_prefix(sym)}-{slot}",
+            "end_date_iso":     time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(slot + SLOT_STEP)),
+            "accepting_orders": not closed,
+            "tokens": [
+                {"token_id": self.token_id(sym, slot, "up"),   "outcome": "Up",   "price": round(p, 4)},
+                {"token_id": self.token_id(sym, slot, "down"), "outcome": "Down", "price": round(1 - p, 4)},
+            ],
+        }
+        if closed:   # campos de resolución de Gamma (fetch_market_resolution)
+            market["outcomePrices"] = ["1", "0"] if p >= 0.5 else ["0", "1"]
+            market["resolved"]      = True
+            market["winner"]        = "Up" if p >= 0.5 else "Down"
+        return market
+
+    def book(self, token_id: str, now: float) -> dict | None:
+        parsed = self.parse_token_id(token_id)
+        if not parsed:
+            return None
+        sym, slot, side = parsed
+        # Book vivo desde un slot antes de abrir hasta un slot después del cierre
+        # (el CLOB lo mantiene hasta la resolución, ya clavado en 0/1)
+        if not (slot - SLOT_STEP <= now < slot + 2 * SLOT_STEP) or not self.listed(slot, now):
+            return None
+        p   = self.prob_up(sym, slot, now)
+        mid = p if side == "up" else 1 - p
+        with self.lock:
+            sizes = [round(self.rnd.uniform(5, 500), 2) for _ in range(2 * self.depth)]
+        best_bid = math.floor(mid / TICK_SIZE) * TICK_SIZE
+        best_ask = best_bid + TICK_SIZE
+        bids = [(round(best_bid - k * TICK_SIZE, 2), sizes[k]) for k in range(self.depth)]
+        asks = [(round(best_ask + k * TICK_SIZE, 2), sizes[self.depth + k]) for k in range(self.depth)]
+        bids = [(px, sz) for px, sz in bids if 0 < px < 1]
+        asks = [(px, sz) for px, sz in asks if 0 < px < 1]
+        # Mismo orden que la API: mejor precio al final
+        return {
+            "market":           self.condition_id(sym, slot),
+            "asset_id":         token_id,
+            "timestamp":        str(int(now * 1000)),
+            "hash":             f"{token_id}-{int(now * 1000)}",
+            "bids":             [{"price": f"{px:.2f}", "size": str(sz)} for px, sz in reversed(bids)],
+            "asks":             [{"price": f"{px:.2f}", "size": str(sz)} for px, sz in reversed(asks)],
+            "min_order_size":   "5",
+            "tick_size":        str(TICK_SIZE),
+            "neg_risk":         False,
+            "last_trade_price": f"{mid:.2f}",
+        }
+
+
+# ═══════════════════════════════════════════════════════
+#  SERVIDOR
+# ═══════════════════════════════════════════════════════
+
+class ServerStats:
+    def __init__(self):
+        self.started  = time.time()
+        self.requests = defaultdict(int)
+        self.errors   = defaultdict(int)
+        self.books    = 0
+        self.lock     = threading.Lock()
+
+    def count(self, route: str, error: bool = False, books: int = 0):
+        with self.lock:
+            self.requests[route] += 1
+            self.errors[route]   += error
+            self.books           += books
+
+    def summary(self) -> dict:
+        elapsed = max(time.time() - self.started, 1e-9)
+        total   = sum(self.requests.values())
+        return {
+            "elapsed_s":    round(elapsed, 1),
+            "requests":     dict(self.requests),
+            "errors":       dict(self.errors),
+            "books_served": self.books,
+            "req_per_s":    round(total / elapsed, 1),
+        }
+
+
+def create_app(sim: Simulator, latency_ms: float = SIM_LATENCY_MS, jitter_ms: float = SIM_JITTER_MS,
+               error_rate: float = SIM_ERROR_RATE) -> Flask:
+    app   = Flask(__name__)
+    stats = ServerStats()
+    rnd   = random.Random()
+    app.config["SIM_STATS"] = stats
+
+    def delay_or_fail(route: str):
+        """Latencia simulada; True si el request tiene que fallar."""
+        delay = max(0.0, rnd.gauss(latency_ms, jitter_ms)) / 1000
+        if delay:
+            time.sleep(delay)
+        failed = rnd.random() < error_rate
+        if failed:
+            stats.count(route, error=True)
+        return failed
+
+    def unavailable():
+        return jsonify({"error": "simulated upstream error"}), 503
+
+    @app.route("/markets")
+    def gamma_markets():
+        if delay_or_fail("gamma_markets"):
+            return unavailable()
+        now    = strategy_core.now_ts()
+        parsed = sim.parse_slug(request.args.get("slug", ""))
+        stats.count("gamma_markets")
+        if not parsed or not sim.listed(parsed[1], now):
+            return jsonify([])
+        return jsonify([sim.gamma_market(*parsed, now)])
+
+    @app.route("/markets/<condition_id>")
+    def clob_market(condition_id):
+        if delay_or_fail("clob_market"):
+            return unavailable()
+        stats.count("clob_market")
+        parsed = sim.parse_condition_id(condition_id)
+        if not parsed:
+            return jsonify({"error": "market not found"}), 404
+        return jsonify(sim.clob_market(*parsed, strategy_core.now_ts()))
+
+    @app.route("/book")
+    def book():
+        if delay_or_fail("book"):
+            return unavailable()
+        raw = sim.book(request.args.get("token_id", ""), strategy_core.now_ts())
+        stats.count("book", books=bool(raw))
+        if raw is None:
+            return jsonify({"error": "No orderbook exists for the requested token id"}), 404
+        return jsonify(raw)
+
+    @app.route("/books", methods=["POST"])
+    def books():
+        if delay_or_fail("books"):
+            return unavailable()
+        now  = strategy_core.now_ts()
+        body = request.get_json(silent=True) or []
+        raws = [sim.book(item.get("token_id", ""), now) for item in body if isinstance(item, dict)]
+        raws = [r for r in raws if r]
+        stats.count("books", books=len(raws))
+        return jsonify(raws)
+
+    @app.route("/sim/stats")
+    def sim_stats():
+        return jsonify({**stats.summary(), "market_ts": strategy_core.now_ts()})
+
+    return app
+
+
+# ═══════════════════════════════════════════════════════
+#  CORRIDA DEL BOT CONTRA EL SIMULADOR
+# ═══════════════════════════════════════════════════════
+
+def bot_env(port: int, workdir: str, symbols: list[str]) -> dict:
+    host = f"http://127.0.0.1:{port}"
+    return {
+        "CLOB_HOST":       host,
+        "GAMMA_API":       host,
+        "CLOCK_SPEED":     repr(strategy_core.CLOCK_SPEED),
+        "CLOCK_EPOCH":     repr(strategy_core.CLOCK_EPOCH),
+        "CLOCK_ORIGIN":    repr(strategy_core.CLOCK_ORIGIN),
+        "BASKET_SYMBOLS":  ",".join(symbols),
+        "FEED_MODE":       "poll",
+        "STATE_FILE":      os.path.join(workdir, "state.json"),
+        "LOG_FILE":        os.path.join(workdir, "basket_log.json"),
+        "CSV_FILE":        os.path.join(workdir, "basket_trades.csv"),
+        "META_CACHE_FILE": os.path.join(workdir, "market_meta.json"),
+        "PORT":            "0",   # dashboard embebido en un puerto libre
+        # El presupuesto de requests es por segundo real: escalarlo con el reloj
+        "REQUEST_BUDGET_RPS": repr(float(os.environ.get("REQUEST_BUDGET_RPS", 6)) * strategy_core.CLOCK_SPEED),
+    }
+
+
+def run_bot(env: dict, seconds: float, workdir: str) -> dict:
+    """Corre basket.py `seconds` reales y devuelve su último state.json."""
+    here = os.path.dirname(os.path.abspath(__file__))
+    with open(os.path.join(workdir, "basket.out"), "w") as out:
+        proc = subprocess.Popen([sys.executable, os.path.join(here, "basket.py")], cwd=here,
+                                env={**os.environ, **env}, stdout=out, stderr=subprocess.STDOUT)
+        try:
+            proc.wait(timeout=seconds)
+        except subprocess.TimeoutExpired:
+            proc.send_signal(signal.SIGINT)
+            try:
+                proc.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                proc.kill()
+    try:
+        with open(env["STATE_FILE"]) as f:
+            return json.load(f)
+    except Exception as e:
+        return {"error": str(e)}
+
+
+def report(state: dict, sim_stats: dict, seconds: float) -> str:
+    if "error" in state:
+        return f"el bot no dejó estado: {state['error']}"
+    lat   = state.get("latency", {})
+    ticks = state.get("cycle", 0)
+    lines = [
+        f"ticks: {ticks} en {seconds:.0f}s reales ({ticks / seconds:.1f} ticks/s)"
+        f" | late_ticks: {state.get('late_ticks')} | trades: {state.get('wins', 0) + state.get('losses', 0)}"
+        f" | skipped: {state.get('skipped')}",
+    ]
+    def ms(value) -> str:
+        return "n/a" if value is None else f"{value}ms"   # sin muestras del endpoint
+
+    for endpoint in ("tick", "books", "book"):
+        if endpoint in lat:
+            s = lat[endpoint]
+            lines.append(f"{endpoint:>5}: p50={ms(s['p50_ms'])} p95={ms(s['p95_ms'])} (últimas {s['n']})")
+    lines.append(f"simulador: {sim_stats['req_per_s']} req/s | requests {sim_stats['requests']}"
+                 f" | errores {sim_stats['errors']} | books {sim_stats['books_served']}")
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="CLOB + Gamma locales para pruebas de carga")
+    ap.add_argument("--port", type=int, default=SIM_PORT)
+    ap.add_argument("--speed", type=float, help="CLOCK_SPEED (default: env o 1)")
+    ap.add_argument("--latency-ms", type=float, default=SIM_LATENCY_MS)
+    ap.add_argument("--jitter-ms", type=float, default=SIM_JITTER_MS)
+    ap.add_argument("--error-rate", type=float, default=SIM_ERROR_RATE)
+    ap.add_argument("--depth", type=int, default=SIM_DEPTH, help="niveles por lado de cada book")
+    ap.add_argument("--symbols", default=",".join(SIM_SYMBOLS))
+    ap.add_argument("--seed", type=int)
+    ap.add_argument("--bot", action="store_true", help="correr basket.py contra el simulador y reportar")
+    ap.add_argument("--cycles", type=float, default=2, help="ciclos de 5m que corre el bot (con --bot)")
+    args = ap.parse_args(argv)
+
+    if args.speed and args.speed != strategy_core.CLOCK_SPEED:
+        # El bot arranca 5s de mercado antes de despertar en el slot actual
+        origin = time.time()
+        epoch  = origin - origin % SLOT_STEP + SLOT_STEP - 95
+        strategy_core.CLOCK_SPEED, strategy_core.CLOCK_EPOCH, strategy_core.CLOCK_ORIGIN = args.speed, epoch, origin
+        strategy_core.set_clock(strategy_core.scaled_clock(args.speed, epoch, origin))
+
+    symbols = [s.strip().upper() for s in args.symbols.split(",") if s.strip()]
+    sim     = Simulator(symbols, args.depth, args.seed)
+    app     = create_app(sim, args.latency_ms, args.jitter_ms, args.error_rate)
+    server  = make_server("127.0.0.1", args.port, app, threaded=True)
+    logging.getLogger("werkzeug").setLevel(logging.WARNING)   # sin una línea por request
+
+    workdir = tempfile.mkdtemp(prefix="sim-")
+    env     = bot_env(args.port, workdir, symbols)
+    print("Variables para el bot:")
+    for k in ("CLOB_HOST", "GAMMA_API", "CLOCK_SPEED", "CLOCK_EPOCH", "CLOCK_ORIGIN", "FEED_MODE"):
+        print(f"  export {k}={env[k]}")
+
+    if not args.bot:
+        print(f"Simulador en http://127.0.0.1:{args.port} (Ctrl+C para salir)")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        return
+
+    thread = threading.Thread(target=server.serve_forever, name="simulator", daemon=True)
+    thread.start()
+    seconds = args.cycles * SLOT_STEP / strategy_core.CLOCK_SPEED
+    print(f"basket.py contra el simulador: {args.cycles} ciclos, {seconds:.0f}s reales — salida en {workdir}")
+    state = run_bot(env, seconds, workdir)
+    server.shutdown()
+    print(report(state, app.config["SIM_STATS"].summary(), seconds))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,205 @@
+"""
+state_channel.py — Segmento de memoria compartida para el estado del bot.
+
+Alternativa a releer STATE_FILE cuando bot y dashboard corren en el mismo host:
+el bot (StatePublisher) escribe cada estado nuevo en un archivo mapeado en
+memoria (por defecto bajo /dev/shm) y el dashboard lo lee con mmap, sin I/O
+de archivo por request ni volver a parsear el mismo estado.
+
+Layout (little endian):
+
+  offset  tipo   campo
+  0       4s     magic  b"BSKS"
+  4       u16    versión del layout (LAYOUT_VERSION)
+  6       u16    encoding del payload (ENC_JSON / ENC_BINARY)
+  8       u64    seq — impar mientras el escritor está a mitad de escritura
+  16      u32    largo del payload (0 = sin estado: usar STATE_FILE)
+  20      u32    versión del codec (marshal.version para ENC_BINARY)
+  24      ...    payload
+
+Seqlock: el escritor pone seq impar, copia payload y header (todavía con el seq
+impar) y recién después escribe, solo, el seq par.
+El lector copia el payload entre dos lecturas de seq y reintenta si cambió o
+era impar. El seq nunca retrocede (un bot reiniciado sigue desde el último),
+así que el lector puede cachear el estado decodificado por seq.
+
+ENC_BINARY es marshal: más rápido que JSON de armar y de leer, pero depende de
+la versión de Python. Si el lector no entiende el layout, el encoding o el
+codec, read() devuelve None y el dashboard vuelve a STATE_FILE.
+
+Configurable via env vars:
+  STATE_SHM          = archivo del segmento (sin definir = desactivado)
+  STATE_SHM_SIZE     = bytes reservados para el payload (default 1 MiB)
+  STATE_SHM_ENCODING = binary | json (default binary)
+"""
+
+import json
+import logging
+import marshal
+import mmap
+import os
+import struct
+import time
+
+STATE_SHM          = os.environ.get("STATE_SHM", "")
+STATE_SHM_SIZE     = int(os.environ.get("STATE_SHM_SIZE", 1 << 20))
+STATE_SHM_ENCODING = os.environ.get("STATE_SHM_ENCODING", "binary")
+
+MAGIC          = b"BSKS"
+LAYOUT_VERSION = 1
+ENC_JSON       = 1
+ENC_BINARY     = 2
+ENCODINGS      = {"json": ENC_JSON, "binary": ENC_BINARY}
+
+HEADER     = struct.Struct("<4sHHQII")
+SEQ        = struct.Struct("<Q")
+SEQ_OFFSET = 8
+
+READ_RETRIES = 100
+REOPEN_SECS  = 1.0   # espera entre intentos de abrir un segmento que no existe
+
+log = logging.getLogger("state_channel")
+
+
+def encode(state: dict, encoding: int) -> tuple[bytes, int]:
+    """(payload, versión del codec)."""
+    if encoding == ENC_BINARY:
+        return marshal.dumps(state), marshal.version
+    return json.dumps(state).encode(), 0
+
+
+def decode(payload: bytes, encoding: int) -> dict:
+    if encoding == ENC_BINARY:
+        return marshal.loads(payload)
+    return json.loads(payload)
+
+
+class StateChannel:
+    """Escritor del segmento (un único proceso escritor: el bot)."""
+
+    def __init__(self, path: str, size: int = STATE_SHM_SIZE, encoding: str = STATE_SHM_ENCODING):
+        if encoding not in ENCODINGS:
+            raise ValueError(f"STATE_SHM_ENCODING inválido: {encoding!r} (binary | json)")
+        self.path     = path
+        self.encoding = ENCODINGS[encoding]
+        self.capacity = size
+        self.dropped  = 0
+        fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            if os.fstat(fd).st_size < HEADER.size + size:
+                os.ftruncate(fd, HEADER.size + size)
+            self._map = mmap.mmap(fd, HEADER.size + size)
+        finally:
+            os.close(fd)
+        magic, version, _, seq, _, _ = HEADER.unpack_from(self._map)
+        self.seq = seq + (seq & 1) if magic == MAGIC and version == LAYOUT_VERSION else 0
+
+    def write(self, state: dict) -> bool:
+        payload, codec = encode(state, self.encoding)
+        if len(payload) > self.capacity:
+            # Sin lugar: los lectores ven largo 0 y vuelven a STATE_FILE
+            self.dropped += 1
+            log.warning(f"state channel: estado de {len(payload)} bytes > STATE_SHM_SIZE={self.capacity}")
+            payload = b""
+        self.seq += 1
+        SEQ.pack_into(self._map, SEQ_OFFSET, self.seq)
+        self._map[HEADER.size:HEADER.size + len(payload)] = payload
+        HEADER.pack_into(self._map, 0, MAGIC, LAYOUT_VERSION, self.encoding, self.seq, len(payload), codec)
+        # El seq par se publica solo y al final: antes el lector podía ver el
+        # seq nuevo con el largo viejo
+        self.seq += 1
+        SEQ.pack_into(self._map, SEQ_OFFSET, self.seq)
+        return bool(payload)
+
+    def close(self):
+        self._map.close()
+
+
+class StateReader:
+    """Lector del segmento; cachea el estado decodificado y el JSON por seq."""
+
+    def __init__(self, path: str):
+        self.path       = path
+        self.retries    = 0
+        self.errors     = 0   # payloads que no se pudieron decodificar
+        self._map       = None
+        self._next_open = 0.0
+        self._cache     = (None, None, None)   # (seq, estado, JSON); se reemplaza entero
+
+    def read(self) -> tuple[int, int, bytes] | None:
+        """(seq, encoding, payload) consistente, o None si no hay estado legible."""
+        if self._map is None and not self._open():
+            return None
+        m = self._map
+        for _ in range(READ_RETRIES):
+            (seq,) = SEQ.unpack_from(m, SEQ_OFFSET)
+            if seq & 1:
+                self.retries += 1
+                continue
+            magic, version, encoding, _, length, codec = HEADER.unpack_from(m)
+            if magic != MAGIC or version != LAYOUT_VERSION:
+                return None
+            if HEADER.size + length > len(m):
+                if SEQ.unpack_from(m, SEQ_OFFSET)[0] != seq:
+                    continue
+                # El bot agrandó el segmento: volver a mapear
+                self._close()
+                return None
+            payload = m[HEADER.size:HEADER.size + length]
+            if SEQ.unpack_from(m, SEQ_OFFSET)[0] != seq:
+                self.retries += 1
+                continue
+            if not length or encoding not in (ENC_JSON, ENC_BINARY):
+                return None
+            if encoding == ENC_BINARY and codec != marshal.version:
+                return None
+            return seq, encoding, payload
+        return None
+
+    def state(self) -> dict | None:
+        cache = self._cached()
+        return cache[1] if cache else None
+
+    def json_body(self) -> bytes | None:
+        """El estado como JSON listo para responder (sin re-serializar si no cambió)."""
+        cache = self._cached()
+        if cache is None:
+            return None
+        seq, state, body = cache
+        if body is None:
+            body = json.dumps(state).encode()
+            self._cache = (seq, state, body)
+        return body
+
+    def _cached(self) -> tuple | None:
+        snap = self.read()
+        if snap is None:
+            return None
+        seq, encoding, payload = snap
+        if seq != self._cache[0]:
+            try:
+                state = decode(payload, encoding)
+            except (ValueError, EOFError, TypeError):
+                # Payload ilegible: el dashboard vuelve a STATE_FILE
+                self.errors += 1
+                return None
+            body = payload if encoding == ENC_JSON else None
+            self._cache = (seq, state, body)
+        return self._cache
+
+    def _open(self) -> bool:
+        now = time.monotonic()
+        if now < self._next_open:
+            return False
+        self._next_open = now + REOPEN_SECS
+        try:
+            with open(self.path, "rb") as f:
+                self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            return True
+        except (OSError, ValueError):
+            return False
+
+    def _close(self):
+        if self._map is not None:
+            self._map.close()
+            self._map = None
@@ -0,0 +1,131 @@
+"""
+state_publisher.py — Publicación del estado del bot para el dashboard.
+
+basket.py arma el dict de estado en cada tick; este módulo decide cuándo
+escribirlo a STATE_FILE (y a los sinks: el segmento de state_channel.py con
+STATE_SHM, Redis con REDIS_URL) y lo hace fuera del event loop:
+
+  - publish() solo guarda el último estado pendiente y despierta al hilo
+    escritor. Nunca serializa ni toca disco en el hilo del llamador.
+  - Solo se escribe si el documento cambió respecto del último publicado
+    (sin contar "ts", que cambia siempre).
+  - Como mucho STATE_MAX_HZ escrituras por segundo: los estados intermedios
+    se pisan y se publica el más reciente.
+  - publish(..., flush=True) (entradas y salidas) salta el límite de tasa.
+  - La escritura es atómica (archivo temporal + os.replace): un lector nunca
+    ve un JSON a medio escribir.
+
+Configurable via env vars:
+  STATE_MAX_HZ = escrituras por segundo como máximo (default 2; 0 = sin límite)
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+
+STATE_MAX_HZ = float(os.environ.get("STATE_MAX_HZ", 2))
+
+log = logging.getLogger("state_publisher")
+
+
+class StatePublisher:
+    """Último estado pendiente + hilo escritor con límite de tasa."""
+
+    def __init__(self, path: str, sinks: list | None = None, max_hz: float = STATE_MAX_HZ):
+        self.path         = path
+        self.sinks        = sinks or []   # objetos con write(state) y close()
+        self.min_interval = 1.0 / max_hz if max_hz > 0 else 0.0
+        self.written      = 0
+        self.unchanged    = 0
+        self._cond        = threading.Condition()
+        self._pending     = None
+        self._flush       = False
+        self._busy        = False
+        self._closed      = False
+        self._last        = None
+        self._last_write  = 0.0
+        self._thread      = None
+
+    def publish(self, state: dict, flush: bool = False):
+        with self._cond:
+            if self._thread is None and not self._closed:
+                self._thread = threading.Thread(target=self._run, name="state-publisher", daemon=True)
+                self._thread.start()
+            self._pending = state
+            self._flush   = self._flush or flush
+            self._cond.notify()
+
+    def flush(self, timeout: float = 5.0) -> bool:
+        """Espera a que el estado pendiente quede escrito (o descartado por igual)."""
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            self._flush = self._flush or self._pending is not None
+            self._cond.notify_all()
+            while self._pending is not None or self._busy:
+                left = deadline - time.monotonic()
+                if left <= 0:
+                    return False
+                self._cond.wait(left)
+        return True
+
+    def close(self, timeout: float = 5.0):
+        """Escribe el último estado pendiente y detiene el hilo."""
+        self.flush(timeout)
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+        for sink in self.sinks:
+            sink.close()
+
+    def stats(self) -> dict:
+        return {"written": self.written, "unchanged": self.unchanged}
+
+    def write(self, state: dict) -> bool:
+        """Escritura atómica inmediata. False si el estado no cambió."""
+        body = {k: v for k, v in state.items() if k != "ts"}
+        if body == self._last:
+            self.unchanged += 1
+            return False
+        for sink in self.sinks:
+            sink.write(state)
+        if self.path:
+            tmp = f"{self.path}.tmp"
+            with open(tmp, "w") as f:
+                json.dump(state, f)
+            os.replace(tmp, self.path)
+        self._last = body
+        self.written += 1
+        return True
+
+    # ── Hilo escritor ─────────────────────────────────────────────────────────
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while True:
+                    if self._closed and self._pending is None:
+                        return
+                    if self._pending is not None:
+                        wait = self._last_write + self.min_interval - time.monotonic()
+                        if self._flush or self._closed or wait <= 0:
+                            break
+                        self._cond.wait(wait)
+                    else:
+                        self._cond.wait()
+                state, self._pending = self._pending, None
+                self._flush = False
+                self._busy  = True
+            try:
+                if self.write(state):
+                    self._last_write = time.monotonic()
+            except Exception as e:
+                log.warning(f"write_state error ({self.path}): {e}")
+            finally:
+                with self._cond:
+                    self._busy = False
+                    self._cond.notify_all()
@@ -3,28 +3,73 @@ strategy_core.py — Market discovery + order book metrics + signal engine
 
 Configurable via env vars:
   SYMBOL = SOL | BTC   (default: SOL)
+  HTTP_TIMEOUT / HTTP_BOOK_TIMEOUT / HTTP_CONNECT_TIMEOUT   (segundos)
+  HTTP_MAX_PER_HOST = requests en vuelo por host (default: 8)
+  HTTP2 = 1 | 0        (default: 1)
+  HEDGE_REQUESTS = 1 | 0   hedging de requests de book sobre el p95 (default: 1)
+  META_CACHE_FILE = cache persistente de metadata de mercados (default: /data/market_meta.json)
+  CLOB_HOST / GAMMA_API = endpoints (default: Polymarket; simulator.py para pruebas locales)
+  CLOCK_SPEED / CLOCK_EPOCH / CLOCK_ORIGIN = reloj de mercado acelerado (ver Clock)
 
 v2: agrega find_active_market(symbol) para soportar ETH, SOL y BTC simultaneamente.
 """
 
+import asyncio
+import atexit
+import bisect
+import math
+import heapq
+import json
 import os
+import threading
 import time
+import httpx
+import numpy as np
 import requests
-from datetime import datetime, timezone
-from collections import deque
+from datetime import datetime
+from array import array
+from functools import lru_cache
+from collections import OrderedDict, deque
 from py_clob_client.client import ClobClient
 
-CLOB_HOST   = "https://clob.polymarket.com"
-GAMMA_API   = "https://gamma-api.polymarket.com"
+CLOB_HOST   = os.environ.get("CLOB_HOST", "https://clob.polymarket.com").rstrip("/")
+GAMMA_API   = os.environ.get("GAMMA_API", "https://gamma-api.polymarket.com").rstrip("/")
 SLOT_ORIGIN = 1771778100   # slot anchor compartido SOL y BTC (Feb 22 2026)
 SLOT_STEP   = 300          # 5 minutos
 TOP_LEVELS  = 15
 
+# Nivel de detalle de las metricas de book (parametro `fields`)
+METRICS_TOP   = "top"     # best bid/ask + spread: un scan O(n), sin ordenar
+METRICS_DEPTH = "depth"   # + volumenes, OBI y VWAP mid sobre los top_n niveles
+METRICS_FULL  = "full"    # + top_bids/top_asks: formato completo (dashboard, research)
+
+# Cliente HTTP async (httpx, HTTP/2 + keep-alive compartido)
+HTTP_TIMEOUT         = float(os.environ.get("HTTP_TIMEOUT", 8))
+HTTP_BOOK_TIMEOUT    = float(os.environ.get("HTTP_BOOK_TIMEOUT", 5))
+HTTP_CONNECT_TIMEOUT = float(os.environ.get("HTTP_CONNECT_TIMEOUT", 3))
+HTTP_MAX_PER_HOST    = int(os.environ.get("HTTP_MAX_PER_HOST", 8))
+HTTP2_ENABLED        = os.environ.get("HTTP2", "1") != "0"
+
+# Hedging: si un request de book supera el p95 de su endpoint, se manda un
+# duplicado y gana el primero que responda
+HEDGE_ENABLED        = os.environ.get("HEDGE_REQUESTS", "1") != "0"
+HEDGE_MIN_DELAY      = 0.05   # nunca hedgear antes de esto (segundos)
+LATENCY_WINDOW       = 200    # muestras por endpoint
+LATENCY_MIN_SAMPLES  = 20     # sin p95 confiable no se hedgea
+
+# Cache de metadata de mercados (Gamma por slug, CLOB por condition_id)
+META_CACHE_FILE      = os.environ.get("META_CACHE_FILE", "/data/market_meta.json")
+META_CACHE_SIZE      = int(os.environ.get("META_CACHE_SIZE", 512))
+META_CACHE_TTL       = 6 * 3600   # un slot de 5m no cambia; el TTL solo acota el disco
+META_NEGATIVE_TTL    = 20         # slug que aun no existe: reintentar pronto
+META_SAVE_DELAY      = 5.0        # las puts se agrupan en una escritura a disco
+
 SYMBOL      = os.environ.get("SYMBOL", "SOL").upper()
 SLUG_PREFIX = "btc-updown-5m" if SYMBOL == "BTC" else "sol-updown-5m"
 MARKET_NAME = "Bitcoin" if SYMBOL == "BTC" else "Solana"
 
-# Mapa de slugs para los 3 activos
+# Mapa de slugs para los 3 activos originales; cualquier otro simbolo usa el
+# patron "<sym>-updown-5m" (XRP, DOGE, ...)
 SLUG_PREFIXES = {
     "SOL": "sol-updown-5m",
     "BTC": "btc-updown-5m",
@@ -32,29 +77,191 @@ SLUG_PREFIXES = {
 }
 
 
+def get_slug_prefix(symbol: str) -> str:
+    symbol = (symbol or "").strip().upper()
+    if not symbol.isalnum():
+        raise ValueError(f"Simbolo no soportado: {symbol!r}.")
+    return SLUG_PREFIXES.get(symbol) or f"{symbol.lower()}-updown-5m"
+
+
+# ── Metadata cache ────────────────────────────────────────────────────────────
+
+class MetadataCache:
+    """
+    LRU en memoria respaldado por un JSON en disco, con TTL por entrada.
+    Un valor None es una entrada negativa (p.ej. slug que Gamma aun no publica):
+    vive META_NEGATIVE_TTL y no se persiste.
+
+    put() no toca disco: marca la cache sucia y un timer escribe el JSON
+    META_SAVE_DELAY segundos despues (una escritura por rafaga de discovery,
+    fuera del event loop). flush() escribe ya; se llama tambien al salir.
+    """
+
+    def __init__(self, path: str | None, maxsize: int = META_CACHE_SIZE,
+                 ttl: float = META_CACHE_TTL, negative_ttl: float = META_NEGATIVE_TTL):
+        self.path         = path
+        self.maxsize      = maxsize
+        self.ttl          = ttl
+        self.negative_ttl = negative_ttl
+        self._data: OrderedDict[str, tuple[float, object]] = OrderedDict()
+        self._lock   = threading.Lock()
+        self._loaded = False
+        self._dirty  = False
+        self._timer  = None
+        self._save_lock = threading.Lock()
+
+    def get(self, key: str) -> tuple[bool, object]:
+        """(hit, value). hit=True con value=None es un miss negativo cacheado."""
+        with self._lock:
+            self._load()
+            entry = self._data.get(key)
+            if entry is None:
+                return False, None
+            expires_at, value = entry
+            if expires_at < time.time():
+                del self._data[key]
+                return False, None
+            self._data.move_to_end(key)
+            return True, value
+
+    def put(self, key: str, value):
+        with self._lock:
+            self._load()
+            ttl = self.ttl if value is not None else self.negative_ttl
+            self._data[key] = (time.time() + ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+            if value is not None:
+                self._dirty = True
+                if self.path and self._timer is None:
+                    self._timer = threading.Timer(META_SAVE_DELAY, self.flush)
+                    self._timer.daemon = True
+                    self._timer.start()
+
+    def flush(self):
+        """Escribe a disco las entradas positivas si hubo puts desde la ultima escritura."""
+        with self._lock:
+            self._timer = None
+            if not self._dirty or not self.path:
+                return
+            self._dirty = False
+            snapshot = {k: [e, v] for k, (e, v) in self._data.items() if v is not None}
+        with self._save_lock:
+            self._save(snapshot)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._loaded = True
+
+    def _load(self):
+        if self._loaded:
+            return
+        self._loaded = True
+        if not self.path:
+            return
+        try:
+            with open(self.path) as f:
+                raw = json.load(f)
+        except Exception:
+            return
+        now = time.time()
+        for key, (expires_at, value) in raw.items():
+            if expires_at > now and value is not None:
+                self._data[key] = (expires_at, value)
+
+    def _save(self, snapshot: dict):
+        tmp = f"{self.path}.tmp"
+        try:
+            with open(tmp, "w") as f:
+                json.dump(snapshot, f)
+            os.replace(tmp, self.path)
+        except Exception:
+            pass
+
+
+_meta_cache = MetadataCache(META_CACHE_FILE)
+atexit.register(_meta_cache.flush)
+
+
+# ── Clock ─────────────────────────────────────────────────────────────────────
+#
+# Todo lo que depende de la hora del mercado (slot actual, segundos restantes,
+# timestamps de trades) lee now_ts(). replay.py instala un reloj virtual con
+# set_clock(); la cache de metadata sigue con el reloj real.
+#
+# Con CLOCK_SPEED != 1 el reloj de mercado corre acelerado: vale CLOCK_EPOCH en
+# el instante real CLOCK_ORIGIN y avanza CLOCK_SPEED segundos por segundo real.
+# simulator.py y el bot usan las mismas variables, así ven la misma hora. Las
+# esperas del bot (en segundos de mercado) pasan por real_secs().
+
+CLOCK_SPEED  = float(os.environ.get("CLOCK_SPEED", 1))
+CLOCK_ORIGIN = float(os.environ.get("CLOCK_ORIGIN", 0) or time.time())
+CLOCK_EPOCH  = float(os.environ.get("CLOCK_EPOCH", 0) or CLOCK_ORIGIN)
+
+
+def scaled_clock(speed: float, epoch: float, origin: float):
+    """Reloj que vale epoch en el instante real origin y avanza speed x."""
+    return lambda: epoch + (time.time() - origin) * speed
+
+
+_clock = time.time if CLOCK_SPEED == 1 and CLOCK_EPOCH == CLOCK_ORIGIN else \
+    scaled_clock(CLOCK_SPEED, CLOCK_EPOCH, CLOCK_ORIGIN)
+
+
+def now_ts() -> float:
+    return _clock()
+
+
+def real_secs(market_secs: float) -> float:
+    """Segundos reales equivalentes a market_secs del reloj de mercado."""
+    return market_secs / CLOCK_SPEED
+
+
+def set_clock(clock=None):
+    """Reemplaza el reloj (callable sin args -> epoch en segundos). None = time.time."""
+    global _clock
+    _clock = clock or time.time
+
+
 # ── Market discovery ──────────────────────────────────────────────────────────
 
+# Session compartida para el camino sync: reutiliza conexiones TCP/TLS
+_session = requests.Session()
+
+
 def get_current_slot_ts():
-    now     = int(time.time())
+    now     = int(now_ts())
     elapsed = (now - SLOT_ORIGIN) % SLOT_STEP
     return now - elapsed
 
 
 def fetch_gamma_market(slug: str):
+    hit, cached = _meta_cache.get(f"gamma:{slug}")
+    if hit:
+        return cached
     try:
-        r = requests.get(f"{GAMMA_API}/markets", params={"slug": slug}, timeout=8)
+        r = _session.get(f"{GAMMA_API}/markets", params={"slug": slug}, timeout=8)
         r.raise_for_status()
         data = r.json()
-        return data[0] if isinstance(data, list) and data else None
+        gm   = data[0] if isinstance(data, list) and data else None
+        _meta_cache.put(f"gamma:{slug}", gm)
+        return gm
     except Exception:
         return None
 
 
 def fetch_clob_market(condition_id: str):
+    hit, cached = _meta_cache.get(f"clob:{condition_id}")
+    if hit:
+        return cached
     try:
-        r = requests.get(f"{CLOB_HOST}/markets/{condition_id}", timeout=8)
+        r = _session.get(f"{CLOB_HOST}/markets/{condition_id}", timeout=8)
         r.raise_for_status()
-        return r.json()
+        cm = r.json()
+        _meta_cache.put(f"clob:{condition_id}", cm)
+        return cm
     except Exception:
         return None
 
@@ -85,7 +292,7 @@ def build_market_info(gamma_m, clob_m) -> dict | None:
 def _order_book_live(token_id: str) -> bool:
     """Check that an order book actually exists (not 404)."""
     try:
-        r = requests.get(
+        r = _session.get(
             f"{CLOB_HOST}/book",
             params={"token_id": token_id},
             timeout=5,
@@ -97,16 +304,14 @@ def _order_book_live(token_id: str) -> bool:
 
 def find_active_market(symbol: str) -> dict | None:
     """
-    Busca el mercado UP/DOWN 5m activo para el simbolo dado (SOL, BTC, ETH).
+    Busca el mercado UP/DOWN 5m activo para el simbolo dado (SOL, BTC, ETH, XRP, ...).
     Estrategia robusta: en vez de depender del SLOT_ORIGIN fijo, genera todos
     los slots posibles alineados a multiplos de SLOT_STEP en la ultima hora.
     Esto funciona aunque el origen cambie con el tiempo.
     """
-    slug_prefix = SLUG_PREFIXES.get(symbol.upper())
-    if not slug_prefix:
-        raise ValueError(f"Simbolo no soportado: {symbol}. Usa SOL, BTC o ETH.")
+    slug_prefix = get_slug_prefix(symbol)
 
-    now  = int(time.time())
+    now  = int(now_ts())
     # Base alineada al multiplo de 300 mas cercano hacia abajo
     base = now - (now % SLOT_STEP)
 
@@ -138,7 +343,7 @@ def fetch_market_resolution(condition_id: str) -> str | None:
     Retorna 'UP', 'DOWN', o None si aún no está resuelto.
     """
     try:
-        r = requests.get(f"{GAMMA_API}/markets/{condition_id}", timeout=8)
+        r = _session.get(f"{GAMMA_API}/markets/{condition_id}", timeout=8)
         r.raise_for_status()
         data = r.json()
 
@@ -181,13 +386,28 @@ def seconds_remaining(market_info: dict) -> float | None:
     if not end_raw:
         return None
     try:
-        end_dt = datetime.fromisoformat(end_raw.replace("Z", "+00:00"))
-        diff   = (end_dt - datetime.now(timezone.utc)).total_seconds()
-        return max(0.0, diff)
+        return max(0.0, _end_ts(end_raw) - now_ts())
+    except Exception:
+        return None
+
+
+def market_slot_ts(market_info: dict) -> int | None:
+    """Inicio del slot de un mercado (end_date - SLOT_STEP)."""
+    end_raw = market_info.get("end_date", "")
+    if not end_raw:
+        return None
+    try:
+        return int(_end_ts(end_raw)) - SLOT_STEP
     except Exception:
         return None
 
 
+@lru_cache(maxsize=64)
+def _end_ts(end_raw: str) -> float:
+    """end_date ISO -> epoch. Cacheado: se consulta en cada tick por pata."""
+    return datetime.fromisoformat(end_raw.replace("Z", "+00:00")).timestamp()
+
+
 # ── Order book ────────────────────────────────────────────────────────────────
 
 _clob_client = None
@@ -199,51 +419,748 @@ def get_clob_client() -> ClobClient:
     return _clob_client
 
 
-def get_order_book_metrics(token_id: str, top_n: int = TOP_LEVELS) -> tuple[dict | None, str | None]:
+def get_order_book_metrics(token_id: str, top_n: int = TOP_LEVELS,
+                           fields: str = METRICS_FULL) -> tuple[dict | None, str | None]:
     try:
         ob = get_clob_client().get_order_book(token_id)
     except Exception as e:
         return None, str(e)
 
-    bids = sorted(ob.bids or [], key=lambda x: float(x.price), reverse=True)[:top_n]
-    asks = sorted(ob.asks or [], key=lambda x: float(x.price))[:top_n]
+    bids = [(float(b.price), float(b.size)) for b in ob.bids or []]
+    asks = [(float(a.price), float(a.size)) for a in ob.asks or []]
+    return _select_metrics(bids, asks, top_n, fields), None
+
 
-    bid_vol = sum(float(b.size) for b in bids)
-    ask_vol = sum(float(a.size) for a in asks)
+def _depth(bids: list[tuple[float, float]], asks: list[tuple[float, float]],
+           best_bid: float, best_ask: float) -> tuple[float, float, float, float, float]:
+    """(bid_vol, ask_vol, total, obi, vwap_mid) de niveles ya ordenados mejor-primero."""
+    bid_vol = sum(sz for _, sz in bids)
+    ask_vol = sum(sz for _, sz in asks)
     total   = bid_vol + ask_vol
     obi     = (bid_vol - ask_vol) / total if total > 0 else 0.0
 
-    best_bid = float(bids[0].price) if bids else 0.0
-    best_ask = float(asks[0].price) if asks else 0.0
-    spread   = round(best_ask - best_bid, 4)
-
     if total > 0:
-        bvwap = sum(float(b.price) * float(b.size) for b in bids) / bid_vol if bid_vol > 0 else 0
-        avwap = sum(float(a.price) * float(a.size) for a in asks) / ask_vol if ask_vol > 0 else 0
+        bvwap = sum(px * sz for px, sz in bids) / bid_vol if bid_vol > 0 else 0
+        avwap = sum(px * sz for px, sz in asks) / ask_vol if ask_vol > 0 else 0
         vwap_mid = (bvwap * bid_vol + avwap * ask_vol) / total
     else:
         vwap_mid = (best_bid + best_ask) / 2
+    return bid_vol, ask_vol, total, obi, vwap_mid
 
-    return {
+
+def _select_metrics(all_bids: list[tuple[float, float]], all_asks: list[tuple[float, float]],
+                    top_n: int = TOP_LEVELS, fields: str = METRICS_FULL) -> dict:
+    """
+    Metricas de un book (listas (price, size) sin ordenar) calculando solo lo
+    que pide `fields`. El dict trae unicamente las claves de ese nivel.
+
+    Los niveles se toman tal cual llegan del CLOB, como en el calculo original:
+    un precio repetido o un nivel con size 0 cuentan en num_bids/num_asks y
+    ocupan lugar en el top_n. nlargest/nsmallest equivalen a sorted()[:top_n]
+    (mismo orden, tambien en empates) sin ordenar todo el book.
+    """
+    best_bid = max((px for px, _ in all_bids), default=0.0)
+    best_ask = min((px for px, _ in all_asks), default=0.0)
+    out = {
+        "best_bid": round(best_bid, 4),
+        "best_ask": round(best_ask, 4),
+        "spread":   round(best_ask - best_bid, 4),
+        "num_bids": len(all_bids),
+        "num_asks": len(all_asks),
+    }
+    if fields == METRICS_TOP:
+        return out
+
+    bids = heapq.nlargest(top_n, all_bids, key=lambda x: x[0])
+    asks = heapq.nsmallest(top_n, all_asks, key=lambda x: x[0])
+    bid_vol, ask_vol, total, obi, vwap_mid = _depth(bids, asks, best_bid, best_ask)
+    out.update({
         "bid_volume":   round(bid_vol, 2),
         "ask_volume":   round(ask_vol, 2),
         "total_volume": round(total, 2),
         "obi":          round(obi, 4),
-        "best_bid":     round(best_bid, 4),
-        "best_ask":     round(best_ask, 4),
-        "spread":       spread,
         "vwap_mid":     round(vwap_mid, 4),
-        "num_bids":     len(ob.bids or []),
-        "num_asks":     len(ob.asks or []),
-        "top_bids":     [(round(float(b.price), 4), round(float(b.size), 2)) for b in bids[:8]],
-        "top_asks":     [(round(float(a.price), 4), round(float(a.size), 2)) for a in asks[:8]],
-    }, None
+    })
+    if fields == METRICS_FULL:
+        out["top_bids"] = [(round(px, 4), round(sz, 2)) for px, sz in bids[:8]]
+        out["top_asks"] = [(round(px, 4), round(sz, 2)) for px, sz in asks[:8]]
+    return out
+
+
+class BookMetrics:
+    """
+    Metricas de un book como objeto con __slots__: el camino caliente lee
+    atributos sin armar un dict por pata y por tick. to_dict() devuelve el
+    formato de get_order_book_metrics para el dashboard o research.
+    """
+
+    __slots__ = (
+        "bid_volume", "ask_volume", "total_volume", "obi",
+        "best_bid", "best_ask", "spread", "vwap_mid",
+        "num_bids", "num_asks", "top_bids", "top_asks",
+    )
+
+    def __init__(self, bid_volume=0.0, ask_volume=0.0, total_volume=0.0, obi=0.0,
+                 best_bid=0.0, best_ask=0.0, spread=0.0, vwap_mid=0.0,
+                 num_bids=0, num_asks=0, top_bids=(), top_asks=()):
+        self.bid_volume   = bid_volume
+        self.ask_volume   = ask_volume
+        self.total_volume = total_volume
+        self.obi          = obi
+        self.best_bid     = best_bid
+        self.best_ask     = best_ask
+        self.spread       = spread
+        self.vwap_mid     = vwap_mid
+        self.num_bids     = num_bids
+        self.num_asks     = num_asks
+        self.top_bids     = top_bids
+        self.top_asks     = top_asks
+
+    @classmethod
+    def from_dict(cls, d: dict) -> "BookMetrics":
+        return cls(**{k: d[k] for k in cls.__slots__ if k in d})
+
+    def to_dict(self) -> dict:
+        return {k: getattr(self, k) for k in self.__slots__}
+
+
+class OrderBook:
+    """
+    Book de un token con los niveles en arrays paralelos ordenados por precio
+    ascendente (bisect): el mejor bid es el ultimo nivel, el mejor ask el primero.
+
+    Un snapshot se ordena una vez; cada delta ubica su nivel en O(log n). Lleva
+    volumen y sum(price*size) por lado, asi que best bid/ask y las metricas de
+    profundidad total son O(1), y metrics(top_n) es O(top_n) sin importar la
+    profundidad del book.
+    """
+
+    def __init__(self):
+        self.bid_px: list[float] = []
+        self.bid_sz: list[float] = []
+        self.ask_px: list[float] = []
+        self.ask_sz: list[float] = []
+        self.bid_volume   = 0.0
+        self.ask_volume   = 0.0
+        self.bid_notional = 0.0   # sum(price * size): numerador del VWAP
+        self.ask_notional = 0.0
+
+    @classmethod
+    def from_levels(cls, bids: list[tuple[float, float]], asks: list[tuple[float, float]]) -> "OrderBook":
+        """Book en vivo desde un snapshot: un precio repetido queda con su ultimo size y size 0 no es nivel."""
+        book = cls()
+        for px_list, sz_list, levels in ((book.bid_px, book.bid_sz, bids), (book.ask_px, book.ask_sz, asks)):
+            merged = {}
+            for px, sz in levels:
+                if sz > 0:
+                    merged[px] = sz
+            for px in sorted(merged):
+                px_list.append(px)
+                sz_list.append(merged[px])
+        book._recompute_totals()
+        return book
+
+    def _recompute_totals(self):
+        self.bid_volume   = sum(self.bid_sz)
+        self.ask_volume   = sum(self.ask_sz)
+        self.bid_notional = sum(px * sz for px, sz in zip(self.bid_px, self.bid_sz))
+        self.ask_notional = sum(px * sz for px, sz in zip(self.ask_px, self.ask_sz))
+
+    def set_level(self, side: str, price: float, size: float):
+        """Aplica un delta: size es el nuevo tamaño total del nivel (0 = borrar)."""
+        is_bid = side.upper() in ("BUY", "BID", "BIDS")
+        px_list = self.bid_px if is_bid else self.ask_px
+        sz_list = self.bid_sz if is_bid else self.ask_sz
+
+        i   = bisect.bisect_left(px_list, price)
+        old = sz_list[i] if i < len(px_list) and px_list[i] == price else 0.0
+        if size > 0:
+            if old:
+                sz_list[i] = size
+            else:
+                px_list.insert(i, price)
+                sz_list.insert(i, size)
+        elif old:
+            del px_list[i]
+            del sz_list[i]
+        else:
+            return
+
+        delta = size - old if size > 0 else -old
+        if is_bid:
+            self.bid_volume   += delta
+            self.bid_notional += delta * price
+        else:
+            self.ask_volume   += delta
+            self.ask_notional += delta * price
+
+    @property
+    def best_bid(self) -> float:
+        return self.bid_px[-1] if self.bid_px else 0.0
+
+    @property
+    def best_ask(self) -> float:
+        return self.ask_px[0] if self.ask_px else 0.0
+
+    @property
+    def num_bids(self) -> int:
+        return len(self.bid_px)
+
+    @property
+    def num_asks(self) -> int:
+        return len(self.ask_px)
+
+    def top_bids(self, n: int) -> list[tuple[float, float]]:
+        """Mejores n bids, del mejor al peor."""
+        lo = max(0, len(self.bid_px) - n)
+        return list(zip(reversed(self.bid_px[lo:]), reversed(self.bid_sz[lo:])))
+
+    def top_asks(self, n: int) -> list[tuple[float, float]]:
+        """Mejores n asks, del mejor al peor."""
+        return list(zip(self.ask_px[:n], self.ask_sz[:n]))
+
+    def depth_metrics(self) -> dict:
+        """Volumen, OBI y VWAP mid sobre toda la profundidad, en O(1)."""
+        total = self.bid_volume + self.ask_volume
+        obi   = (self.bid_volume - self.ask_volume) / total if total > 0 else 0.0
+        if total > 0:
+            vwap_mid = (self.bid_notional + self.ask_notional) / total
+        else:
+            vwap_mid = (self.best_bid + self.best_ask) / 2
+        return {
+            "bid_volume":   round(self.bid_volume, 2),
+            "ask_volume":   round(self.ask_volume, 2),
+            "total_volume": round(total, 2),
+            "obi":          round(obi, 4),
+            "vwap_mid":     round(vwap_mid, 4),
+        }
+
+    def metrics(self, top_n: int = TOP_LEVELS, fields: str = METRICS_FULL) -> dict:
+        """
+        Mismo dict que get_order_book_metrics, sobre los top_n niveles por lado.
+        METRICS_TOP es O(1); METRICS_DEPTH y METRICS_FULL son O(top_n).
+        Es el book en vivo del feed WS (precios unicos, sin niveles en 0): un
+        snapshot REST con duplicados o size 0 va por _select_metrics.
+        """
+        best_bid = self.best_bid
+        best_ask = self.best_ask
+        out = {
+            "best_bid": round(best_bid, 4),
+            "best_ask": round(best_ask, 4),
+            "spread":   round(best_ask - best_bid, 4),
+            "num_bids": self.num_bids,
+            "num_asks": self.num_asks,
+        }
+        if fields == METRICS_TOP:
+            return out
+
+        bids = self.top_bids(top_n)
+        asks = self.top_asks(top_n)
+        bid_vol, ask_vol, total, obi, vwap_mid = _depth(bids, asks, best_bid, best_ask)
+        out.update({
+            "bid_volume":   round(bid_vol, 2),
+            "ask_volume":   round(ask_vol, 2),
+            "total_volume": round(total, 2),
+            "obi":          round(obi, 4),
+            "vwap_mid":     round(vwap_mid, 4),
+        })
+        if fields == METRICS_FULL:
+            out["top_bids"] = [(round(px, 4), round(sz, 2)) for px, sz in bids[:8]]
+            out["top_asks"] = [(round(px, 4), round(sz, 2)) for px, sz in asks[:8]]
+        return out
+
+
+# ── Vectorized metrics ────────────────────────────────────────────────────────
+#
+# Motor NumPy para evaluar muchos books en una llamada (las 6 patas del basket,
+# o un historial reproducido). Cada book se parsea una sola vez a arrays y
+# todas las metricas salen de operaciones sobre matrices (books x niveles).
+# Las sumas usan cumsum (acumulacion secuencial, igual que sum() de Python) y
+# el redondeo final se hace con round(), asi el resultado es identico al de
+# get_order_book_metrics.
+
+def _levels_array(levels) -> np.ndarray:
+    """Niveles (dicts del CLOB con price/size en string, o tuplas) -> array (n, 2)."""
+    if levels is None or len(levels) == 0:
+        return np.empty((0, 2))
+    if isinstance(levels, np.ndarray):
+        return levels.reshape(-1, 2).astype(float, copy=False)
+    if isinstance(levels[0], dict):
+        return np.array([(l["price"], l["size"]) for l in levels], dtype=float)
+    return np.asarray(levels, dtype=float).reshape(-1, 2)
+
+
+def _top_matrix(sides: list[np.ndarray], top_n: int, descending: bool):
+    """Empaqueta un lado de cada book en matrices (B, top_n) ordenadas por precio."""
+    counts = np.array([len(lv) for lv in sides], dtype=np.int64)
+    width  = max(int(counts.max()) if len(counts) else 0, 1)
+    pad    = -np.inf if descending else np.inf
+    px     = np.full((len(sides), width), pad)
+    sz     = np.zeros((len(sides), width))
+    for i, lv in enumerate(sides):
+        px[i, :len(lv)] = lv[:, 0]
+        sz[i, :len(lv)] = lv[:, 1]
+
+    order = np.argsort(-px if descending else px, axis=1, kind="stable")[:, :top_n]
+    px    = np.take_along_axis(px, order, axis=1)
+    sz    = np.take_along_axis(sz, order, axis=1)
+    valid = np.arange(px.shape[1]) < np.minimum(counts, top_n)[:, None]
+    return np.where(valid, px, 0.0), np.where(valid, sz, 0.0), counts
+
+
+def book_metrics_arrays(books: list[tuple], top_n: int = TOP_LEVELS) -> dict[str, np.ndarray]:
+    """
+    Metricas de un batch de books como arrays de largo B (sin redondear).
+    `books` es una lista de (bids, asks); cada lado puede ser la lista cruda del
+    CLOB, tuplas (price, size) o un array (n, 2). Los niveles cuentan tal cual
+    llegan (precios repetidos y size 0 incluidos), como en _select_metrics; el
+    argsort estable deja los empates en el mismo orden que sorted().
+    """
+    parsed = [(_levels_array(b), _levels_array(a)) for b, a in books]
+    bpx, bsz, n_bids = _top_matrix([b for b, _ in parsed], top_n, descending=True)
+    apx, asz, n_asks = _top_matrix([a for _, a in parsed], top_n, descending=False)
+
+    bid_vol = np.cumsum(bsz, axis=1)[:, -1]
+    ask_vol = np.cumsum(asz, axis=1)[:, -1]
+    bid_not = np.cumsum(bpx * bsz, axis=1)[:, -1]
+    ask_not = np.cumsum(apx * asz, axis=1)[:, -1]
+    total   = bid_vol + ask_vol
+
+    best_bid = np.where(n_bids > 0, bpx[:, 0], 0.0)
+    best_ask = np.where(n_asks > 0, apx[:, 0], 0.0)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        obi   = np.where(total > 0, (bid_vol - ask_vol) / total, 0.0)
+        bvwap = np.where(bid_vol > 0, bid_not / bid_vol, 0.0)
+        avwap = np.where(ask_vol > 0, ask_not / ask_vol, 0.0)
+        vwap  = np.where(total > 0, (bvwap * bid_vol + avwap * ask_vol) / total,
+                         (best_bid + best_ask) / 2)
+
+    return {
+        "bid_volume":   bid_vol,
+        "ask_volume":   ask_vol,
+        "total_volume": total,
+        "obi":          obi,
+        "best_bid":     best_bid,
+        "best_ask":     best_ask,
+        "spread":       best_ask - best_bid,
+        "vwap_mid":     vwap,
+        "num_bids":     n_bids,
+        "num_asks":     n_asks,
+        "bid_px":       bpx,
+        "bid_sz":       bsz,
+        "ask_px":       apx,
+        "ask_sz":       asz,
+    }
+
+
+def book_metrics_batch(books: list[tuple], top_n: int = TOP_LEVELS, as_dict: bool = True,
+                       fields: str = METRICS_FULL) -> list:
+    """
+    Version batch de get_order_book_metrics: un resultado por book, mismos
+    valores. as_dict=False devuelve BookMetrics en vez de dicts. Con fields
+    distinto de METRICS_FULL no se arman matrices: cada book se resuelve con
+    el scan liviano de _select_metrics.
+    """
+    if fields != METRICS_FULL:
+        out = []
+        for bids, asks in books:
+            metrics = _select_metrics(
+                [(px, sz) for px, sz in _levels_array(bids).tolist()],
+                [(px, sz) for px, sz in _levels_array(asks).tolist()],
+                top_n, fields,
+            )
+            out.append(metrics if as_dict else BookMetrics.from_dict(metrics))
+        return out
+
+    m = book_metrics_arrays(books, top_n)
+    out = []
+    for i in range(len(books)):
+        nb = min(int(m["num_bids"][i]), 8)
+        na = min(int(m["num_asks"][i]), 8)
+        metrics = BookMetrics(
+            bid_volume   = round(float(m["bid_volume"][i]), 2),
+            ask_volume   = round(float(m["ask_volume"][i]), 2),
+            total_volume = round(float(m["total_volume"][i]), 2),
+            obi          = round(float(m["obi"][i]), 4),
+            best_bid     = round(float(m["best_bid"][i]), 4),
+            best_ask     = round(float(m["best_ask"][i]), 4),
+            spread       = round(float(m["spread"][i]), 4),
+            vwap_mid     = round(float(m["vwap_mid"][i]), 4),
+            num_bids     = int(m["num_bids"][i]),
+            num_asks     = int(m["num_asks"][i]),
+            top_bids     = [(round(float(px), 4), round(float(sz), 2))
+                            for px, sz in zip(m["bid_px"][i, :nb], m["bid_sz"][i, :nb])],
+            top_asks     = [(round(float(px), 4), round(float(sz), 2))
+                            for px, sz in zip(m["ask_px"][i, :na], m["ask_sz"][i, :na])],
+        )
+        out.append(metrics.to_dict() if as_dict else metrics)
+    return out
+
+
+# ── Async HTTP ────────────────────────────────────────────────────────────────
+#
+# Versiones async de discovery y order book sobre un unico httpx.AsyncClient:
+# HTTP/2 cuando el servidor lo soporta, keep-alive, limite de conexiones en
+# vuelo por host y timeouts configurables. basket.py las awaitea directo, sin
+# pasar por el executor.
+
+_http: httpx.AsyncClient | None = None
+_host_slots: dict[str, asyncio.Semaphore] = {}
+
+
+class LatencyStats:
+    """Ventana de latencias (segundos) de requests exitosos de un endpoint."""
+
+    def __init__(self, window: int = LATENCY_WINDOW):
+        self.samples = deque(maxlen=window)
+
+    def record(self, secs: float):
+        self.samples.append(secs)
+
+    def quantile(self, q: float) -> float | None:
+        if len(self.samples) < LATENCY_MIN_SAMPLES:
+            return None
+        ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+    def summary(self) -> dict:
+        p50 = self.quantile(0.50)
+        p95 = self.quantile(0.95)
+        return {
+            "n":      len(self.samples),
+            "p50_ms": round(p50 * 1000, 1) if p50 is not None else None,
+            "p95_ms": round(p95 * 1000, 1) if p95 is not None else None,
+        }
+
+
+latency_stats: dict[str, LatencyStats] = {}
+
+
+def get_latency_stats(endpoint: str) -> LatencyStats:
+    stats = latency_stats.get(endpoint)
+    if stats is None:
+        stats = latency_stats[endpoint] = LatencyStats()
+    return stats
+
+
+async def _hedged(endpoint: str, make_request, sent: list[int] | None = None):
+    """
+    Ejecuta make_request() midiendo latencia. Si pasa el p95 del endpoint sin
+    responder, lanza un duplicado y devuelve la primera respuesta exitosa.
+    sent ([n]) suma cada request lanzado, duplicado incluido.
+    """
+    stats   = get_latency_stats(endpoint)
+    p95     = stats.quantile(0.95) if HEDGE_ENABLED else None
+    started = time.perf_counter()
+    pending = {asyncio.create_task(make_request())}
+    if sent is not None:
+        sent[0] += 1
+    try:
+        if p95 is not None:
+            done, _ = await asyncio.wait(pending, timeout=max(p95, HEDGE_MIN_DELAY))
+            if not done:
+                pending.add(asyncio.create_task(make_request()))
+                if sent is not None:
+                    sent[0] += 1
+        error = None
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    stats.record(time.perf_counter() - started)
+                    return task.result()
+                error = task.exception()
+        raise error
+    finally:
+        for task in pending:
+            task.cancel()
+
+
+def get_http_session() -> httpx.AsyncClient:
+    global _http
+    if _http is None or _http.is_closed:
+        _http = httpx.AsyncClient(
+            http2=HTTP2_ENABLED,
+            timeout=httpx.Timeout(HTTP_TIMEOUT, connect=HTTP_CONNECT_TIMEOUT),
+            limits=httpx.Limits(
+                max_connections=HTTP_MAX_PER_HOST * 4,
+                max_keepalive_connections=HTTP_MAX_PER_HOST * 4,
+            ),
+        )
+    return _http
+
+
+async def close_http_session():
+    global _http
+    if _http is not None:
+        await _http.aclose()
+        _http = None
+    _host_slots.clear()
+
+
+async def _http_get(url: str, params: dict | None = None, timeout: float | None = None) -> httpx.Response:
+    host = httpx.URL(url).host
+    slot = _host_slots.get(host)
+    if slot is None:
+        slot = _host_slots[host] = asyncio.Semaphore(HTTP_MAX_PER_HOST)
+    async with slot:
+        return await get_http_session().get(url, params=params, timeout=timeout or HTTP_TIMEOUT)
+
+
+async def _http_post(url: str, body, timeout: float | None = None) -> httpx.Response:
+    host = httpx.URL(url).host
+    slot = _host_slots.get(host)
+    if slot is None:
+        slot = _host_slots[host] = asyncio.Semaphore(HTTP_MAX_PER_HOST)
+    async with slot:
+        return await get_http_session().post(url, json=body, timeout=timeout or HTTP_TIMEOUT)
+
+
+async def fetch_gamma_market_async(slug: str):
+    hit, cached = _meta_cache.get(f"gamma:{slug}")
+    if hit:
+        return cached
+    try:
+        r = await _http_get(f"{GAMMA_API}/markets", params={"slug": slug})
+        r.raise_for_status()
+        data = r.json()
+        gm   = data[0] if isinstance(data, list) and data else None
+        _meta_cache.put(f"gamma:{slug}", gm)
+        return gm
+    except Exception:
+        return None
+
+
+async def fetch_clob_market_async(condition_id: str):
+    hit, cached = _meta_cache.get(f"clob:{condition_id}")
+    if hit:
+        return cached
+    try:
+        r = await _http_get(f"{CLOB_HOST}/markets/{condition_id}")
+        r.raise_for_status()
+        cm = r.json()
+        _meta_cache.put(f"clob:{condition_id}", cm)
+        return cm
+    except Exception:
+        return None
+
+
+async def _order_book_live_async(token_id: str) -> bool:
+    try:
+        r = await _http_get(f"{CLOB_HOST}/book", params={"token_id": token_id}, timeout=HTTP_BOOK_TIMEOUT)
+        return r.status_code == 200
+    except Exception:
+        return False
+
+
+SLOT_PROBE_OFFSETS = [0, 1, -1, 2, -2, -3]
+
+
+async def _probe_slot_async(slug: str, require_book: bool = True) -> dict | None:
+    """Gamma -> CLOB -> book para un slug. None si el slot no esta operable."""
+    gm = await fetch_gamma_market_async(slug)
+    if not gm:
+        return None
+    cid = gm.get("conditionId")
+    if not cid:
+        return None
+    cm = await fetch_clob_market_async(cid)
+    if not cm:
+        return None
+    info = build_market_info(gm, cm)
+    if not info:
+        return None
+    if not require_book or await _order_book_live_async(info["up_token_id"]):
+        return info
+    return None
+
+
+def slot_slug(symbol: str, slot_ts: int) -> str:
+    slug_prefix = get_slug_prefix(symbol)
+    return f"{slug_prefix}-{slot_ts}"
+
+
+async def fetch_slot_market_async(symbol: str, slot_ts: int) -> dict | None:
+    """
+    Metadata (Gamma + CLOB + token ids) del mercado de un slot concreto, sin
+    exigir order book: sirve para resolver el slot siguiente antes de que abra.
+    """
+    return await _probe_slot_async(slot_slug(symbol, slot_ts), require_book=False)
+
+
+async def find_active_market_async(symbol: str, concurrent: bool = True) -> dict | None:
+    """
+    Igual que find_active_market, sobre el cliente async.
+    concurrent=True lanza todos los slots candidatos a la vez y devuelve el
+    primero que este vivo segun la prioridad de SLOT_PROBE_OFFSETS; el resto
+    de los requests se cancela en cuanto hay ganador.
+    """
+    slug_prefix = get_slug_prefix(symbol)
+
+    now   = int(now_ts())
+    base  = now - (now % SLOT_STEP)
+    slugs = [f"{slug_prefix}-{base + offset * SLOT_STEP}" for offset in SLOT_PROBE_OFFSETS]
+
+    if not concurrent:
+        for slug in slugs:
+            info = await _probe_slot_async(slug)
+            if info:
+                return info
+        return None
+
+    tasks = [asyncio.create_task(_probe_slot_async(slug)) for slug in slugs]
+    try:
+        for task in tasks:
+            info = await task
+            if info:
+                return info
+        return None
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+def _raw_book_metrics(raw: dict, top_n: int = TOP_LEVELS, fields: str = METRICS_FULL) -> dict:
+    bids = [(float(b["price"]), float(b["size"])) for b in raw.get("bids") or []]
+    asks = [(float(a["price"]), float(a["size"])) for a in raw.get("asks") or []]
+    return _select_metrics(bids, asks, top_n, fields)
+
+
+async def _get_book(token_id: str) -> dict:
+    r = await _http_get(f"{CLOB_HOST}/book", params={"token_id": token_id}, timeout=HTTP_BOOK_TIMEOUT)
+    r.raise_for_status()
+    return r.json()
+
+
+async def _post_books(token_ids: list[str]) -> list[dict]:
+    r = await _http_post(
+        f"{CLOB_HOST}/books",
+        [{"token_id": t} for t in token_ids],
+        timeout=HTTP_BOOK_TIMEOUT,
+    )
+    r.raise_for_status()
+    return r.json() or []
+
+
+async def get_order_book_metrics_async(token_id: str, top_n: int = TOP_LEVELS, fields: str = METRICS_FULL,
+                                       sent: list[int] | None = None) -> tuple[dict | None, str | None]:
+    try:
+        raw = await _hedged("book", lambda: _get_book(token_id), sent)
+    except Exception as e:
+        return None, str(e)
+    return _raw_book_metrics(raw, top_n, fields), None
+
+
+async def get_order_books_metrics_async(token_ids: list[str], top_n: int = TOP_LEVELS,
+                                        fields: str = METRICS_FULL, sent: list[int] | None = None
+                                        ) -> dict[str, tuple[BookMetrics | None, str | None]]:
+    """
+    Metricas (BookMetrics) de varios books en un solo round trip (POST /books).
+    Los tokens que el endpoint batch no devuelve — o todos, si el batch falla —
+    se piden en paralelo a /book. sent ([n]) cuenta los requests hechos de
+    verdad (batch, fallback y duplicados) para cobrarlos al presupuesto.
+    """
+    results: dict[str, tuple[BookMetrics | None, str | None]] = {}
+    try:
+        raws = [r for r in await _hedged("books", lambda: _post_books(token_ids), sent)
+                if r.get("asset_id") in token_ids]
+        batch = book_metrics_batch([(r.get("bids"), r.get("asks")) for r in raws], top_n,
+                                   as_dict=False, fields=fields)
+        for raw, metrics in zip(raws, batch):
+            results[raw["asset_id"]] = (metrics, None)
+    except Exception:
+        pass
+
+    missing = [t for t in token_ids if t not in results]
+    if missing:
+        fallback = await asyncio.gather(*[get_order_book_metrics_async(t, top_n, fields, sent) for t in missing])
+        for token_id, (metrics, err) in zip(missing, fallback):
+            results[token_id] = (BookMetrics.from_dict(metrics) if metrics else None, err)
+    return results
 
 
 # ── Signal engine ─────────────────────────────────────────────────────────────
 
-def compute_signal(obi_now: float, obi_window: list[float], threshold: float) -> dict:
-    avg_obi  = sum(obi_window) / len(obi_window) if obi_window else obi_now
+class RollingSignalState:
+    """
+    Ventana movil de OBI en O(1) por muestra: ring buffer de doubles con suma
+    (y suma de cuadrados) corrida, EWMA opcional.
+
+    El buffer esta espejado (cada muestra se escribe en i y en i+size), asi las
+    ultimas k muestras siempre son un tramo contiguo: history() devuelve un
+    memoryview sobre ese tramo, sin copiar. Usar .tolist() para serializar.
+    """
+
+    def __init__(self, size: int = 60, ewma_alpha: float | None = None):
+        self.size       = size
+        self.ewma_alpha = ewma_alpha
+        self.ewma: float | None = None
+        self._buf   = array("d", bytes(16 * size))   # 2*size doubles en 0.0
+        self._pos   = 0
+        self._count = 0
+        self._sum   = 0.0
+        self._sumsq = 0.0
+        self._since_resync = 0
+
+    def push(self, value: float):
+        if self._count == self.size:
+            old = self._buf[self._pos]
+            self._sum   -= old
+            self._sumsq -= old * old
+        else:
+            self._count += 1
+        self._buf[self._pos] = value
+        self._buf[self._pos + self.size] = value
+        self._pos = (self._pos + 1) % self.size
+        self._sum   += value
+        self._sumsq += value * value
+
+        if self.ewma_alpha is not None:
+            self.ewma = value if self.ewma is None else \
+                self.ewma_alpha * value + (1 - self.ewma_alpha) * self.ewma
+
+        # Resync amortizado: cada `size` muestras se recalculan las sumas
+        self._since_resync += 1
+        if self._since_resync >= self.size:
+            self._since_resync = 0
+            window = self.history(self._count)
+            self._sum   = math.fsum(window)
+            self._sumsq = math.fsum(v * v for v in window)
+
+    def __len__(self) -> int:
+        return self._count
+
+    @property
+    def mean(self) -> float | None:
+        return self._sum / self._count if self._count else None
+
+    @property
+    def variance(self) -> float | None:
+        if not self._count:
+            return None
+        mean = self._sum / self._count
+        return max(0.0, self._sumsq / self._count - mean * mean)
+
+    def history(self, n: int = 20) -> memoryview:
+        """Ultimas n muestras (o menos), de la mas vieja a la mas nueva. Zero-copy."""
+        k   = min(n, self._count)
+        end = self._pos + self.size
+        return memoryview(self._buf)[end - k:end]
+
+
+def compute_signal(obi_now: float, obi_window, threshold: float) -> dict:
+    """
+    obi_window puede ser una lista de OBIs (se promedia entera) o un
+    RollingSignalState (promedio O(1)). "history" es siempre una lista propia:
+    el memoryview de RollingSignalState.history() apunta al ring buffer y
+    cambiaria con los ticks siguientes (ademas json no lo serializa).
+    """
+    rolling = isinstance(obi_window, RollingSignalState)
+    if rolling:
+        avg_obi = obi_window.mean if len(obi_window) else obi_now
+    else:
+        avg_obi = sum(obi_window) / len(obi_window) if obi_window else obi_now
     combined = round(0.6 * obi_now + 0.4 * avg_obi, 4)
     abs_c    = abs(combined)
 
@@ -260,13 +1177,19 @@ def compute_signal(obi_now: float, obi_window: list[float], threshold: float) ->
         color = "yellow"
         conf  = 50
 
-    return {
+    signal = {
         "label":      label,
         "color":      color,
         "confidence": conf,
         "obi_now":    round(obi_now, 4),
         "obi_avg":    round(avg_obi, 4),
         "combined":   combined,
-        "history":    list(obi_window)[-20:],
+        "history":    obi_window.history(20).tolist() if rolling else list(obi_window)[-20:],
         "threshold":  threshold,
     }
+    if rolling:
+        variance = obi_window.variance
+        signal["obi_std"] = round(math.sqrt(variance), 4) if variance is not None else None
+        if obi_window.ewma is not None:
+            signal["obi_ewma"] = round(obi_window.ewma, 4)
+    return signal
@@ -0,0 +1,85 @@
+"""BasketEngine contra el compute_signals original (dicts) para N=3."""
+
+import random
+
+from basket_engine import BasketEngine
+
+SYMBOLS = ["ETH", "SOL", "BTC"]
+RESOLVED_UP, RESOLVED_DN, CONSENSUS = 0.98, 0.02, 0.80
+
+
+def _normalized(mid: float) -> float:
+    if mid >= RESOLVED_UP:
+        return 1.0
+    if mid <= RESOLVED_DN:
+        return 0.0
+    return mid
+
+
+def _harmonic_mean(values: list) -> float:
+    if not values or any(v <= 0 for v in values):
+        return 0.0
+    return len(values) / sum(1.0 / v for v in values)
+
+
+def _find_cheapest(mids: dict, h_avg: float):
+    if h_avg == 0:
+        return None, 0.0
+    name, best = None, 0.0
+    for sym, mid in mids.items():
+        diff = mid - h_avg
+        if diff < best:
+            best, name = diff, sym
+    return name, best
+
+
+def baseline_signal(up: dict, dn: dict):
+    """Señal de compute_signals de la versión original: (harm_up, harm_dn, asset, side, div, consensus)."""
+    up_mids = {s: _normalized(up[s]) for s in SYMBOLS if up[s] > 0}
+    dn_mids = {s: _normalized(dn[s]) for s in SYMBOLS if dn[s] > 0}
+    if len(up_mids) < 2:
+        return None
+    harm_up = _harmonic_mean(list(up_mids.values()))
+    harm_dn = _harmonic_mean(list(dn_mids.values()))
+    cheapest_up, div_up = _find_cheapest(up_mids, harm_up)
+    cheapest_dn, div_dn = _find_cheapest(dn_mids, harm_dn)
+    if abs(div_up) >= abs(div_dn) and cheapest_up:
+        asset, side, div = cheapest_up, "UP", div_up
+    elif cheapest_dn:
+        asset, side, div = cheapest_dn, "DOWN", div_dn
+    else:
+        return harm_up, harm_dn, None, None, 0.0, "NONE"
+    raw = up if side == "UP" else dn
+    peer_vals = [raw[p] for p in SYMBOLS if p != asset and raw[p] > 0]
+    if len(peer_vals) == 2 and all(v > CONSENSUS for v in peer_vals):
+        consensus = "FULL"
+    elif len(peer_vals) >= 1 and sum(1 for v in peer_vals if v > CONSENSUS) >= 1:
+        consensus = "SOFT"
+    else:
+        consensus = "NONE"
+    return harm_up, harm_dn, asset, side, div, consensus
+
+
+def _mid(rng: random.Random) -> float:
+    # Mucho peso en patas resueltas y valores cercanos: los casos límite de n / total
+    return rng.choice([0.0, 0.99, 1.0, 0.01, round(rng.uniform(0.03, 0.97), 3),
+                       round(rng.uniform(0.90, 0.97), 3), 0.1 + 0.2, 1 / 3])
+
+
+def test_engine_matches_original_signal_over_long_sequences():
+    rng    = random.Random(11)
+    engine = BasketEngine(SYMBOLS, RESOLVED_UP, RESOLVED_DN, CONSENSUS, CONSENSUS)
+    up     = dict.fromkeys(SYMBOLS, 0.0)
+    dn     = dict.fromkeys(SYMBOLS, 0.0)
+    for _ in range(20_000):
+        sym = rng.choice(SYMBOLS)
+        up[sym], dn[sym] = _mid(rng), _mid(rng)
+        engine.set(sym, up[sym], dn[sym])
+        sig = engine.evaluate()
+        expected = baseline_signal(up, dn)
+        if expected is None:
+            assert not sig.ready
+            continue
+        assert sig.ready
+        assert (sig.harm_up, sig.harm_dn, sig.asset, sig.side, sig.div, sig.consensus) == expected
+    assert engine.evaluate() is None
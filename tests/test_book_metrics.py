@@ -0,0 +1,130 @@
+"""Metricas de book contra el calculo original de get_order_book_metrics."""
+
+import random
+
+import pytest
+
+import strategy_core
+from strategy_core import METRICS_DEPTH, METRICS_FULL, METRICS_TOP, TOP_LEVELS
+
+
+def baseline_metrics(bids: list, asks: list, top_n: int = TOP_LEVELS) -> dict:
+    """get_order_book_metrics del código original, sobre niveles {"price", "size"} en string."""
+    bids_s = sorted(bids, key=lambda x: float(x["price"]), reverse=True)[:top_n]
+    asks_s = sorted(asks, key=lambda x: float(x["price"]))[:top_n]
+
+    bid_vol = sum(float(b["size"]) for b in bids_s)
+    ask_vol = sum(float(a["size"]) for a in asks_s)
+    total   = bid_vol + ask_vol
+    obi     = (bid_vol - ask_vol) / total if total > 0 else 0.0
+
+    best_bid = float(bids_s[0]["price"]) if bids_s else 0.0
+    best_ask = float(asks_s[0]["price"]) if asks_s else 0.0
+    spread   = round(best_ask - best_bid, 4)
+
+    if total > 0:
+        bvwap = sum(float(b["price"]) * float(b["size"]) for b in bids_s) / bid_vol if bid_vol > 0 else 0
+        avwap = sum(float(a["price"]) * float(a["size"]) for a in asks_s) / ask_vol if ask_vol > 0 else 0
+        vwap_mid = (bvwap * bid_vol + avwap * ask_vol) / total
+    else:
+        vwap_mid = (best_bid + best_ask) / 2
+
+    return {
+        "bid_volume":   round(bid_vol, 2),
+        "ask_volume":   round(ask_vol, 2),
+        "total_volume": round(total, 2),
+        "obi":          round(obi, 4),
+        "best_bid":     round(best_bid, 4),
+        "best_ask":     round(best_ask, 4),
+        "spread":       spread,
+        "vwap_mid":     round(vwap_mid, 4),
+        "num_bids":     len(bids),
+        "num_asks":     len(asks),
+        "top_bids":     [(round(float(b["price"]), 4), round(float(b["size"]), 2)) for b in bids_s[:8]],
+        "top_asks":     [(round(float(a["price"]), 4), round(float(a["size"]), 2)) for a in asks_s[:8]],
+    }
+
+
+def random_book(rng: random.Random, depth: int) -> tuple[list, list]:
+    """Book crudo del CLOB con precios repetidos y niveles en 0, como los que llegan a veces."""
+    def side(lo, hi):
+        levels = []
+        for _ in range(rng.randint(0, depth)):
+            price = round(rng.uniform(lo, hi), 2)
+            size  = 0 if rng.random() < 0.15 else round(rng.uniform(1, 500), 2)
+            levels.append({"price": str(price), "size": str(size)})
+        return levels
+    return side(0.01, 0.50), side(0.50, 0.99)
+
+
+def books(n: int = 300, seed: int = 7):
+    rng = random.Random(seed)
+    out = [random_book(rng, rng.choice([0, 1, 3, 10, 40])) for _ in range(n)]
+    out.append(([{"price": "0.40", "size": "10"}, {"price": "0.40", "size": "0"}, {"price": "0.41", "size": "0"}],
+                [{"price": "0.60", "size": "5"}, {"price": "0.60", "size": "7"}]))
+    return out
+
+
+def test_raw_book_metrics_match_baseline():
+    for bids, asks in books():
+        expected = baseline_metrics(bids, asks)
+        raw = {"bids": bids, "asks": asks}
+        assert strategy_core._raw_book_metrics(raw) == expected
+        depth = strategy_core._raw_book_metrics(raw, fields=METRICS_DEPTH)
+        assert depth == {k: expected[k] for k in depth}
+        top = strategy_core._raw_book_metrics(raw, fields=METRICS_TOP)
+        assert top == {k: expected[k] for k in ("best_bid", "best_ask", "spread", "num_bids", "num_asks")}
+
+
+def test_duplicates_and_empty_levels_are_kept():
+    bids = [{"price": "0.40", "size": "10"}, {"price": "0.40", "size": "0"}, {"price": "0.41", "size": "0"}]
+    asks = [{"price": "0.60", "size": "5"}, {"price": "0.60", "size": "7"}]
+    m = strategy_core._raw_book_metrics({"bids": bids, "asks": asks}, fields=METRICS_FULL)
+    assert (m["num_bids"], m["num_asks"]) == (3, 2)
+    assert m["best_bid"] == 0.41
+    assert m["top_asks"] == [(0.6, 5.0), (0.6, 7.0)]
+
+
+def test_batch_engine_matches_baseline():
+    sample = books()
+    expected = [baseline_metrics(bids, asks) for bids, asks in sample]
+    assert strategy_core.book_metrics_batch(sample) == expected
+    as_objects = strategy_core.book_metrics_batch(sample, as_dict=False)
+    assert [m.to_dict() for m in as_objects] == expected
+    for fields in (METRICS_TOP, METRICS_DEPTH):
+        got = strategy_core.book_metrics_batch(sample, fields=fields)
+        assert got == [{k: e[k] for k in g} for g, e in zip(got, expected)]
+
+
+def test_set_level_running_totals_match_full_recompute():
+    rng  = random.Random(11)
+    book = strategy_core.OrderBook.from_levels([(0.40, 10.0), (0.41, 5.0)], [(0.60, 7.0)])
+    live = {"BUY": {0.40: 10.0, 0.41: 5.0}, "SELL": {0.60: 7.0}}
+    for step in range(3000):
+        side  = rng.choice(["BUY", "SELL"])
+        lo    = 0.01 if side == "BUY" else 0.50
+        price = round(rng.uniform(lo, lo + 0.49), 2)
+        if live[side] and rng.random() < 0.5:
+            price = rng.choice(list(live[side]))        # update o borrado de un nivel existente
+        size = 0.0 if rng.random() < 0.3 else round(rng.uniform(1, 500), 2)
+        book.set_level(side, price, size)
+        if size > 0:
+            live[side][price] = size
+        else:
+            live[side].pop(price, None)                 # borrar un nivel que no existe: no-op
+
+        bids, asks = sorted(live["BUY"].items()), sorted(live["SELL"].items())
+        assert (book.bid_px, book.bid_sz) == ([p for p, _ in bids], [s for _, s in bids])
+        assert (book.ask_px, book.ask_sz) == ([p for p, _ in asks], [s for _, s in asks])
+
+        full = strategy_core._select_metrics(bids, asks, top_n=len(bids) + len(asks), fields=METRICS_DEPTH)
+        assert (round(book.best_bid, 4), round(book.best_ask, 4)) == (full["best_bid"], full["best_ask"])
+        assert (book.num_bids, book.num_asks) == (full["num_bids"], full["num_asks"])
+        assert book.bid_volume == pytest.approx(sum(s for _, s in bids), abs=1e-6)
+        assert book.ask_volume == pytest.approx(sum(s for _, s in asks), abs=1e-6)
+        assert book.bid_notional == pytest.approx(sum(p * s for p, s in bids), abs=1e-6)
+        assert book.ask_notional == pytest.approx(sum(p * s for p, s in asks), abs=1e-6)
+        depth = book.depth_metrics()
+        for key in ("bid_volume", "ask_volume", "total_volume"):
+            assert depth[key] == pytest.approx(full[key], abs=0.011)   # redondeo a 2 decimales
+        assert depth["vwap_mid"] == pytest.approx(full["vwap_mid"], abs=1.1e-4)
@@ -0,0 +1,101 @@
+"""MarketFeed contra un servidor WS local que hace de canal market del CLOB."""
+
+import asyncio
+import json
+
+import websockets
+
+import market_feed
+from market_feed import MarketFeed
+from strategy_core import OrderBook
+
+
+def _snapshot(asset_id: str, bid: float, ask: float) -> str:
+    return json.dumps({
+        "event_type": "book", "asset_id": asset_id,
+        "bids": [{"price": str(bid), "size": "100"}],
+        "asks": [{"price": str(ask), "size": "100"}],
+    })
+
+
+async def _until(cond, timeout: float = 3.0):
+    deadline = asyncio.get_running_loop().time() + timeout
+    while not cond():
+        assert asyncio.get_running_loop().time() < deadline, "timeout esperando condición"
+        await asyncio.sleep(0.01)
+
+
+async def _scenario():
+    conns: asyncio.Queue = asyncio.Queue()
+    subs = []
+
+    async def handler(ws):
+        subs.append(json.loads(await ws.recv()))
+        await conns.put(ws)
+        await ws.wait_closed()
+
+    async with websockets.serve(handler, "127.0.0.1", 0) as server:
+        port = server.sockets[0].getsockname()[1]
+        feed = MarketFeed(url=f"ws://127.0.0.1:{port}")
+        await feed.set_assets(["up", "down"])
+        task = asyncio.create_task(feed.run())
+        try:
+            ws = await asyncio.wait_for(conns.get(), 3)
+            assert subs[-1] == {"assets_ids": ["up", "down"], "type": "market"}
+            assert not feed.connected
+
+            # Delta antes del snapshot: se ignora
+            await ws.send(json.dumps({"event_type": "price_change", "price_changes": [
+                {"asset_id": "up", "price": "0.5", "size": "10", "side": "BUY"}]}))
+            await ws.send(_snapshot("up", 0.40, 0.42))
+            await _until(lambda: "up" in feed.books)
+            assert feed.books["up"].best_bid == 0.40
+            assert not feed.connected and not feed.has_book("up")
+
+            await ws.send(_snapshot("down", 0.57, 0.59))
+            await _until(lambda: feed.connected)
+            assert feed.has_book("up") and feed.has_book("down")
+
+            # Corte: los books viejos no sobreviven a la reconexión
+            await ws.close()
+            ws = await asyncio.wait_for(conns.get(), 3)
+            assert feed.books == {} and not feed.connected
+            assert feed.best_bid_ask("up") is None
+
+            await ws.send(_snapshot("up", 0.45, 0.47))
+            await _until(lambda: "up" in feed.books)
+            assert not feed.has_book("up")
+            await ws.send(_snapshot("down", 0.52, 0.54))
+            await _until(lambda: feed.connected)
+            assert feed.best_bid_ask("up") == (0.45, 0.47)
+        finally:
+            await feed.stop()
+            task.cancel()
+
+
+def test_connected_only_after_all_snapshots_and_reset_on_reconnect(monkeypatch):
+    monkeypatch.setattr(market_feed, "RECONNECT_DELAY", 0.05)
+    asyncio.run(_scenario())
+
+
+def test_book_update_without_both_snapshots_is_skipped():
+    import replay
+    basket = replay.load_basket(["ETH", "SOL", "BTC"])   # mismos símbolos que test_vector_backtest
+    replay.reset_basket(basket)
+    info = replay.market_info("ETH", 1_700_000_000, 300)
+    basket.markets["ETH"].info = info
+    feed = MarketFeed()
+    basket.feed = feed
+    basket.token_index.update({info["up_token_id"]: ("ETH", "UP"), info["down_token_id"]: ("ETH", "DOWN")})
+    try:
+        feed.books[info["up_token_id"]] = OrderBook.from_levels([(0.60, 10)], [(0.62, 10)])
+        basket.on_book_update(info["up_token_id"])
+        assert basket.markets["ETH"].up_mid == 0.0 and basket.markets["ETH"].dn_mid == 0.0
+
+        feed.books[info["down_token_id"]] = OrderBook.from_levels([(0.37, 10)], [(0.39, 10)])
+        basket.on_book_update(info["down_token_id"])
+        assert basket.markets["ETH"].up_mid > 0 and basket.markets["ETH"].dn_mid > 0
+    finally:
+        basket.feed = None
+        basket.token_index.clear()
+        replay.reset_basket(basket)
@@ -0,0 +1,37 @@
+"""Grilla de optimizer.py: listas como elecciones, {"range": [lo, hi]} como rango."""
+
+import json
+
+import pytest
+
+import optimizer
+
+
+def write_spec(tmp_path, spec) -> str:
+    path = tmp_path / "grid.json"
+    path.write_text(json.dumps(spec))
+    return str(path)
+
+
+def test_two_element_list_is_a_choice():
+    configs = optimizer.random_configs({"ENTRY_OPEN_SECS": [5, 10]}, 200, seed=1)
+    assert {c["ENTRY_OPEN_SECS"] for c in configs} == {5, 10}
+
+
+def test_ranges_keep_the_bounds_type():
+    spec = {"ENTRY_OPEN_SECS": {"range": [40, 70]}, "DIVERGENCE_THRESHOLD": {"range": [0.03, 0.07]}}
+    for c in optimizer.random_configs(spec, 200, seed=1):
+        assert type(c["ENTRY_OPEN_SECS"]) is int and 40 <= c["ENTRY_OPEN_SECS"] <= 70
+        assert type(c["DIVERGENCE_THRESHOLD"]) is float and 0.03 <= c["DIVERGENCE_THRESHOLD"] <= 0.07
+
+
+def test_grid_rejects_ranges(tmp_path):
+    spec = optimizer.load_spec(write_spec(tmp_path, {"ENTRY_OPEN_SECS": {"range": [40, 70]}}))
+    with pytest.raises(ValueError, match="--random"):
+        optimizer.grid_configs(spec)
+
+
+@pytest.mark.parametrize("values", [{"range": [70, 40]}, {"range": [1]}, {"lo": 1, "hi": 2}, 0.05, []])
+def test_load_spec_rejects_malformed_values(tmp_path, values):
+    with pytest.raises(ValueError, match="DIVERGENCE_THRESHOLD"):
+        optimizer.load_spec(write_spec(tmp_path, {"DIVERGENCE_THRESHOLD": values}))
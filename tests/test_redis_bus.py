@@ -0,0 +1,126 @@
+"""RedisBus / StateSubscriber contra un redis-server local (se saltean sin él)."""
+
+import json
+import shutil
+import socket
+import subprocess
+import time
+
+import pytest
+
+redis = pytest.importorskip("redis")
+
+import redis_bus
+from redis_bus import RedisBus, StateSubscriber
+
+REDIS_SERVER = shutil.which("redis-server")
+needs_server = pytest.mark.skipif(REDIS_SERVER is None, reason="redis-server no está instalado")
+
+
+def wait_for(cond, timeout: float = 5.0) -> bool:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if cond():
+            return True
+        time.sleep(0.02)
+    return False
+
+
+@pytest.fixture
+def server_url():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+    proc = subprocess.Popen([REDIS_SERVER, "--port", str(port), "--save", "", "--appendonly", "no"],
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    url   = f"redis://127.0.0.1:{port}/0"
+    admin = redis.Redis.from_url(url)
+
+    def ping():
+        try:
+            return admin.ping()
+        except redis.ConnectionError:
+            return False
+
+    try:
+        assert wait_for(ping), "redis-server no arrancó"
+        yield url
+    finally:
+        admin.close()
+        proc.terminate()
+        proc.wait(5)
+
+
+@needs_server
+def test_subscriber_gets_snapshot_then_updates(server_url):
+    bus = RedisBus(server_url, prefix="t1")
+    bus.state({"n": 1})
+    bus.close()
+
+    sub = StateSubscriber(server_url, prefix="t1")
+    assert wait_for(lambda: sub.state() == {"n": 1})   # foto de la key al conectarse
+
+    bus.state({"n": 2})
+    bus.event("[00:00:00] evento")
+    bus.close()
+    assert wait_for(lambda: sub.state() == {"n": 2})   # mensaje del canal
+    assert json.loads(sub.json_body()) == {"n": 2}
+    assert bus.stats()["published"] == 3 and bus.stats()["dropped"] == 0
+
+
+@needs_server
+def test_reconnect_closes_previous_connections(server_url, monkeypatch):
+    monkeypatch.setattr(redis_bus, "RETRY_SECS", 0.05)
+    created, closed = [], []
+    make_client = redis_bus._client
+
+    def tracked_client(url):
+        client = make_client(url)
+        close  = client.close
+
+        def tracked_close():
+            closed.append(client)
+            close()
+
+        client.close = tracked_close
+        created.append(client)
+        return client
+
+    monkeypatch.setattr(redis_bus, "_client", tracked_client)
+    admin = redis.Redis.from_url(server_url)
+    sub   = StateSubscriber(server_url, prefix="t2")
+    admin.set("t2:state", json.dumps({"n": 0}))
+
+    def clients() -> int:
+        return admin.info("clients")["connected_clients"]
+
+    assert wait_for(lambda: sub.state() is not None and clients() >= 2)
+    baseline = clients()
+    for n in range(1, 6):
+        # El server corta la suscripción: el hilo reconecta y vuelve a leer la key
+        admin.set("t2:state", json.dumps({"n": n}))
+        admin.execute_command("CLIENT", "KILL", "TYPE", "pubsub")
+        assert wait_for(lambda: sub.state() == {"n": n})
+    # Cada intento cerró su cliente antes de armar el siguiente
+    assert len(created) >= 6
+    assert wait_for(lambda: all(any(c is d for d in closed) for c in created[:-1]))
+    assert wait_for(lambda: clients() <= baseline)
+    admin.close()
+
+
+def test_state_does_not_overwrite_newer_body(monkeypatch):
+    sub = StateSubscriber("redis://127.0.0.1:1/0")
+    monkeypatch.setattr(sub, "_start", lambda: None)   # sin hilo: el cache se maneja a mano
+    old, new = b'{"n": 1}', b'{"n": 2}'
+    sub._cache = (old, None)
+
+    loads = json.loads
+
+    def racing_loads(body):
+        # Llega un estado nuevo mientras se parsea el anterior
+        sub._cache = (new, None)
+        return loads(body)
+
+    monkeypatch.setattr(redis_bus.json, "loads", racing_loads)
+    assert sub.state() == {"n": 1}
+    assert sub._cache == (new, None)
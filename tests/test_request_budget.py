@@ -0,0 +1,47 @@
+"""Requests reales de get_order_books_metrics_async y su cobro al token bucket."""
+
+import asyncio
+import time
+
+import strategy_core
+
+BOOK = {"bids": [{"price": "0.45", "size": "10"}], "asks": [{"price": "0.47", "size": "10"}]}
+
+
+def fetch(monkeypatch, post_books):
+    async def get_book(token_id):
+        return {**BOOK, "asset_id": token_id}
+
+    monkeypatch.setattr(strategy_core, "HEDGE_ENABLED", False)
+    monkeypatch.setattr(strategy_core, "_post_books", post_books)
+    monkeypatch.setattr(strategy_core, "_get_book", get_book)
+    sent = [0]
+    books = asyncio.run(strategy_core.get_order_books_metrics_async(["a", "b", "c"], sent=sent))
+    return books, sent[0]
+
+
+def test_batch_counts_one_request(monkeypatch):
+    async def post_books(token_ids):
+        return [{**BOOK, "asset_id": t} for t in token_ids]
+
+    books, sent = fetch(monkeypatch, post_books)
+    assert sent == 1 and all(m.best_bid == 0.45 for m, _ in books.values())
+
+
+def test_fallback_counts_every_request(monkeypatch):
+    async def post_books(token_ids):
+        raise RuntimeError("503")
+
+    books, sent = fetch(monkeypatch, post_books)
+    assert sent == 1 + 3 and all(m.best_ask == 0.47 for m, _ in books.values())
+
+
+def test_scheduler_charge_delays_next_tick():
+    import replay
+    basket = replay.load_basket(["ETH", "SOL", "BTC"])
+    scheduler = basket.TickScheduler(budget_rps=100.0, burst=1.0)
+    scheduler.charge(3.0)   # fallback de 3 requests además del batch ya cobrado
+    t0 = time.monotonic()
+    asyncio.run(scheduler.wait(0.0, cost=1.0))
+    assert time.monotonic() - t0 >= 0.03   # faltan 1 - (1 - 3) = 3 tokens a 100 rps
+    assert scheduler.tokens < 0.5
@@ -0,0 +1,40 @@
+"""Escrituras de la flota sombra en hilos propios (trades CSV y resumen)."""
+
+import csv
+import json
+import logging
+
+from shadow_fleet import PARAMS, TRADE_COLUMNS, ShadowFleet
+
+VARIANT = {name: 0.5 for name in PARAMS}
+
+
+def make_fleet(trades_file=None) -> ShadowFleet:
+    return ShadowFleet([VARIANT, VARIANT], ["ETH", "SOL"], entry_usd=1.0, capital=100.0,
+                       entry_close_secs=30, resolved_up=0.98, resolved_dn=0.02, trades_file=trades_file)
+
+
+def record(n: int) -> dict:
+    return {**{c: "" for c in TRADE_COLUMNS}, "variant": n, "pnl_usd": n}
+
+
+def test_trades_and_summary_are_written_on_close(tmp_path):
+    trades, summary = tmp_path / "trades.csv", tmp_path / "summary.json"
+    fleet = make_fleet(str(trades))
+    for n in range(3):
+        fleet._append_trade(record(n))
+    fleet.publish_summary(str(summary))
+    fleet.close()
+
+    with open(trades, newline="") as f:
+        rows = list(csv.DictReader(f))
+    assert [r["variant"] for r in rows] == ["0", "1", "2"]
+    assert json.loads(summary.read_text())["variants"] == 2
+
+
+def test_trade_write_errors_are_logged(tmp_path, caplog):
+    fleet = make_fleet(str(tmp_path / "missing" / "trades.csv"))
+    with caplog.at_level(logging.WARNING, logger="shadow_fleet"):
+        fleet._append_trade(record(0))
+        fleet.close()
+    assert "No se pudieron escribir 1 trades" in caplog.text
@@ -0,0 +1,60 @@
+"""Seqlock de state_channel: orden de escritura y payloads ilegibles."""
+
+import pytest
+
+import state_channel
+from state_channel import HEADER, StateChannel, StateReader
+
+STATE = {"phase": "ACTIVO", "capital": 100.0, "trades": [{"asset": "ETH", "pnl": 0.5}]}
+
+
+@pytest.mark.parametrize("encoding", ["binary", "json"])
+def test_roundtrip(tmp_path, encoding):
+    path = str(tmp_path / "state.shm")
+    ch, reader = StateChannel(path, size=4096, encoding=encoding), StateReader(path)
+    ch.write(STATE)
+    assert reader.state() == STATE
+    ch.write({**STATE, "capital": 101.0})
+    assert reader.state()["capital"] == 101.0
+    ch.close()
+
+
+def test_even_seq_is_published_last(tmp_path, monkeypatch):
+    calls = []
+
+    class Recording:
+        def __init__(self, name, st):
+            self.name, self.st, self.size = name, st, st.size
+
+        def pack_into(self, buf, offset, *values):
+            calls.append((self.name, values))
+            self.st.pack_into(buf, offset, *values)
+
+        def unpack_from(self, buf, offset=0):
+            return self.st.unpack_from(buf, offset)
+
+    monkeypatch.setattr(state_channel, "SEQ", Recording("seq", state_channel.SEQ))
+    monkeypatch.setattr(state_channel, "HEADER", Recording("header", HEADER))
+    ch = StateChannel(str(tmp_path / "state.shm"), size=4096)
+    calls.clear()
+    ch.write(STATE)
+    ch.close()
+
+    assert [name for name, _ in calls] == ["seq", "header", "seq"]
+    assert calls[1][1][3] % 2 == 1      # el header se escribe con el seq impar
+    assert calls[2][1][0] % 2 == 0      # y el seq par va solo, al final
+
+
+@pytest.mark.parametrize("encoding", ["binary", "json"])
+def test_undecodable_payload_falls_back(tmp_path, encoding):
+    path = str(tmp_path / "state.shm")
+    ch, reader = StateChannel(path, size=4096, encoding=encoding), StateReader(path)
+    ch.write(STATE)
+    # Payload corrupto con seq par y header válidos
+    ch._map[HEADER.size:HEADER.size + 4] = b"\xff\x00\xfe\x01"
+    assert reader.state() is None
+    assert reader.json_body() is None
+    assert reader.errors == 2
+    ch.write(STATE)
+    assert reader.state() == STATE
+    ch.close()
@@ -0,0 +1,98 @@
+"""vector_backtest contra el replay evento por evento sobre ticks sintéticos."""
+
+import random
+
+import numpy as np
+import pytest
+
+import replay
+import vector_backtest
+from tick_recorder import SIDE_DN, SIDE_UP, tick_dtype, tick_path
+
+# basket.py se importa una vez por proceso: mismos símbolos que test_market_feed
+SYMBOLS    = ["ETH", "SOL", "BTC"]
+SLOT_START = 1_771_778_100 + 300 * 5000
+
+CONFIGS = [
+    {},
+    {"DIVERGENCE_THRESHOLD": 0.02, "ENTRY_MIN_PRICE": 0.3, "CONSENSUS_FULL": 0.5},
+    {"DIVERGENCE_THRESHOLD": 0.02, "DIVERGENCE_MAX": 0.3, "ENTRY_OPEN_SECS": 20,
+     "ENTRY_MIN_PRICE": 0.3, "STOP_LOSS_PRICE": 0.5, "CONSENSUS_FULL": 0.5},
+]
+
+
+def write_ticks(directory, seed: int = 1, cycles: int = 40):
+    """
+    Grabación como la de tick_recorder: un par UP/DOWN por símbolo y tick, con
+    patas que fallan, quotes stale, precios resueltos y slots cortados antes
+    del vencimiento.
+    """
+    rnd   = random.Random(seed)
+    dtype = tick_dtype(1)
+    mids  = {s: 0.5 for s in SYMBOLS}
+    for c in range(cycles):
+        slot = SLOT_START + 300 * c
+        vol  = rnd.choice([0.01, 0.03, 0.08])
+        last = rnd.randint(20, 50) if rnd.random() < 0.1 else -1
+        secs = 92.0 - rnd.random()
+        rows = []
+        while secs > last:
+            t     = slot + 300 - secs
+            first = c == 0 and not rows   # tick completo: fija el orden de los símbolos grabados
+            for sym in SYMBOLS:
+                if rnd.random() < 0.03 and not first:
+                    continue   # error de fetch: la pata no se graba en este tick
+                m = min(0.999, max(0.001, mids[sym] + rnd.gauss(0, vol)))
+                if rnd.random() < 0.02:
+                    m = rnd.choice([0.99, 0.01, 0.985])
+                mids[sym] = m
+                up, dn = round(m, 2), round(1 - m + rnd.uniform(-0.02, 0.02), 2)
+                sp     = rnd.choice([0.01, 0.02, 0.0])
+                stale  = rnd.random() < 0.04
+                for side, px in ((SIDE_UP, up), (SIDE_DN, dn)):
+                    rows.append((t, slot, sym.encode(), side, stale, 0.0,
+                                 [max(0.0, round(px - sp, 2))], [1.0], [min(1.0, round(px + sp, 2))], [1.0]))
+                t += 0.0003
+            if secs <= 0:
+                break
+            secs = max(0.0, secs - rnd.choice([0.25, 0.5, 1.0, 1.5]))
+        np.array(rows, dtype=dtype).tofile(tick_path(str(directory), slot, 1))
+
+
+@pytest.fixture(scope="module")
+def loaded(tmp_path_factory):
+    directory = tmp_path_factory.mktemp("ticks")
+    write_ticks(directory)
+    files = replay.tick_files(str(directory))
+    basket, vb = vector_backtest.load(files)
+    yield files, basket, vb
+    replay.reset_basket(basket)
+
+
+@pytest.mark.parametrize("config", CONFIGS)
+def test_matches_replay(loaded, config):
+    files, basket, vb = loaded
+    assert vector_backtest.validate(vb, basket, files, config) == []
+
+
+def test_fixture_produces_trades(loaded):
+    _, _, vb = loaded
+    assert max(vb.run(config)["trades"] for config in CONFIGS) > 0
+
+
+def test_main_exits_without_tick_files(tmp_path):
+    with pytest.raises(SystemExit, match="sin archivos de ticks"):
+        vector_backtest.main([str(tmp_path)])
+
+
+@pytest.mark.parametrize("name", ["RESOLVED_UP_THRESH", "CONSENSUS_SOFT"])
+def test_load_spec_rejects_unsupported_params(tmp_path, name):
+    grid = tmp_path / "grid.json"
+    grid.write_text(f'{{"{name}": [0.7, 0.8]}}')
+    with pytest.raises(ValueError, match=name):
+        vector_backtest.load_spec(str(grid))
+
+
+def test_load_basket_rejects_other_symbols(loaded):
+    with pytest.raises(ValueError, match="BASKET_SYMBOLS"):
+        replay.load_basket(["ETH", "BTC"])
@@ -0,0 +1,188 @@
+"""
+tick_recorder.py — Grabación append-only de los ticks del basket.
+
+Cada tick de cada pata (símbolo x lado) se guarda como un registro binario de
+tamaño fijo (dtype NumPy estructurado): timestamp, slot, símbolo, lado, flag
+stale, mid calculado y los top-N niveles de bids y asks (precio y tamaño,
+rellenos con 0 si el book tiene menos niveles).
+
+  - record() solo encola (put_nowait) y nunca bloquea el event loop. Si la cola
+    está llena el tick se descarta y se cuenta en `dropped`.
+  - Un hilo escritor agrupa los registros en chunks y los agrega al archivo del
+    slot con un único write(). Rota de archivo al cambiar de slot.
+  - Los archivos son registros crudos sin header: read_ticks() los abre con
+    np.memmap. Un chunk a medio escribir (crash) se ignora al leer.
+
+Archivos: <TICK_RECORD_DIR>/ticks-<slot_ts>-L<niveles>.bin
+
+Profundidad: con FEED_MODE=ws se graban hasta TICK_RECORD_LEVELS niveles del
+book en vivo. En modo poll los niveles salen de las métricas REST
+(METRICS_FULL trae top_bids/top_asks de 8 niveles): con TICK_RECORD_LEVELS > 8
+los niveles 9 en adelante quedan en 0.
+
+Configurable via env vars:
+  TICK_RECORD_DIR    = directorio de grabación (sin definir = no se graba)
+  TICK_RECORD_LEVELS = niveles por lado (default 5)
+"""
+
+import logging
+import os
+import queue
+import re
+import threading
+
+import numpy as np
+
+TICK_RECORD_DIR    = os.environ.get("TICK_RECORD_DIR")
+TICK_RECORD_LEVELS = int(os.environ.get("TICK_RECORD_LEVELS", 5))
+QUEUE_SIZE         = 20_000   # ticks por símbolo en memoria antes de descartar
+CHUNK_RECORDS      = 4096     # registros por write()
+FLUSH_SECS         = 2.0      # máximo tiempo que un registro espera en memoria
+
+SIDE_UP, SIDE_DN = 0, 1
+
+_FILE_RE = re.compile(r"ticks-(\d+)-L(\d+)\.bin$")
+
+log = logging.getLogger("tick_recorder")
+
+
+def tick_dtype(levels: int = TICK_RECORD_LEVELS) -> np.dtype:
+    return np.dtype([
+        ("ts",     "<f8"),
+        ("slot",   "<i8"),
+        ("sym",    "S8"),
+        ("side",   "u1"),
+        ("stale",  "u1"),
+        ("mid",    "<f8"),
+        ("bid_px", "<f8", (levels,)),
+        ("bid_sz", "<f8", (levels,)),
+        ("ask_px", "<f8", (levels,)),
+        ("ask_sz", "<f8", (levels,)),
+    ])
+
+
+def tick_path(directory: str, slot: int, levels: int = TICK_RECORD_LEVELS) -> str:
+    return os.path.join(directory, f"ticks-{slot}-L{levels}.bin")
+
+
+def list_tick_files(directory: str) -> list[tuple[int, str]]:
+    """(slot_ts, path) de los archivos de ticks del directorio, por slot."""
+    files = []
+    for name in os.listdir(directory):
+        m = _FILE_RE.match(name)
+        if m:
+            files.append((int(m.group(1)), os.path.join(directory, name)))
+    return sorted(files)
+
+
+def read_ticks(path: str) -> np.ndarray:
+    """Registros de un archivo como memmap de solo lectura (sin copiar)."""
+    m = _FILE_RE.search(path)
+    if not m:
+        raise ValueError(f"nombre de archivo de ticks inválido: {path}")
+    dtype = tick_dtype(int(m.group(2)))
+    count = os.path.getsize(path) // dtype.itemsize
+    if count == 0:
+        return np.zeros(0, dtype=dtype)
+    return np.memmap(path, dtype=dtype, mode="r", shape=(count,))
+
+
+class TickRecorder:
+    """
+    Grabador con cola acotada e hilo escritor. record() recibe ambos lados de
+    un símbolo; los niveles son listas (price, size) del mejor al peor.
+    """
+
+    def __init__(self, directory: str, levels: int = TICK_RECORD_LEVELS, queue_size: int = QUEUE_SIZE):
+        self.directory = directory
+        self.levels    = levels
+        self.dtype     = tick_dtype(levels)
+        self.dropped   = 0
+        self.written   = 0
+        self._queue: queue.Queue = queue.Queue(maxsize=queue_size)
+        self._thread   = None
+        self._file     = None
+        self._slot     = None
+
+    def start(self):
+        os.makedirs(self.directory, exist_ok=True)
+        self._thread = threading.Thread(target=self._run, name="tick-recorder", daemon=True)
+        self._thread.start()
+
+    def record(self, ts: float, slot: int, sym: str, stale: bool,
+               up_mid: float, up_bids, up_asks, dn_mid: float, dn_bids, dn_asks) -> bool:
+        try:
+            self._queue.put_nowait((ts, slot, sym, stale, up_mid, up_bids, up_asks, dn_mid, dn_bids, dn_asks))
+            return True
+        except queue.Full:
+            self.dropped += 1
+            return False
+
+    def close(self, timeout: float = 5.0):
+        """Vacía la cola y cierra el archivo actual."""
+        if self._thread is None:
+            return
+        self._queue.put(None)
+        self._thread.join(timeout)
+        self._thread = None
+
+    def stats(self) -> dict:
+        return {"written": self.written, "dropped": self.dropped, "queued": self._queue.qsize()}
+
+    # ── Hilo escritor ─────────────────────────────────────────────────────────
+
+    def _run(self):
+        batch = []
+        while True:
+            try:
+                item = self._queue.get(timeout=FLUSH_SECS)
+            except queue.Empty:
+                item = ()
+            if item is None:
+                break
+            if item:
+                batch.append(item)
+            if batch and (not item or len(batch) * 2 >= CHUNK_RECORDS):
+                self._write(batch)
+                batch = []
+        if batch:
+            self._write(batch)
+        if self._file:
+            self._file.close()
+            self._file = None
+
+    def _write(self, batch: list):
+        try:
+            start = 0
+            for i in range(1, len(batch) + 1):
+                # Un write() por tramo contiguo del mismo slot
+                if i == len(batch) or batch[i][1] != batch[start][1]:
+                    self._append(batch[start][1], self._to_records(batch[start:i]))
+                    start = i
+        except Exception as e:
+            log.warning(f"tick recorder: error escribiendo — {e}")
+
+    def _to_records(self, items: list) -> np.ndarray:
+        n   = self.levels
+        rec = np.zeros(2 * len(items), dtype=self.dtype)
+        for j, (ts, slot, sym, stale, up_mid, up_bids, up_asks, dn_mid, dn_bids, dn_asks) in enumerate(items):
+            for k, side, mid, bids, asks in ((2 * j, SIDE_UP, up_mid, up_bids, up_asks),
+                                             (2 * j + 1, SIDE_DN, dn_mid, dn_bids, dn_asks)):
+                r = rec[k]
+                r["ts"], r["slot"], r["sym"], r["side"], r["stale"], r["mid"] = \
+                    ts, slot, sym.encode(), side, stale, mid
+                for lvl, (px, sz) in enumerate(bids[:n]):
+                    r["bid_px"][lvl], r["bid_sz"][lvl] = px, sz
+                for lvl, (px, sz) in enumerate(asks[:n]):
+                    r["ask_px"][lvl], r["ask_sz"][lvl] = px, sz
+        return rec
+
+    def _append(self, slot: int, records: np.ndarray):
+        if slot != self._slot:
+            if self._file:
+                self._file.close()
+            self._file = open(tick_path(self.directory, slot, self.levels), "ab")
+            self._slot = slot
+        self._file.write(records.tobytes())
+        self._file.flush()
+        self.written += len(records)
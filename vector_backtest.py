@@ -0,0 +1,525 @@
+"""
+vector_backtest.py — Backtester vectorizado de la regla de divergencia armónica.
+
+La regla de basket.py es una función pura de los mids del basket y de los
+segundos restantes, así que sobre un historial columnar de ticks (matrices
+ticks x símbolos) se puede evaluar entera con operaciones NumPy, sin loop
+Python por tick:
+
+  1. Estado de cada pata tick a tick: último quote aplicado (forward fill),
+     flag stale, expiración y muestras válidas para el fallback.
+  2. Señal: medias armónicas por lado, gap de la pata más barata, lado elegido
+     y consenso de los pares — una vez, independiente de los parámetros.
+  3. Por configuración: filtros de ventana / gap / precio -> primera entrada
+     de cada ciclo -> primera salida (stop loss, precio concluyente o fallback
+     por historial al expirar) -> P&L binario, capital y drawdown en bloque.
+
+Reproduce la semántica de check_entry (incluido el conteo de skipped) y de
+check_stop_loss / check_resolution. validate() corre el replay evento por
+evento de replay.py sobre los mismos ticks y compara trades y resumen
+(tests/test_vector_backtest.py lo hace sobre ticks sintéticos).
+
+Uso:
+  python vector_backtest.py <dir_ticks> [--grid grid.json] [--top 20] [--validate]
+"""
+
+import argparse
+import sys
+import time
+from datetime import datetime
+
+import numpy as np
+
+import optimizer
+import replay
+from tick_recorder import read_ticks
+
+# Parámetros que varían por corrida (RESOLVED_* definen la señal: van al constructor).
+# CONSENSUS_SOFT no está: solo distingue SOFT de NONE y check_entry entra únicamente
+# con FULL, así que barrerlo daría siempre el mismo resultado.
+PARAMS = [
+    "DIVERGENCE_THRESHOLD",
+    "DIVERGENCE_MAX",
+    "ENTRY_WINDOW_SECS",
+    "ENTRY_OPEN_SECS",
+    "ENTRY_CLOSE_SECS",
+    "ENTRY_MIN_PRICE",
+    "STOP_LOSS_PRICE",
+    "CONSENSUS_FULL",
+]
+
+UP, DN = 0, 1
+EXIT_STOP_LOSS, EXIT_RESOLUTION = 0, 1
+RES_UP, RES_DN, RES_UNKNOWN = 0, 1, 2
+RESOLVED_NAMES = ("UP", "DOWN", "UNKNOWN")
+
+
+def _py_round(values: np.ndarray, ndigits: int) -> np.ndarray:
+    """round() de Python elemento a elemento (np.round no redondea igual en los bordes)."""
+    values = np.asarray(values, dtype=float)
+    if values.size == 0:
+        return values
+    uniq, inv = np.unique(values, return_inverse=True)
+    return np.array([round(v, ndigits) for v in uniq.tolist()])[inv].reshape(values.shape)
+
+
+def _calc_mid(bid: np.ndarray, ask: np.ndarray) -> np.ndarray:
+    """basket.calc_mid vectorizado."""
+    raw = np.where((bid > 0) & (ask > 0), (bid + ask) / 2, np.where(bid > 0, bid, np.where(ask > 0, ask, 0.0)))
+    return _py_round(raw, 4)
+
+
+def _ffill_index(mask: np.ndarray) -> np.ndarray:
+    """Por columna: índice de la última fila <= t con mask True (-1 si ninguna)."""
+    idx = np.where(mask, np.arange(len(mask))[:, None], -1)
+    return np.maximum.accumulate(idx, axis=0)
+
+
+def _first_per_group(mask: np.ndarray, group: np.ndarray, n_groups: int) -> np.ndarray:
+    """Primer índice con mask True de cada grupo (-1 si no hay). group debe ser no decreciente."""
+    first = np.full(n_groups, -1)
+    cand  = np.flatnonzero(mask)
+    if cand.size:
+        groups, pos = np.unique(group[cand], return_index=True)
+        first[groups] = cand[pos]
+    return first
+
+
+# ═══════════════════════════════════════════════════════
+#  HISTORIAL COLUMNAR
+# ═══════════════════════════════════════════════════════
+
+class TickColumns:
+    """
+    Ticks de tick_recorder como matrices (T ticks x N símbolos) con el estado
+    que ve basket.py en run_tick de cada tick. Los ciclos son los slots.
+    """
+
+    def __init__(self, files: list[tuple[int, str]], symbols: list[str], slot_step: int = 300):
+        self.symbols = list(symbols)
+        n     = len(self.symbols)
+        index = {s.encode(): i for i, s in enumerate(self.symbols)}
+
+        parts = []
+        for slot, path in files:
+            rec = read_ticks(path)
+            rec = rec[: len(rec) - len(rec) % 2]   # par UP/DOWN a medio escribir
+            up, dn = rec[0::2], rec[1::2]
+            ok = (up["side"] == UP) & (dn["side"] == DN) & (up["sym"] == dn["sym"])
+            up, dn = up[ok], dn[ok]
+            if not len(up):
+                continue
+            sym = np.array([index[s] for s in up["sym"].tolist()])
+            parts.append((np.full(len(up), slot), sym, up["ts"], up["stale"].astype(bool),
+                          up["bid_px"][:, 0], up["ask_px"][:, 0], dn["bid_px"][:, 0], dn["ask_px"][:, 0]))
+        if not parts:
+            raise ValueError("sin ticks")
+        slot, sym, ts, stale, ub, ua, db, da = (np.concatenate(col) for col in zip(*parts))
+
+        # Un tick nuevo empieza cuando el índice del símbolo no avanza (orden de SYMBOLS)
+        new_tick = np.ones(len(sym), dtype=bool)
+        new_tick[1:] = (sym[1:] <= sym[:-1]) | (slot[1:] != slot[:-1])
+        tick  = np.cumsum(new_tick) - 1
+        T     = int(tick[-1]) + 1
+        first = np.flatnonzero(new_tick)
+        last  = np.r_[first[1:] - 1, len(sym) - 1]
+
+        self.T        = T
+        self.slot     = slot[first]
+        self.ts       = ts[last]      # reloj de run_tick: timestamp de la última pata
+        self.ts_first = ts[first]
+        self.end      = self.slot + slot_step
+
+        # Ciclos: uno por slot, en orden
+        slots, self.cycle = np.unique(self.slot, return_inverse=True)
+        self.n_cycles     = len(slots)
+        self.cycle_start  = np.r_[0, np.flatnonzero(np.diff(self.cycle)) + 1][self.cycle]
+        self.cycle_end    = np.r_[np.flatnonzero(np.diff(self.cycle)), T - 1]
+
+        # Filas que llegan a apply_quotes / sample_market: el replay salta la
+        # pata cuando su mercado ya expiró en el slot (info=None)
+        key   = slot * n + sym
+        order = np.argsort(key, kind="stable")
+        hit   = (ts >= slot + slot_step)[order]
+        head  = np.r_[True, key[order][1:] != key[order][:-1]]
+        prior = np.cumsum(hit) - hit
+        start = np.maximum.accumulate(np.where(head, np.arange(len(order)), 0))
+        proc  = np.empty(len(sym), dtype=bool)
+        proc[order] = prior == prior[start]
+        slot, tick, sym, ts, stale, ub, ua, db, da = (col[proc] for col in (slot, tick, sym, ts, stale, ub, ua, db, da))
+
+        # Símbolos con mercado en cada slot (los que aparecen en su archivo)
+        in_slot = np.zeros((len(slots), n), dtype=bool)
+        in_slot[np.searchsorted(slots, slot), sym] = True
+
+        def matrix(values, fill=0.0, dtype=float):
+            m = np.full((T, n), fill, dtype=dtype)
+            m[tick, sym] = values
+            return m
+
+        self.present = matrix(True, False, bool)
+        rec_stale    = matrix(stale, False, bool)
+        applied      = self.present & ~rec_stale
+
+        # Quotes vigentes: el último aplicado (persisten entre slots, como en vivo)
+        src  = _ffill_index(applied)
+        cols = np.arange(n)[None, :]
+        have = src >= 0
+        self.up_bid = np.where(have, matrix(ub)[src, cols], 0.0)
+        self.up_ask = np.where(have, matrix(ua)[src, cols], 0.0)
+        self.dn_bid = np.where(have, matrix(db)[src, cols], 0.0)
+        self.dn_ask = np.where(have, matrix(da)[src, cols], 0.0)
+        self.up_mid = _calc_mid(self.up_bid, self.up_ask)
+        self.dn_mid = _calc_mid(self.dn_bid, self.dn_ask)
+
+        # markets[sym].stale: flag de la última muestra de la pata
+        src = _ffill_index(self.present)
+        self.stale = np.where(src >= 0, rec_stale[np.maximum(src, 0), cols], False)
+
+        # Expiración: la muestra con seconds_remaining <= 0 deja info=None hasta el slot siguiente
+        leg_ts  = matrix(ts)
+        expires = self.present & (leg_ts >= self.end[:, None])
+        count   = np.cumsum(expires, axis=0)
+        before  = np.where(self.cycle_start[:, None] > 0, count[np.maximum(self.cycle_start - 1, 0)], 0)
+        self.expired = ((count - before) > 0) | ~in_slot[self.cycle]
+
+        # Muestras que sample_market agrega a mid_history
+        self.sampled = applied & (self.up_mid > 0)
+
+        # min_secs_remaining() en run_tick (nan = ninguna pata con mercado)
+        alive     = ~self.expired.all(axis=1)
+        self.secs = np.where(alive, np.maximum(0.0, self.end - self.ts), np.nan)
+
+
+# ═══════════════════════════════════════════════════════
+#  SEÑAL
+# ═══════════════════════════════════════════════════════
+
+class BasketSignals:
+    """BasketEngine.evaluate para todos los ticks a la vez."""
+
+    def __init__(self, cols: TickColumns, resolved_up: float = 0.98, resolved_dn: float = 0.02):
+        self.resolved_up = resolved_up
+        self.resolved_dn = resolved_dn
+        T, n = cols.up_mid.shape
+
+        up_mask, up_h, up_norm = self._harmonic(cols.up_mid, self._totals(cols.up_mid))
+        dn_mask, dn_h, dn_norm = self._harmonic(cols.dn_mid, self._totals(cols.dn_mid))
+        ready = up_mask.sum(axis=1) >= 2
+
+        i_up, d_up = self._cheapest(up_mask, up_norm, up_h)
+        i_dn, d_dn = self._cheapest(dn_mask, dn_norm, dn_h)
+
+        pick_up = (np.abs(d_up) >= np.abs(d_dn)) & (i_up >= 0)
+        pick_dn = ~pick_up & (i_dn >= 0)
+        self.asset = np.where(ready & pick_up, i_up, np.where(ready & pick_dn, i_dn, -1))
+        self.side  = np.where(pick_up, UP, DN)
+        self.div   = np.where(pick_up, d_up, np.where(pick_dn, d_dn, 0.0))
+
+        # Consenso: todos los pares con dato y su mínimo (FULL si > CONSENSUS_FULL)
+        raw   = np.where(self.side[:, None] == UP, cols.up_mid, cols.dn_mid)
+        peer  = np.ones((T, n), dtype=bool)
+        rows  = np.flatnonzero(self.asset >= 0)
+        peer[rows, self.asset[rows]] = False
+        self.peers_ok = ((raw > 0) | ~peer).all(axis=1)
+        self.peer_min = np.where(peer, raw, np.inf).min(axis=1)
+
+    def _recip(self, mids):
+        norm = np.where(mids >= self.resolved_up, 1.0, np.where(mids <= self.resolved_dn, 0.0, mids))
+        with np.errstate(divide="ignore"):
+            return norm, np.where((mids > 0) & (norm > 0), 1.0 / np.where(norm > 0, norm, 1.0), 0.0)
+
+    def _totals(self, mids: np.ndarray) -> np.ndarray:
+        """
+        Suma de recíprocos de cada tick como en _Side.harmonic: pata por pata
+        en el orden de los símbolos, con la misma acumulación secuencial que
+        sum(), así la media armónica sale bit a bit igual a la del motor.
+        """
+        _, r  = self._recip(mids)
+        total = np.zeros(len(mids))
+        for j in range(mids.shape[1]):
+            total = total + r[:, j]
+        return total
+
+    def _harmonic(self, mids, total):
+        mask    = mids > 0
+        norm, _ = self._recip(mids)
+        n       = mask.sum(axis=1)
+        bad     = (mask & (norm <= 0)).any(axis=1) | (n == 0)
+        h       = np.where(bad, 0.0, n / np.where(total != 0, total, 1.0))
+        return mask, h, norm
+
+    @staticmethod
+    def _cheapest(mask, norm, h):
+        diffs = np.where(mask, norm - h[:, None], np.inf)
+        i     = diffs.argmin(axis=1)
+        diff  = diffs[np.arange(len(i)), i]
+        ok    = (h != 0) & (diff < 0)
+        return np.where(ok, i, -1), np.where(ok, diff, 0.0)
+
+    def full(self, consensus_full: float) -> np.ndarray:
+        return (self.asset >= 0) & self.peers_ok & (self.peer_min > consensus_full)
+
+
+# ═══════════════════════════════════════════════════════
+#  BACKTEST
+# ═══════════════════════════════════════════════════════
+
+class VectorBacktest:
+    def __init__(self, cols: TickColumns, defaults: dict, entry_usd: float = 1.0, capital: float = 100.0,
+                 resolved_up: float = 0.98, resolved_dn: float = 0.02):
+        self.cols      = cols
+        self.defaults  = {k: defaults[k] for k in PARAMS}
+        self.entry_usd = entry_usd
+        self.capital   = capital
+        self.signals   = BasketSignals(cols, resolved_up, resolved_dn)
+
+        # Vistas en la pata de la señal (independientes de los parámetros)
+        s, rows   = self.signals, np.arange(cols.T)
+        a         = np.maximum(s.asset, 0)
+        self.ask  = np.where(s.side == UP, cols.up_ask[rows, a], cols.dn_ask[rows, a])
+        self.leg_stale = cols.stale[rows, a]
+        um, dm    = cols.up_mid[rows, a], cols.dn_mid[rows, a]
+        self.leg_resolved = (um >= resolved_up) | (um <= resolved_dn) | (dm >= resolved_up) | (dm <= resolved_dn)
+        self.resolved_up  = resolved_up
+        self.resolved_dn  = resolved_dn
+
+    def run(self, params: dict | None = None) -> dict:
+        """Resumen (mismas métricas que replay.summary) + arrays de trades en "trades"."""
+        unknown = set(params or {}) - set(PARAMS)
+        if unknown:
+            raise ValueError(f"parámetros no soportados: {sorted(unknown)}")
+        p    = {**self.defaults, **(params or {})}
+        c, s = self.cols, self.signals
+
+        window = (c.secs <= p["ENTRY_WINDOW_SECS"]) & (c.secs >= p["ENTRY_OPEN_SECS"]) & \
+                 (c.secs > p["ENTRY_CLOSE_SECS"])
+        full    = s.full(p["CONSENSUS_FULL"])
+        div_abs = np.abs(s.div)
+        gap_ok  = (s.asset >= 0) & (div_abs >= p["DIVERGENCE_THRESHOLD"])
+        gap_max = gap_ok & (div_abs > p["DIVERGENCE_MAX"])
+        priced  = gap_ok & ~gap_max & ~self.leg_stale & (self.ask > 0) & (self.ask < 1)
+        cheap   = self.ask < p["ENTRY_MIN_PRICE"]
+        qualify = window & full & priced & ~self.leg_resolved & ~cheap
+
+        entry_of = _first_per_group(qualify, c.cycle, c.n_cycles)
+        entries  = entry_of[entry_of >= 0]
+        exits, open_end, exit_kind, exit_price, resolved = self._exits(entries, entry_of, p["STOP_LOSS_PRICE"])
+
+        # ── P&L ──
+        side   = s.side[entries]
+        ask    = self.ask[entries]
+        shares = _py_round(self.entry_usd / ask, 6) if len(ask) else ask
+        win    = (exit_kind == EXIT_RESOLUTION) & (resolved == side)
+        pnl    = np.where(exit_kind == EXIT_STOP_LOSS, _py_round(shares * exit_price - self.entry_usd, 6),
+                          np.where(win, _py_round((shares - 1) * self.entry_usd, 6), -self.entry_usd))
+        # Misma secuencia de sumas que BacktestState: capital -= usd al entrar,
+        # capital += usd + pnl al salir (accumulate suma en orden, sin pairwise)
+        steps = np.empty(2 * len(pnl) + 1)
+        steps[0], steps[1::2], steps[2::2] = self.capital, -self.entry_usd, self.entry_usd + pnl
+        capital = np.cumsum(steps)[2::2]
+        peak    = np.maximum.accumulate(np.r_[self.capital, capital])[1:]
+        max_dd  = float(np.max(peak - capital, initial=0.0))
+
+        # Posición sin salida en el slot: sigue abierta durante su último tick
+        skipped = self._skipped(window, full, gap_ok, gap_max, priced, cheap, entry_of, entries, exits + open_end)
+
+        wins, total = int(win.sum()), len(entries)
+        gains, losses = pnl[pnl > 0].sum(), -pnl[pnl < 0].sum()
+        total_pnl = float(np.cumsum(pnl)[-1]) if total else 0.0
+        final     = float(capital[-1]) if total else self.capital
+        return {
+            "ticks":         c.T,
+            "trades":        total,
+            "wins":          wins,
+            "losses":        total - wins,
+            "win_rate":      round(wins / total * 100, 1) if total else 0,
+            "profit_factor": round(float(gains / losses), 2) if losses > 0 else None,
+            "total_pnl":     round(total_pnl, 4),
+            "roi_pct":       round((final - self.capital) / self.capital * 100, 2),
+            "capital":       round(final, 4),
+            "max_drawdown":  round(max_dd, 4),
+            "skipped":       skipped,
+            "trades_detail": {
+                "entry_tick": entries, "exit_tick": exits, "asset": s.asset[entries], "side": side,
+                "entry_ask": ask, "shares": shares, "exit_type": exit_kind, "exit_price": exit_price,
+                "resolved": resolved, "pnl": pnl,
+            },
+        }
+
+    def _exits(self, entries, entry_of, stop_loss):
+        """Primera salida de cada posición: stop loss > precio concluyente > fallback al expirar."""
+        c, s  = self.cols, self.signals
+        e     = entry_of[c.cycle]
+        rows  = np.arange(c.T)
+        live  = (e >= 0) & (rows > e)
+        a     = np.where(e >= 0, s.asset[np.maximum(e, 0)], 0)
+        side  = s.side[np.maximum(e, 0)]
+        bid   = np.where(side == UP, c.up_bid[rows, a], c.dn_bid[rows, a])
+        um    = c.up_mid[rows, a]
+        sl    = live & (bid <= stop_loss) & (bid > 0)
+        conc  = live & ~sl & ((um >= self.resolved_up) | (um <= self.resolved_dn))
+        exp   = live & ~sl & ~conc & c.expired[rows, a]
+
+        exit_of = _first_per_group(sl | conc | exp, c.cycle, c.n_cycles)
+        cyc     = c.cycle[entries]
+        exits   = exit_of[cyc]
+        # Sin salida en el slot: _expire al arrancar el siguiente (o al final de los datos)
+        open_end = exits < 0
+        exits    = np.where(open_end, c.cycle_end[cyc], exits)
+
+        kind  = np.where(sl[exits] & ~open_end, EXIT_STOP_LOSS, EXIT_RESOLUTION)
+        price = np.where(kind == EXIT_STOP_LOSS, bid[exits], 0.0)
+        res   = np.where(um[exits] >= self.resolved_up, RES_UP,
+                         np.where(um[exits] <= self.resolved_dn, RES_DN, -1))
+        res   = np.where(open_end, -1, res)
+        fb    = (kind == EXIT_RESOLUTION) & (res < 0)
+        if fb.any():
+            res[fb] = self._fallback(exits[fb], a[exits[fb]])
+        res   = np.where(kind == EXIT_STOP_LOSS, -1, res)
+        price = np.where((kind == EXIT_RESOLUTION) & (res == s.side[entries]), 1.0, price)
+        return exits, open_end, kind, price, res
+
+    def _fallback(self, rows: np.ndarray, assets: np.ndarray) -> np.ndarray:
+        """resolve_from_clob_history: promedio de las últimas MID_HISTORY_SIZE muestras del slot."""
+        c   = self.cols
+        out = np.full(len(rows), RES_UNKNOWN)
+        for n in np.unique(assets):
+            sel = assets == n
+            idx = np.flatnonzero(c.sampled[:, n])
+            if not idx.size:
+                continue
+            r     = rows[sel]
+            k     = np.searchsorted(idx, r, side="right")
+            total = np.zeros(len(r))
+            count = np.zeros(len(r), dtype=int)
+            for back in (3, 2, 1):   # en orden de llegada, como sum(history)
+                j     = np.maximum(k - back, 0)
+                ok    = (k - back >= 0) & (idx[j] >= c.cycle_start[r])
+                total = np.where(ok, total + c.up_mid[idx[j], n], total)
+                count += ok
+            avg = np.where(count > 0, total / np.maximum(count, 1), 0.5)
+            out[sel] = np.where(avg > 0.5, RES_UP, np.where(avg < 0.5, RES_DN, RES_UNKNOWN))
+        return out
+
+    def _skipped(self, window, full, gap_ok, gap_max, priced, cheap, entry_of, entries, closed) -> int:
+        c, s = self.cols, self.signals
+        rows = np.arange(c.T)
+        e    = entry_of[c.cycle]
+        pre  = (e < 0) | (rows < e)   # sin posición y sin trade en el ciclo
+
+        # bt.consensus solo se actualiza cuando hay activo y compute_signals corre (sin posición)
+        x = np.full(c.n_cycles, -1)
+        x[c.cycle[entries]] = closed
+        xe = x[c.cycle]
+        in_pos = (e >= 0) & (rows > e) & (rows < xe)
+        update = (s.asset >= 0) & ~in_pos
+        src    = np.maximum.accumulate(np.where(update, rows, -1))
+        cons_full = np.where(src >= 0, full[np.maximum(src, 0)], False)
+
+        base = pre & window
+        skip = base & ~cons_full
+        skip |= base & cons_full & gap_max
+        skip |= base & full & priced & self.leg_resolved
+        skip |= base & full & priced & ~self.leg_resolved & cheap
+        return int(skip.sum())
+
+    def sweep(self, configs: list[dict], sort: str = "total_pnl") -> list[dict]:
+        results = []
+        for config in configs:
+            r = self.run(config)
+            r.pop("trades_detail")
+            results.append({**config, **r})
+        reverse = sort != "max_drawdown"
+        missing = float("-inf") if reverse else float("inf")
+        results.sort(key=lambda r: missing if r[sort] is None else r[sort], reverse=reverse)
+        return results
+
+
+# ═══════════════════════════════════════════════════════
+#  VALIDACIÓN CONTRA EL REPLAY EVENTO POR EVENTO
+# ═══════════════════════════════════════════════════════
+
+def validate(vb: VectorBacktest, basket, files: list[tuple[int, str]], params: dict | None = None) -> list[str]:
+    """Diferencias (vacío = coinciden) entre el backtest vectorizado y replay.run_replay."""
+    replay.reset_basket(basket, params)
+    ref  = replay.run_replay(basket, files)
+    got  = vb.run(params)
+    diffs = [f"{k}: replay={ref[k]} vector={got[k]}"
+             for k in ("trades", "wins", "losses", "total_pnl", "max_drawdown", "skipped") if ref[k] != got[k]]
+
+    t = got["trades_detail"]
+    for i, trade in enumerate(basket.bt.trades):
+        if i >= len(t["pnl"]):
+            break
+        mine = (vb.cols.symbols[t["asset"][i]], ("UP", "DOWN")[t["side"][i]], round(float(t["entry_ask"][i]), 6),
+                ("STOP_LOSS", "RESOLUTION")[t["exit_type"][i]], round(float(t["pnl"][i]), 6),
+                datetime.fromtimestamp(vb.cols.ts[t["entry_tick"][i]]).isoformat())
+        theirs = (trade["asset"], trade["side"], trade["entry_ask"], trade["exit_type"], trade["pnl_usd"],
+                  trade["entry_ts"])
+        if mine != theirs:
+            diffs.append(f"trade {i}: replay={theirs} vector={mine}")
+            break
+    return diffs
+
+
+def load(files: list[tuple[int, str]]):
+    """(basket, VectorBacktest) con los parámetros vivos de basket.py como default."""
+    basket  = replay.load_basket(replay.recorded_symbols(files))
+    # El orden de basket.SYMBOLS (el que usa el replay) decide sumas y empates
+    cols    = TickColumns(files, basket.SYMBOLS, basket.SLOT_STEP)
+    vb      = VectorBacktest(cols, {k: getattr(basket, k) for k in PARAMS},
+                             entry_usd=basket.ENTRY_USD, capital=basket.CAPITAL_TOTAL,
+                             resolved_up=basket.RESOLVED_UP_THRESH, resolved_dn=basket.RESOLVED_DN_THRESH)
+    return basket, vb
+
+
+def load_spec(path: str) -> dict:
+    """Grilla de optimizer.py restringida a PARAMS (sin RESOLVED_* ni CONSENSUS_SOFT)."""
+    spec    = optimizer.load_spec(path)
+    unknown = set(spec) - set(PARAMS)
+    if unknown:
+        raise ValueError(f"Parámetros no soportados por el backtest vectorizado en {path}: {sorted(unknown)}"
+                         " (usar optimizer.py)")
+    return spec
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Backtest vectorizado sobre ticks grabados")
+    ap.add_argument("ticks", help="directorio de TICK_RECORD_DIR")
+    ap.add_argument("--grid", help="JSON de parámetros (producto cartesiano, como optimizer.py)")
+    ap.add_argument("--from", dest="slot_from", type=int)
+    ap.add_argument("--to", dest="slot_to", type=int)
+    ap.add_argument("--sort", default="total_pnl", choices=optimizer.SORT_KEYS)
+    ap.add_argument("--top", type=int, default=20)
+    ap.add_argument("--validate", action="store_true", help="comparar contra replay.py (default o cada config)")
+    args = ap.parse_args(argv)
+
+    files = replay.tick_files(args.ticks, args.slot_from, args.slot_to)
+    if not files:
+        sys.exit(f"sin archivos de ticks en {args.ticks}")
+    spec    = load_spec(args.grid) if args.grid else {}
+    configs = optimizer.grid_configs(spec) if spec else [{}]
+
+    t0 = time.perf_counter()
+    basket, vb = load(files)
+    print(f"{vb.cols.T} ticks, {vb.cols.n_cycles} ciclos cargados en {time.perf_counter() - t0:.2f}s")
+
+    if args.validate:
+        failed = 0
+        for config in configs:
+            diffs = validate(vb, basket, files, config)
+            failed += bool(diffs)
+            for d in diffs:
+                print(f"{config or 'default'}: {d}")
+        print(f"validación: {len(configs) - failed}/{len(configs)} configuraciones coinciden con replay.py")
+        return
+
+    t0 = time.perf_counter()
+    ranking = vb.sweep(configs, args.sort)
+    print(f"{len(configs)} configuraciones en {time.perf_counter() - t0:.2f}s")
+    print(optimizer.format_table(ranking[:args.top], list(spec)))
+
+
+if __name__ == "__main__":
+    main()